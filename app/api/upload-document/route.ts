@@ -10,6 +10,8 @@ export async function POST(req: NextRequest) {
         const file = formData.get("file") as File;
         const company = formData.get("company") as string;
         const period = formData.get("period") as string;
+        // Optional stable name of the document; re-uploading under the same name replaces it incrementally
+        const document = (formData.get("document") as string | null) || undefined;
 
         if (!file) {
             return NextResponse.json({ error: "No file provided" }, { status: 400 });
@@ -43,7 +45,7 @@ export async function POST(req: NextRequest) {
         console.log(`[Upload] Saved file: ${filepath}`);
 
         // Process the document using Python
-        const result = await processDocument(filepath, company, period);
+        const result = await processDocument(filepath, file.name, company, period, document);
 
         return NextResponse.json({
             success: true,
@@ -51,6 +53,13 @@ export async function POST(req: NextRequest) {
             company,
             period,
             chunks_indexed: result.chunks_indexed,
+            // Present when a named document was updated incrementally
+            ...(result.document !== undefined && {
+                document: result.document,
+                chunks_unchanged: result.chunks_unchanged,
+                chunks_moved: result.chunks_moved,
+                chunks_removed: result.chunks_removed
+            }),
             message: `Successfully indexed ${result.chunks_indexed} chunks from ${file.name}`
         });
 
@@ -62,11 +71,21 @@ export async function POST(req: NextRequest) {
     }
 }
 
-function processDocument(filepath: string, company: string, period: string): Promise<{ chunks_indexed: number }> {
+interface IngestResult {
+    chunks_indexed: number;
+    document?: string;
+    chunks_unchanged?: number;
+    chunks_moved?: number;
+    chunks_removed?: number;
+}
+
+function processDocument(filepath: string, sourceName: string, company: string, period: string, document?: string): Promise<IngestResult> {
     return new Promise((resolve, reject) => {
         const scriptPath = path.join(process.cwd(), "scripts", "ingest_document.py");
 
-        const python = spawn("python", [scriptPath, filepath, company, period], {
+        // The saved file name is timestamped; chunks record the name it was uploaded under
+        const args = [scriptPath, filepath, company, period, "--name", sourceName, ...(document ? ["--doc", document] : [])];
+        const python = spawn("python", args, {
             cwd: process.cwd(),
             env: process.env
         });
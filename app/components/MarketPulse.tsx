@@ -9,6 +9,8 @@ interface SearchResult {
     text: string;
     similarity: number;
     source_file: string;
+    page?: number;
+    page_end?: number;
 }
 
 interface UploadStatus {
@@ -20,6 +22,7 @@ export function MarketPulse({ theme }: { theme: 'light' | 'dark' }) {
     // Upload state
     const [company, setCompany] = useState('');
     const [period, setPeriod] = useState('');
+    const [documentName, setDocumentName] = useState('');
     const [selectedFile, setSelectedFile] = useState<File | null>(null);
     const [uploadStatus, setUploadStatus] = useState<UploadStatus | null>(null);
     const fileInputRef = useRef<HTMLInputElement>(null);
@@ -72,6 +75,8 @@ export function MarketPulse({ theme }: { theme: 'light' | 'dark' }) {
             formData.append('file', selectedFile);
             formData.append('company', company);
             formData.append('period', period);
+            // A named document replaces its previous upload incrementally
+            if (documentName.trim()) formData.append('document', documentName.trim());
 
             const res = await fetch('/api/upload-document', {
                 method: 'POST',
@@ -83,11 +88,14 @@ export function MarketPulse({ theme }: { theme: 'light' | 'dark' }) {
             if (res.ok) {
                 setUploadStatus({
                     type: 'success',
-                    message: `Indexed ${result.chunks_indexed} chunks from ${selectedFile.name}`
+                    message: result.document
+                        ? `Updated ${result.document}: ${result.chunks_indexed} new, ${result.chunks_unchanged} unchanged, ${result.chunks_removed} removed chunks`
+                        : `Indexed ${result.chunks_indexed} chunks from ${selectedFile.name}`
                 });
                 setSelectedFile(null);
                 setCompany('');
                 setPeriod('');
+                setDocumentName('');
                 if (fileInputRef.current) fileInputRef.current.value = '';
                 fetchStats();
             } else {
@@ -173,7 +181,7 @@ export function MarketPulse({ theme }: { theme: 'light' | 'dark' }) {
                     Upload Document
                 </h3>
 
-                <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-4">
+                <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-4">
                     <div>
                         <label className={`block text-xs font-medium mb-1 ${textMuted}`}>Company Name</label>
                         <input
@@ -194,6 +202,17 @@ export function MarketPulse({ theme }: { theme: 'light' | 'dark' }) {
                             className={`w-full px-3 py-2 rounded-lg border text-sm ${inputBg} focus:outline-none focus:ring-2 focus:ring-purple-500`}
                         />
                     </div>
+                    <div>
+                        <label className={`block text-xs font-medium mb-1 ${textMuted}`}>Document Name (optional)</label>
+                        <input
+                            type="text"
+                            placeholder="e.g., Apple 10-K 2025"
+                            title="Re-upload under the same name to replace the previous version"
+                            value={documentName}
+                            onChange={(e) => setDocumentName(e.target.value)}
+                            className={`w-full px-3 py-2 rounded-lg border text-sm ${inputBg} focus:outline-none focus:ring-2 focus:ring-purple-500`}
+                        />
+                    </div>
                     <div>
                         <label className={`block text-xs font-medium mb-1 ${textMuted}`}>File (PDF, DOCX, TXT)</label>
                         <input
@@ -280,6 +299,7 @@ export function MarketPulse({ theme }: { theme: 'light' | 'dark' }) {
                                 <div className={`mt-2 text-xs ${textMuted}`}>
                                     <FileText className="w-3 h-3 inline mr-1" />
                                     {r.source_file}
+                                    {r.page && ` · p. ${r.page}${r.page_end && r.page_end !== r.page ? `–${r.page_end}` : ''}`}
                                 </div>
                             </div>
                         ))}
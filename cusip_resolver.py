@@ -0,0 +1,261 @@
+"""
+CUSIP Resolver - Link 13-F holdings to tickers and CIKs
+Builds a sorted CUSIP index from the SEC Official List of Section 13(f)
+Securities joined against the SEC company ticker files.
+"""
+import os
+import re
+import json
+from bisect import bisect_left
+from typing import Optional
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "data", "cusip_index.json")
+
+# Corporate suffixes dropped before matching issuer names against ticker titles
+_NAME_SUFFIXES = {
+    "INC", "INCORPORATED", "CORP", "CORPORATION", "CO", "COMPANY", "LTD", "LIMITED",
+    "PLC", "LLC", "LP", "L P", "HLDGS", "HOLDINGS", "HOLDING", "GROUP", "GRP",
+    "NV", "N V", "SA", "S A", "AG", "SE", "THE", "DEL", "NEW", "COS", "TR", "TRUST",
+}
+
+_LIST_LINE = re.compile(r'^\s*([0-9A-Z]{6})\s?([0-9A-Z]{2})\s?([0-9])\s+(\*\s+)?(.*\S)\s*$')
+_CLASS_LETTER = re.compile(r'\bCL(?:ASS)?\s+([A-Z])\b')
+
+
+def normalize_cusip(cusip: str) -> str:
+    """Normalize a CUSIP to 9 upper-case characters (no spaces/dashes)."""
+    if not cusip:
+        return ""
+    return re.sub(r'[^0-9A-Za-z]', '', str(cusip)).upper()[:9]
+
+
+def normalize_issuer(name: str) -> str:
+    """Normalize an issuer name for fuzzy joins (upper, no punctuation/suffixes)."""
+    if not name:
+        return ""
+    name = re.sub(r'[^A-Z0-9 ]', ' ', name.upper())
+    words = [w for w in name.split() if w not in _NAME_SUFFIXES]
+    return " ".join(words)
+
+
+def parse_13f_list(text: str) -> list[dict]:
+    """
+    Parse the text version of the Official List of Section 13(f) Securities.
+    Lines look like: "037833 10 0 * APPLE INC   COM   ADDED"
+    """
+    entries = []
+    for line in text.splitlines():
+        match = _LIST_LINE.match(line)
+        if not match:
+            continue
+
+        cusip = match.group(1) + match.group(2) + match.group(3)
+        fields = re.split(r'\s{2,}', match.group(5))
+        status = ""
+        if fields and fields[-1].strip().upper() in ("ADDED", "DELETED"):
+            status = fields.pop().strip().upper()
+
+        entries.append({
+            "cusip": cusip,
+            "issuer": fields[0].strip() if fields else "",
+            "description": fields[1].strip() if len(fields) > 1 else "",
+            "has_options": bool(match.group(4)),
+            "status": status,
+        })
+    return entries
+
+
+def _pick_ticker(candidates: list[dict], description: str) -> dict:
+    """Pick the best ticker for a security when an issuer has several share classes."""
+    class_match = _CLASS_LETTER.search(description.upper())
+    if class_match and len(candidates) > 1:
+        letter = class_match.group(1)
+        for c in candidates:
+            if c["ticker"].replace("-", "").replace(".", "").endswith(letter):
+                return c
+    # company_tickers files are ordered by size, so the first entry is the primary listing
+    return candidates[0]
+
+
+class CusipIndex:
+    """
+    Sorted-array CUSIP index.
+    Parallel lists keyed by position keep the footprint small; lookups are bisect.
+    """
+
+    def __init__(self, cusips=None, tickers=None, ciks=None, issuers=None, aliases=None, quarter=""):
+        self.cusips = cusips or []
+        self.tickers = tickers or []
+        self.ciks = ciks or []
+        self.issuers = issuers or []
+        self.aliases = aliases or {}  # retired CUSIP -> replacement CUSIP
+        self.quarter = quarter
+
+    def __len__(self) -> int:
+        return len(self.cusips)
+
+    @classmethod
+    def build(cls, quarterly_lists: list[tuple[str, str]], company_tickers: list[dict]) -> "CusipIndex":
+        """
+        Build the index.
+
+        Args:
+            quarterly_lists: [(quarter, list_text), ...] in chronological order, e.g. ("2025Q4", text)
+            company_tickers: [{"cik", "ticker", "name"}, ...] from SECClient.get_company_tickers()
+        """
+        by_name = {}
+        for entry in company_tickers:
+            key = normalize_issuer(entry.get("name", ""))
+            if key:
+                by_name.setdefault(key, []).append(entry)
+
+        records = {}
+        aliases = {}
+        quarter = ""
+        for quarter, text in quarterly_lists:
+            entries = parse_13f_list(text)
+            added = {}
+            deleted = []
+            for e in entries:
+                records[e["cusip"]] = e
+                ident = (normalize_issuer(e["issuer"]), e["description"].upper())
+                if e["status"] == "ADDED":
+                    added[ident] = e["cusip"]
+                elif e["status"] == "DELETED":
+                    deleted.append((ident, e["cusip"]))
+
+            # A CUSIP deleted in the same quarter another is added for the same
+            # issuer/class is a CUSIP change (reorganisation, rename, re-domicile)
+            for ident, old in deleted:
+                new = added.get(ident)
+                if new and new != old:
+                    aliases[old] = new
+
+        index = cls(aliases=aliases, quarter=quarter)
+        for cusip in sorted(records):
+            e = records[cusip]
+            candidates = by_name.get(normalize_issuer(e["issuer"]))
+            pick = _pick_ticker(candidates, e["description"]) if candidates else {}
+            index.cusips.append(cusip)
+            index.tickers.append(pick.get("ticker", ""))
+            index.ciks.append(str(pick.get("cik", "")).zfill(10) if pick else "")
+            index.issuers.append(e["issuer"])
+
+        print(f"[CUSIP] Built index: {len(index)} securities, "
+              f"{sum(1 for t in index.tickers if t)} resolved, {len(aliases)} CUSIP changes")
+        return index
+
+    def _position(self, cusip: str) -> int:
+        i = bisect_left(self.cusips, cusip)
+        if i < len(self.cusips) and self.cusips[i] == cusip:
+            return i
+        return -1
+
+    def current_cusip(self, cusip: str) -> str:
+        """Follow CUSIP changes forward to the latest identifier."""
+        seen = set()
+        cusip = normalize_cusip(cusip)
+        while cusip in self.aliases and cusip not in seen:
+            seen.add(cusip)
+            cusip = self.aliases[cusip]
+        return cusip
+
+    def lookup(self, cusip: str) -> Optional[dict]:
+        """Resolve a single CUSIP to {cusip, ticker, cik, issuer, match}."""
+        cusip = normalize_cusip(cusip)
+        if len(cusip) < 6:
+            return None
+
+        current = self.current_cusip(cusip)
+        for candidate, match in ((current, "exact" if current == cusip else "renamed"), (cusip, "exact")):
+            i = self._position(candidate)
+            if i >= 0 and self.tickers[i]:
+                return {"cusip": candidate, "ticker": self.tickers[i], "cik": self.ciks[i],
+                        "issuer": self.issuers[i], "match": match}
+
+        # Fall back to the 6-char issuer code (another share class / issue of the same issuer)
+        prefix = cusip[:6]
+        i = bisect_left(self.cusips, prefix)
+        while i < len(self.cusips) and self.cusips[i].startswith(prefix):
+            if self.tickers[i]:
+                return {"cusip": self.cusips[i], "ticker": self.tickers[i], "cik": self.ciks[i],
+                        "issuer": self.issuers[i], "match": "issuer"}
+            i += 1
+        return None
+
+    def lookup_many(self, cusips: list[str]) -> dict:
+        """Batch lookup; each distinct CUSIP is resolved once."""
+        results = {}
+        for cusip in set(normalize_cusip(c) for c in cusips if c):
+            results[cusip] = self.lookup(cusip)
+        return results
+
+    def resolve_holdings(self, holdings: list[dict]) -> list[dict]:
+        """Annotate a parsed 13-F holdings table with 'ticker' and 'cik'."""
+        resolved = self.lookup_many([h.get("cusip", "") for h in holdings])
+        out = []
+        for h in holdings:
+            hit = resolved.get(normalize_cusip(h.get("cusip", "")))
+            row = dict(h)
+            row["ticker"] = hit["ticker"] if hit else None
+            row["cik"] = hit["cik"] if hit else None
+            out.append(row)
+        return out
+
+    def save(self, path: str = INDEX_PATH):
+        """Persist the index as compact parallel arrays."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "quarter": self.quarter,
+                "cusips": self.cusips,
+                "tickers": self.tickers,
+                "ciks": self.ciks,
+                "issuers": self.issuers,
+                "aliases": self.aliases,
+            }, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> Optional["CusipIndex"]:
+        """Load a previously saved index."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["cusips"], data["tickers"], data["ciks"], data["issuers"],
+                   data.get("aliases", {}), data.get("quarter", ""))
+
+
+def build_cusip_index(sec, quarters: list[tuple[int, int]], path: str = INDEX_PATH) -> CusipIndex:
+    """
+    Download the 13(f) lists for the given (year, quarter) pairs plus the ticker
+    files, build the index and save it.
+    """
+    lists = []
+    for year, quarter in sorted(quarters):
+        text = sec.get_13f_securities_list(year, quarter)
+        if text:
+            lists.append((f"{year}Q{quarter}", text))
+        else:
+            print(f"[CUSIP] No 13(f) list for {year}Q{quarter}")
+
+    index = CusipIndex.build(lists, sec.get_company_tickers())
+    index.save(path)
+    return index
+
+
+if __name__ == "__main__":
+    import sys
+    from sec_client import SECClient
+
+    if len(sys.argv) < 2:
+        print("Usage: cusip_resolver.py <YYYYQn> [<YYYYQn> ...]")
+        sys.exit(1)
+
+    wanted = []
+    for arg in sys.argv[1:]:
+        y, q = arg.upper().split("Q")
+        wanted.append((int(y), int(q)))
+
+    idx = build_cusip_index(SECClient(use_proxies=False), wanted)
+    print(f"Saved {len(idx)} securities to {INDEX_PATH}")
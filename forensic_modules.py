@@ -9,21 +9,20 @@ import difflib
 from bs4 import BeautifulSoup
 from typing import Optional
 import xml.etree.ElementTree as ET
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 
+from llm_client import get_client
+
 load_dotenv()
 
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+SCOOP_PROVIDER = os.getenv("SCOOP_LLM_PROVIDER", "gemini")
+SCOOP_MODEL = os.getenv("SCOOP_LLM_MODEL") or None  # None: the provider's default (gemini-1.5-flash)
 
 def generate_scoop_leads(risk_analysis: dict, whale_analysis: dict = None, financials: dict = None) -> str:
     """
-    Generate investigative scoop leads using Gemini 2.0 Flash.
+    Generate investigative scoop leads (Gemini by default, see SCOOP_LLM_PROVIDER).
     """
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
     # Construct context
     context = f"""
     You are a veteran forensic accountant and investigative journalist (like Herb Greenberg or cohort).
@@ -53,8 +52,9 @@ def generate_scoop_leads(risk_analysis: dict, whale_analysis: dict = None, finan
     """
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        result = get_client().complete([{"role": "user", "content": prompt}], provider=SCOOP_PROVIDER,
+                                       model=SCOOP_MODEL, max_tokens=1024, temperature=1.0)
+        return result["text"]
     except Exception as e:
         return f"**Error generating AI analysis:** {str(e)}"
 
@@ -274,17 +274,35 @@ def parse_13f_holdings(xml_content: str) -> list[dict]:
     
     return holdings
 
-def analyze_whale_changes(current_holdings: list, previous_holdings: list) -> dict:
+def analyze_whale_changes(current_holdings: list, previous_holdings: list, cusip_index=None) -> dict:
     """
     Compare 13-F holdings between quarters.
     Calculate net conviction changes.
+    Pass a cusip_resolver.CusipIndex to tag changes with ticker/CIK.
     """
     if not current_holdings:
         return {"error": "No current holdings data"}
     
-    # Index by CUSIP
-    current_map = {h.get('cusip', ''): h for h in current_holdings if h.get('cusip')}
-    previous_map = {h.get('cusip', ''): h for h in previous_holdings if h.get('cusip')}
+    # Index by CUSIP, following CUSIP changes so a renamed security diffs against itself
+    def by_cusip(holdings):
+        out = {}
+        for h in holdings:
+            cusip = h.get('cusip')
+            if not cusip:
+                continue
+            if cusip_index is not None:
+                cusip = cusip_index.current_cusip(cusip)
+            if cusip in out:  # old and new CUSIP in the same filing
+                merged = dict(out[cusip])
+                merged['shares'] = merged.get('shares', 0) + h.get('shares', 0)
+                merged['value'] = merged.get('value', 0) + h.get('value', 0)
+                out[cusip] = merged
+            else:
+                out[cusip] = h
+        return out
+
+    current_map = by_cusip(current_holdings)
+    previous_map = by_cusip(previous_holdings)
     
     all_cusips = set(current_map.keys()) | set(previous_map.keys())
     
@@ -319,6 +337,14 @@ def analyze_whale_changes(current_holdings: list, previous_holdings: list) -> di
             else:
                 total_sold += abs(delta)
     
+    if cusip_index is not None:
+        from cusip_resolver import normalize_cusip
+        resolved = cusip_index.lookup_many([c['cusip'] for c in changes])
+        for c in changes:
+            hit = resolved.get(normalize_cusip(c['cusip']))
+            c['ticker'] = hit['ticker'] if hit else None
+            c['cik'] = hit['cik'] if hit else None
+    
     # Sort by absolute delta
     changes.sort(key=lambda x: abs(x['delta']), reverse=True)
     
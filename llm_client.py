@@ -0,0 +1,332 @@
+"""
+LLM Client - one async interface over the model providers
+Providers are registered by name and created on first use:
+    gemini   google-generativeai (GEMINI_API_KEY)
+    hf       Hugging Face InferenceClient (HUGGINGFACE_API_TOKEN)
+    local    deterministic stand-in, no network: the same messages always
+             give the same reply (tests and offline runs)
+
+Each provider has its own concurrency cap and AdaptiveRateLimiter. Calls
+have a timeout and are retried on 429s (honouring Retry-After), 5xx errors
+and timeouts. Identical requests that are in flight at the same time share
+one call. Calls, latency and tokens are accounted per provider (usage()).
+
+Every call runs on the client's own event loop thread, whether it came from
+acomplete() on some other loop or from the blocking complete(), so the
+semaphores, limiters and in-flight futures only ever belong to that loop.
+
+Settings (env):
+    LLM_TIMEOUT_S, LLM_RETRIES
+    LLM_<PROVIDER>_CONCURRENCY, LLM_<PROVIDER>_MIN_INTERVAL_S, LLM_<PROVIDER>_MODEL
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional
+
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "4"))
+LATENCY_WINDOW = 500  # recent calls kept per provider for percentiles
+
+
+# ============================================
+# RATE LIMITING
+# ============================================
+
+class AdaptiveRateLimiter:
+    """Minimum spacing between calls, adapted from the provider's responses."""
+
+    def __init__(self, name: str, min_interval: float = 0.0, max_interval: float = 60.0,
+                 start_interval: Optional[float] = None):
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval if start_interval is None else start_interval
+        self.next_at = 0.0
+        self.throttled = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait for this caller's slot."""
+        async with self._lock:
+            now = time.monotonic()
+            wait = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def success(self):
+        self.interval = max(self.min_interval, self.interval * 0.9 - 0.05)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """A 429: pause everyone for Retry-After (or the new interval), then go slower."""
+        self.throttled += 1
+        self.interval = min(self.max_interval, max(self.interval * 2, 1.0))
+        pause = retry_after if retry_after is not None else self.interval
+        self.next_at = max(self.next_at, time.monotonic() + pause)
+        print(f"[RateLimit] {self.name}: 429, pausing {pause:.1f}s, interval now {self.interval:.2f}s")
+
+    def snapshot(self) -> Dict:
+        return {"interval_s": round(self.interval, 3), "throttled": self.throttled}
+
+
+def _status(error: Exception) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "status_code", None) or getattr(error, "code", None)
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an HTTP error (requests/httpx/huggingface_hub/google-api-core) was a 429."""
+    status = _status(error)
+    return status == 429 or (status is None and ("429" in str(error) or "ResourceExhausted" in type(error).__name__))
+
+def retry_after(error: Exception) -> Optional[float]:
+    """The response's Retry-After in seconds, when it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def _is_transient(error: Exception) -> bool:
+    """5xx, connection errors and timeouts (including requests/httpx ReadTimeout, which are not TimeoutError)."""
+    status = _status(error)
+    return (isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in type(error).__name__
+            or (isinstance(status, int) and status >= 500))
+
+
+# ============================================
+# PROVIDERS
+# ============================================
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def _prompt_text(messages: List[Dict]) -> str:
+    return "\n\n".join(m["content"] for m in messages)
+
+
+class Provider:
+    """
+    complete() is blocking and runs in a worker thread; it returns (text,
+    prompt_tokens, completion_tokens). timeout_s bounds the HTTP request itself,
+    so a timed-out call does not leave its thread running.
+    """
+    name = ""
+    default_model = ""
+    concurrency = 2
+    min_interval = 0.0
+
+    def complete(self, messages: List[Dict], model: str, max_tokens: int, temperature: float,
+                 timeout_s: float) -> tuple:
+        raise NotImplementedError
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+    default_model = "gemini-1.5-flash"
+    concurrency = 2
+    min_interval = 4.0  # free tier: 15 requests/minute
+
+    def __init__(self):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.genai = genai
+
+    def complete(self, messages, model, max_tokens, temperature, timeout_s):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system") or None
+        prompt = _prompt_text([m for m in messages if m["role"] != "system"])
+        response = self.genai.GenerativeModel(model, system_instruction=system).generate_content(
+            prompt, generation_config={"max_output_tokens": max_tokens, "temperature": temperature},
+            request_options={"timeout": timeout_s})
+        usage = getattr(response, "usage_metadata", None)
+        text = response.text
+        return (text, getattr(usage, "prompt_token_count", None) or estimate_tokens(_prompt_text(messages)),
+                getattr(usage, "candidates_token_count", None) or estimate_tokens(text))
+
+
+class HuggingFaceProvider(Provider):
+    name = "hf"
+    default_model = "meta-llama/Meta-Llama-3-8B-Instruct"
+    concurrency = 2
+    min_interval = 1.0
+
+    def __init__(self):
+        from huggingface_hub import InferenceClient
+        self.InferenceClient = InferenceClient
+        self.clients = {}  # timeout_s -> InferenceClient (the timeout is fixed per client)
+
+    def complete(self, messages, model, max_tokens, temperature, timeout_s):
+        client = self.clients.get(timeout_s)
+        if client is None:
+            client = self.clients[timeout_s] = self.InferenceClient(api_key=os.getenv("HUGGINGFACE_API_TOKEN"),
+                                                                    timeout=timeout_s)
+        response = client.chat_completion(messages=messages, model=model, max_tokens=max_tokens,
+                                          temperature=temperature)
+        text = response.choices[0].message.content
+        usage = getattr(response, "usage", None)
+        return (text, getattr(usage, "prompt_tokens", None) or estimate_tokens(_prompt_text(messages)),
+                getattr(usage, "completion_tokens", None) or estimate_tokens(text))
+
+
+class LocalProvider(Provider):
+    """
+    Offline stand-in. Prompts asking for a JSON array get themes built from the
+    most frequent long words of the text after "TEXT:"; anything else gets a
+    short digest of the prompt. Output depends only on the messages.
+    """
+    name = "local"
+    default_model = "local-stand-in"
+    concurrency = 8
+
+    def complete(self, messages, model, max_tokens, temperature, timeout_s):
+        prompt = _prompt_text(messages)
+        if "JSON array" in prompt:
+            body = prompt.split("TEXT:", 1)[-1]
+            words = Counter(w.lower() for w in re.findall(r"[A-Za-z]{7,}", body))
+            themes = []
+            for word, _ in words.most_common(3):
+                sentence = next((s.strip() for s in re.split(r"(?<=[.!?])\s+", body) if word in s.lower()), "")
+                themes.append({"theme": word.title(), "sentiment": "Neutral", "context": sentence[:300]})
+            text = json.dumps(themes)
+        else:
+            digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+            text = f"[local {digest}] " + " ".join(prompt.split()[:min(60, max_tokens)])
+        return text, estimate_tokens(prompt), estimate_tokens(text)
+
+
+PROVIDERS: Dict[str, Callable[[], Provider]] = {}
+
+def register_provider(name: str, factory: Callable[[], Provider]):
+    """Make a provider available as get_client().acomplete(..., provider=name)."""
+    PROVIDERS[name] = factory
+
+register_provider("gemini", GeminiProvider)
+register_provider("hf", HuggingFaceProvider)
+register_provider("local", LocalProvider)
+
+
+# ============================================
+# CLIENT
+# ============================================
+
+class _ProviderState:
+    def __init__(self, provider: Provider):
+        env = f"LLM_{provider.name.upper()}"
+        self.provider = provider
+        self.model = os.getenv(f"{env}_MODEL", provider.default_model)
+        self.semaphore = asyncio.Semaphore(int(os.getenv(f"{env}_CONCURRENCY", provider.concurrency)))
+        self.limiter = AdaptiveRateLimiter(provider.name, float(os.getenv(f"{env}_MIN_INTERVAL_S", provider.min_interval)))
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = Counter()
+
+
+class LLMClient:
+    """Async completions over registered providers; complete() is the blocking form."""
+
+    def __init__(self, timeout_s: float = LLM_TIMEOUT_S, retries: int = LLM_RETRIES):
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self._states: Dict[str, _ProviderState] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop = None
+        self._lock = threading.Lock()  # guards _loop and _states (model_for() runs on callers' threads)
+
+    def _state(self, name: str) -> _ProviderState:
+        with self._lock:
+            if name not in self._states:
+                if name not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM provider '{name}' (registered: {', '.join(PROVIDERS)})")
+                self._states[name] = _ProviderState(PROVIDERS[name]())
+            return self._states[name]
+
+    def model_for(self, provider: str, model: Optional[str] = None) -> str:
+        """The model a call with these arguments would use."""
+        return model or self._state(provider).model
+
+    def _client_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+        return self._loop
+
+    async def acomplete(self, messages: List[Dict], provider: str = "hf", model: Optional[str] = None,
+                        max_tokens: int = 500, temperature: float = 0.1) -> Dict:
+        """
+        {text, provider, model, prompt_tokens, completion_tokens, latency_s}.
+        Raises the provider's error once retries are exhausted.
+        """
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+            self._acomplete(messages, provider, model, max_tokens, temperature), self._client_loop()))
+
+    async def _acomplete(self, messages: List[Dict], provider: str = "hf", model: Optional[str] = None,
+                         max_tokens: int = 500, temperature: float = 0.1) -> Dict:
+        """acomplete() on the client loop: coalesce identical in-flight requests."""
+        state = self._state(provider)
+        model = model or state.model
+        key = hashlib.sha256(json.dumps([provider, model, messages, max_tokens, temperature]).encode("utf-8")).hexdigest()
+        if key in self._inflight:
+            state.stats["coalesced"] += 1
+            return await asyncio.shield(self._inflight[key])
+
+        task = asyncio.ensure_future(self._call(state, messages, model, max_tokens, temperature))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _call(self, state: _ProviderState, messages, model, max_tokens, temperature) -> Dict:
+        for attempt in range(self.retries + 1):
+            async with state.semaphore:
+                await state.limiter.acquire()
+                t0 = time.monotonic()
+                try:
+                    text, prompt_tokens, completion_tokens = await asyncio.to_thread(
+                        state.provider.complete, messages, model, max_tokens, temperature, self.timeout_s)
+                except Exception as e:
+                    state.stats["errors"] += 1
+                    if attempt == self.retries or not (is_rate_limited(e) or _is_transient(e)):
+                        raise
+                    state.stats["retries"] += 1
+                    if is_rate_limited(e):
+                        state.limiter.throttle(retry_after(e))
+                    else:
+                        await asyncio.sleep(min(2 ** attempt, 30))
+                    continue
+            latency = time.monotonic() - t0
+            state.limiter.success()
+            state.latencies.append(latency)
+            state.stats.update(calls=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            return {"text": text, "provider": state.provider.name, "model": model, "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens, "latency_s": round(latency, 3)}
+
+    async def acomplete_many(self, requests: List[List[Dict]], **kwargs) -> List:
+        """Completions for many message lists concurrently (within the provider's limits); errors are returned in place."""
+        return await asyncio.gather(*(self.acomplete(m, **kwargs) for m in requests), return_exceptions=True)
+
+    def complete(self, messages: List[Dict], **kwargs) -> Dict:
+        """Blocking acomplete() for sync callers (not from inside the client's own loop)."""
+        return asyncio.run_coroutine_threadsafe(self._acomplete(messages, **kwargs), self._client_loop()).result()
+
+    def usage(self) -> Dict:
+        """Per-provider calls, errors, retries, coalesced requests, tokens and latency percentiles."""
+        out = {}
+        for name, state in self._states.items():
+            lat = sorted(state.latencies)
+            out[name] = dict(state.stats, model=state.model, rate_limit=state.limiter.snapshot(),
+                             latency_p50_s=round(lat[len(lat) // 2], 3) if lat else None,
+                             latency_p95_s=round(lat[int(len(lat) * 0.95)], 3) if lat else None)
+        return out
+
+
+_client = None
+
+def get_client() -> LLMClient:
+    global _client
+    if _client is None:
+        _client = LLMClient()
+    return _client
@@ -1,90 +1,150 @@
 import os
 import sys
 import datetime
-import time
 import json
 import asyncio
-import google.generativeai as genai
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
 
 # Add parent directory to path to import sec_client
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 import sec_client
+from llm_client import get_client
+from stage_pipeline import AdaptiveRateLimiter, Pipeline, Stage
+from theme_store import BatchWriter, open_client, processed_accessions
+from filing_sections import build_input
+from llm_cache import get_llm_cache
+from theme_clusters import update_trends
 
 # Load environment variables
 load_dotenv()
 
 # Configuration
-TURSO_DB_URL = os.getenv("TURSO_DATABASE_URL").replace("libsql://", "https://")
+TURSO_DB_URL = (os.getenv("TURSO_DATABASE_URL") or "").replace("libsql://", "https://")
 TURSO_AUTH_TOKEN = os.getenv("TURSO_AUTH_TOKEN")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-START_DATE = "2026-01-01"
-from huggingface_hub import InferenceClient
-
-# Initialize Hugging Face
-HF_API_TOKEN = os.getenv("HUGGINGFACE_API_TOKEN")
-hf_client = InferenceClient(api_key=HF_API_TOKEN)
-model_id = "meta-llama/Meta-Llama-3-8B-Instruct"
-
-async def initialize_schema(client):
-    """Create necessary tables if they don't exist."""
-    print("[DB] Initializing schema...")
-    await client.execute("""
-    CREATE TABLE IF NOT EXISTS filing_themes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        accession_number TEXT,
-        cik TEXT,
-        ticker TEXT,
-        form TEXT,
-        filing_date TEXT,
-        filing_url TEXT, -- Direct link to SEC filing
-        themes TEXT, -- JSON array of themes
-        extracted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(accession_number)
-    )
-    """)
+START_DATE = "2026-01-01"  # never look back before this
 
-    
-    await client.execute("""
-    CREATE TABLE IF NOT EXISTS market_trends (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        period TEXT, -- e.g. "2026-Q1"
-        trend_name TEXT,
-        description TEXT,
-        related_tickers TEXT, -- JSON array
-        frequency INTEGER,
-        generated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-
-def fetch_new_filings(sec):
-    """Fetch all 10-K/10-Q filings since Jan 1, 2026."""
-    new_filings = []
-    print(f"[SEC] Checking GLOBAL filings since {START_DATE}...")
-    
-    # 10-K
-    k_filings = sec.get_latest_filings("10-K", count=40)
-    for f in k_filings:
-        if f['date'] >= START_DATE:
-            new_filings.append(f)
-            print(f"  -> Found {f['form']} for {f['cik']} from {f['date']}")
+# Discovery: page the current-events feed back to a per-form cursor, falling
+# back to the daily form indexes when the feed no longer reaches it
+DISCOVERY_FORMS = ("10-K", "10-Q")
+CURSOR_PATH = os.getenv("DISCOVERY_CURSOR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "discovery_cursor.json"))
+FEED_PAGE_SIZE = 100  # the feed's maximum
+FEED_MAX_PAGES = int(os.getenv("DISCOVERY_FEED_MAX_PAGES", "20"))
+FIRST_RUN_LOOKBACK_DAYS = int(os.getenv("DISCOVERY_LOOKBACK_DAYS", "3"))  # without a cursor
+MAX_ATTEMPTS = int(os.getenv("DISCOVERY_MAX_ATTEMPTS", "3"))  # runs a filing may fail before it is dropped
+
+# Pipeline: concurrency per stage (the LLM provider's own limits live in llm_client)
+DOWNLOAD_WORKERS = int(os.getenv("ANALYZE_DOWNLOAD_WORKERS", "4"))
+CLEAN_WORKERS = int(os.getenv("ANALYZE_CLEAN_WORKERS", "2"))
+LLM_WORKERS = int(os.getenv("ANALYZE_LLM_WORKERS", "2"))
+SEC_MIN_INTERVAL_S = 0.1  # SEC fair access: at most 10 requests/second
+METRICS_PATH = os.getenv("ANALYZE_METRICS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "analyze_metrics.json"))
+METRICS_INTERVAL_S = 15
+
+# Theme extraction model (hf = Llama 3 8B Instruct; "local" runs offline)
+THEME_PROVIDER = os.getenv("THEME_LLM_PROVIDER", "hf")
+THEME_MODEL = os.getenv("THEME_LLM_MODEL") or None  # None: the provider's default
+PROMPT_VERSION = "themes-v2"  # bump when the prompt or parse_themes changes (invalidates the LLM cache)
+
+def load_cursor():
+    """
+    {form: {"accepted": last acceptance timestamp seen, "accessions": [filed at exactly that time],
+            "retry": [filings that did not reach persist, with their "attempts"]}}
+    """
+    if os.path.exists(CURSOR_PATH):
+        with open(CURSOR_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_cursor(cursor):
+    os.makedirs(os.path.dirname(CURSOR_PATH), exist_ok=True)
+    tmp = CURSOR_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cursor, f, indent=2)
+    os.replace(tmp, CURSOR_PATH)
+
+def _initial_cursor():
+    start = (datetime.date.today() - datetime.timedelta(days=FIRST_RUN_LOOKBACK_DAYS)).isoformat()
+    return {"accepted": f"{max(start, START_DATE)}T00:00:00", "accessions": []}
+
+def discover_form(sec, form, since):
+    """
+    Every form filing accepted after the cursor, newest first, and the cursor
+    to store once they are processed. Overlap with earlier runs is harmless
+    (unprocessed() drops it); gaps are not, so when the feed ends before the
+    cursor the missing days are read from the daily indexes.
+    """
+    found = {}
+    reached = False
+    oldest = None
+    for page in range(FEED_MAX_PAGES):
+        entries = sec.get_current_filings(form, start=page * FEED_PAGE_SIZE, count=FEED_PAGE_SIZE)
+        for f in entries:
+            oldest = f['accepted'] if oldest is None else min(oldest, f['accepted'])
+            if f['accepted'] < since['accepted'] or (f['accepted'] == since['accepted'] and f['accession'] in since['accessions']):
+                reached = True
+            else:
+                found.setdefault(f['accession'], f)
+        if reached or len(entries) < FEED_PAGE_SIZE:
+            break
 
-    # 10-Q
-    q_filings = sec.get_latest_filings("10-Q", count=40)
-    for f in q_filings:
-        if f['date'] >= START_DATE:
+    if not reached:
+        day = datetime.date.fromisoformat(since['accepted'][:10])
+        last = datetime.date.fromisoformat(oldest[:10]) if oldest else datetime.date.today()
+        print(f"[SEC] Feed ends before the {form} cursor; reading daily indexes {day} to {last}")
+        while day <= last:
+            for f in sec.get_daily_index(form, day.isoformat()):
+                found.setdefault(f['accession'], f)
+            day += datetime.timedelta(days=1)
+
+    latest = max([since['accepted']] + [f['accepted'] for f in found.values()])
+    at_latest = [f['accession'] for f in found.values() if f['accepted'] == latest]
+    cursor = {"accepted": latest, "accessions": at_latest + (since['accessions'] if latest == since['accepted'] else [])}
+    return list(found.values()), cursor
+
+def fetch_new_filings(sec, cursor):
+    """
+    All 10-K/10-Q filings accepted since the cursor plus the ones that failed
+    last run, and the advanced cursor. Every returned filing starts out in
+    its form's retry list; settle_cursor() keeps only those that failed.
+    """
+    new_filings, advanced = [], {}
+    for form in DISCOVERY_FORMS:
+        since = cursor.get(form) or _initial_cursor()
+        print(f"[SEC] Checking GLOBAL {form} filings since {since['accepted']}...")
+        filings, advanced[form] = discover_form(sec, form, since)
+        for f in filings:
             new_filings.append(f)
             print(f"  -> Found {f['form']} for {f['cik']} from {f['date']}")
-                
-    return new_filings
+        found = {f['accession'] for f in filings}
+        retry = [f for f in since.get('retry', []) if f['accession'] not in found]
+        if retry:
+            print(f"[SEC] Retrying {len(retry)} {form} filings that failed last run")
+        new_filings.extend(retry)
+        advanced[form]['retry'] = retry + filings
+    return new_filings, advanced
 
-def extract_themes(text):
-    """Extract themes using Hugging Face Zephyr."""
-    
-    # Construct Message
-    messages = [
+def settle_cursor(advanced, failed):
+    """Keep only the failed accessions in each retry list, giving up after MAX_ATTEMPTS runs."""
+    for form_cursor in advanced.values():
+        retry = []
+        for f in form_cursor.get('retry', []):
+            if f['accession'] not in failed:
+                continue
+            attempts = f.get('attempts', 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                print(f"[SEC] Giving up on {f['ticker']} {f['accession']} after {attempts} attempts")
+                continue
+            retry.append(dict(f, attempts=attempts))
+        form_cursor['retry'] = retry
+    return advanced
+
+def theme_messages(text):
+    """Chat messages asking the model for the filing's themes."""
+    return [
         {"role": "system", "content": "You are a financial analyst. Your job is to extract UNIQUE, SPECIFIC themes from the provided text. Do NOT copy examples. If the text does not mention AI, do not invent it."},
-        {"role": "user", "content": f"""Analyze the provided text from a corporate filing (10-K/10-Q). 
+        {"role": "user", "content": f"""Analyze the provided excerpts from a corporate filing (10-K/10-Q), grouped by section. 
         Identify the top 3-5 specific strategic themes, risks, or operational focus areas mentioned in THIS text.
 
         Rules:
@@ -100,109 +160,181 @@ def extract_themes(text):
 
 
         TEXT:
-        {text[:15000]}
+        {text}
         """}
     ]
+
+def parse_themes(content):
+    """JSON theme array from the model's reply ([] if it didn't return one)."""
+    # Find JSON array start/end
+    start = content.find('[')
+    end = content.rfind(']')
     
-    try:
-        response = hf_client.chat_completion(
-            messages=messages,
-            model=model_id,
-            max_tokens=500,
-            temperature=0.1
-        )
-        content = response.choices[0].message.content
-        
-        # Debug: Print raw content if parsing fails
-        # Find JSON array start/end
-        start = content.find('[')
-        end = content.rfind(']')
+    if start != -1 and end != -1 and end > start:
+        json_str = content[start:end+1]
+        return json.loads(json_str)
         
-        if start != -1 and end != -1 and end > start:
-            json_str = content[start:end+1]
-            return json.loads(json_str)
-            
-        print(f"[AI] Parsing Error. Raw content: {content[:200]}...")
-        return []
+    print(f"[AI] Parsing Error. Raw content: {content[:200]}...")
+    return []
+
+def _cache_model():
+    return f"{THEME_PROVIDER}:{get_client().model_for(THEME_PROVIDER, THEME_MODEL)}"
+
+def cached_themes(text):
+    """Themes for this model input from the LLM cache (None on a miss)."""
+    cache = get_llm_cache()
+    content = cache.get(_cache_model(), PROMPT_VERSION, text) if cache else None
+    return None if content is None else parse_themes(content)
+
+def _store_themes(text, content):
+    themes = parse_themes(content)
+    cache = get_llm_cache()
+    if themes and cache:  # don't pin a bad reply; a miss retries it next run
+        cache.put(_cache_model(), PROMPT_VERSION, text, content)
+    return themes
+
+async def request_themes(text):
+    """One model call (retried by llm_client); errors propagate once retries run out."""
+    result = await get_client().acomplete(theme_messages(text), provider=THEME_PROVIDER, model=THEME_MODEL,
+                                          max_tokens=500, temperature=0.1)
+    return _store_themes(text, result["text"])
 
+def extract_themes(text, form="10-K"):
+    """Extract themes with the configured LLM provider (blocking)."""
+    text = build_input(text, form)
+    try:
+        themes = cached_themes(text)
+        if themes is not None:
+            return themes
+        result = get_client().complete(theme_messages(text), provider=THEME_PROVIDER, model=THEME_MODEL,
+                                       max_tokens=500, temperature=0.1)
+        return _store_themes(text, result["text"])
     except Exception as e:
         print(f"[AI] Error extracting themes: {e}")
         return []
 
+async def unprocessed(client, filings):
+    """Filings not yet in filing_themes (one query for the whole batch)."""
+    done = await processed_accessions(client, [f['accession'] for f in filings])
+    pending, seen = [], set()
+    for filing in filings:
+        if filing['accession'] in done:
+            print(f"[Skip] Already processed {filing['ticker']} {filing['accession']}")
+        elif filing['accession'] not in seen:
+            seen.add(filing['accession'])
+            pending.append(filing)
+    return pending
+
+def build_pipeline(client, sec, clean_pool, no_themes=None):
+    """
+    download -> clean -> llm -> persist -> index, each stage with its own concurrency.
+    Accessions the model found no themes in are added to no_themes: they are
+    dropped, but (unlike download or LLM errors) retrying would not change that.
+    """
+    no_themes = set() if no_themes is None else no_themes
+    loop = asyncio.get_running_loop()
+    writer = BatchWriter(client)
+    sec_limiter = AdaptiveRateLimiter("SEC", min_interval=SEC_MIN_INTERVAL_S)
+
+    async def download(filing):
+        print(f"[Process] Analyzing {filing['ticker']} {filing['form']}...")
+        if not filing.get('url'):  # discovery leaves the index page lookup to here
+            await sec_limiter.acquire()
+            filing = await asyncio.to_thread(sec.resolve_filing, filing)
+        await sec_limiter.acquire()
+        html = await asyncio.to_thread(sec.fetch_filing_html, filing['url'])
+        if not html:
+            print(f"  -> Failed to download text ({filing['accession']})")
+            return None
+        return dict(filing, html=html)
+
+    async def clean(filing):
+        text = await loop.run_in_executor(clean_pool, sec_client.clean_filing_html, filing.pop('html'))
+        # DEBUG: Save first text to file to inspect content
+        if not os.path.exists("debug_text.txt"):
+            with open("debug_text.txt", "w", encoding="utf-8") as f:
+                f.write(text[:20000])
+            print("[DEBUG] Saved debug_text.txt")
+        # Best sections within the token budget; this is also the LLM cache key
+        text = await asyncio.to_thread(build_input, text, filing['form'], filing)
+        return dict(filing, text=text)
+
+    async def analyze(filing):
+        text = filing.pop('text')
+        themes = await asyncio.to_thread(cached_themes, text)
+        if themes is not None:
+            print(f"  -> {len(themes)} cached themes for {filing['ticker']}")
+            if not themes:
+                no_themes.add(filing['accession'])
+                return None
+            return dict(filing, themes=themes)
+        try:
+            themes = await request_themes(text)
+        except Exception as e:
+            print(f"[AI] Error extracting themes for {filing['accession']}: {e}")
+            return None
+        if not themes:
+            no_themes.add(filing['accession'])
+            return None
+        print(f"  -> Extracted {len(themes)} themes for {filing['ticker']}")
+        return dict(filing, themes=themes)
+
+    async def persist(filing):
+        await writer.write(filing)  # returns once the batch holding it is committed
+        return filing
+
+    async def index(filing):
+        # Store themes in vector database for semantic search
+        try:
+            from vector_store import add_themes, themes_from_filing
+            indexed = await asyncio.to_thread(add_themes, themes_from_filing(
+                filing['accession'], filing['ticker'], filing['form'],
+                filing['date'], filing.get('url', ''), filing['themes']
+            ))
+            print(f"  -> Indexed {indexed} themes in vector store")
+        except Exception as ve:
+            print(f"  -> Vector store error (non-fatal): {ve}")
+        return filing
+
+    return Pipeline([
+        Stage("download", download, DOWNLOAD_WORKERS),
+        Stage("clean", clean, CLEAN_WORKERS),
+        Stage("llm", analyze, LLM_WORKERS),
+        Stage("persist", persist, writer.batch_size),  # one worker per batch slot
+        Stage("index", index, 1),  # the vector store has a single writer
+    ], metrics_path=METRICS_PATH, metrics_interval_s=METRICS_INTERVAL_S,
+        extra_metrics=lambda: {"rate_limits": {"sec": sec_limiter.snapshot()}, "llm": get_client().usage(),
+                               "db_batches": writer.batches,
+                               "llm_cache": get_llm_cache().stats() if get_llm_cache() else None})
+
 async def main():
     print(f"--- Starting Corporate Theme Analysis ({datetime.datetime.now()}) ---")
-    import libsql_client
-
-    if not TURSO_DB_URL or not TURSO_AUTH_TOKEN:
-        print("Missing TURSO credentials")
-        return
 
-    # Using the Async Client context manager
-    async with libsql_client.create_client(TURSO_DB_URL, auth_token=TURSO_AUTH_TOKEN) as client:
-        await initialize_schema(client)
+    # Turso with a local read replica, or local-only without credentials (schema included)
+    async with open_client(TURSO_DB_URL, TURSO_AUTH_TOKEN) as client:
         
         # 1. Setup SEC Client (Sync)
         sec = sec_client.SECClient(use_proxies=False)
         
         # 2. Find Filings
-        filings = fetch_new_filings(sec)
+        cursor = load_cursor()
+        discovered, advanced = fetch_new_filings(sec, cursor)
+        filings = await unprocessed(client, discovered)
         print(f"[Pipeline] Found {len(filings)} relevant filings to process.")
         
         # 3. Process Filings
-        for filing in filings:
-            # Check if already processed
-            rs = await client.execute("SELECT 1 FROM filing_themes WHERE accession_number = ?", [filing['accession']])
-            if rs.rows:
-                print(f"[Skip] Already processed {filing['ticker']} {filing['accession']}")
-                continue
-                
-            print(f"[Process] Analyzing {filing['ticker']} {filing['form']}...")
-            
-            # Download text (Sync)
-            text = sec.download_filing(filing['url'])
-            if not text:
-                print("  -> Failed to download text")
-                continue
-                
-            # DEBUG: Save first text to file to inspect content
-            if not os.path.exists("debug_text.txt"):
-                with open("debug_text.txt", "w", encoding="utf-8") as f:
-                    f.write(text[:20000])
-                print("[DEBUG] Saved debug_text.txt")
-
-            # Extract Themes (Sync - Hugging Face)
-            themes = extract_themes(text)
-            
-            if themes:
-                print(f"  -> Extracted {len(themes)} themes")
-                await client.execute(
-                    "INSERT INTO filing_themes (accession_number, cik, ticker, form, filing_date, filing_url, themes) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                    [filing['accession'], filing['cik'], filing['ticker'], filing['form'], filing['date'], filing['url'], json.dumps(themes)]
-                )
-                
-                # Store themes in vector database for semantic search
-                try:
-                    from vector_store import add_theme
-                    for idx, t in enumerate(themes):
-                        theme_id = f"{filing['accession']}_{idx}"
-                        add_theme(
-                            theme_id=theme_id,
-                            ticker=filing['ticker'],
-                            form=filing['form'],
-                            date=filing['date'],
-                            theme_name=t.get('theme', ''),
-                            context=t.get('context', ''),
-                            filing_url=filing.get('url', '')
-                        )
-                    print(f"  -> Indexed {len(themes)} themes in vector store")
-                except Exception as ve:
-                    print(f"  -> Vector store error (non-fatal): {ve}")
-
-            
-            print("  -> Sleeping 20s for rate limit...")
-            time.sleep(20)
-                
-                
+        no_themes = set()
+        with ProcessPoolExecutor(CLEAN_WORKERS) as clean_pool:
+            done = await build_pipeline(client, sec, clean_pool, no_themes).run(filings)
+        print(f"[Pipeline] Stored themes for {len(done)} filings.")
+        # Only after the run, so a crash rediscovers the same filings; the ones
+        # dropped before persist by download, resolve or LLM errors are retried
+        failed = {f['accession'] for f in filings} - {f['accession'] for f in done} - no_themes
+        save_cursor(settle_cursor(advanced, failed))
+
+        # 4. Fold the newly indexed themes into the trend clusters
+        await update_trends(client)
+
         print("--- Analysis Cycle Complete ---")
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+"""
+Approximate Nearest-Neighbour Index (IVF-Flat) for the vector store
+Pure NumPy inverted-file index: spherical k-means centroids partition the
+unit-normalized embeddings into lists; a query scores only the `nprobe`
+closest lists and rescores those rows exactly from the memory-mapped segments.
+
+Persisted next to the collection as vector_store/<collection>/ivf.npz, tagged
+with the manifest epoch it was built against (compaction renumbers rows, so an
+index from an older epoch is ignored until rebuilt). Deleted rows stay in the
+lists and are filtered out at query time.
+Recall/latency is tuned with nprobe (more lists probed = higher recall).
+"""
+import os
+import numpy as np
+from typing import List, Optional
+
+DEFAULT_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+TRAIN_SAMPLE = 100_000
+KMEANS_ITERATIONS = 12
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def default_nlist(n_rows: int) -> int:
+    """Rule of thumb: ~4 * sqrt(N) lists."""
+    return max(1, min(65536, int(4 * np.sqrt(max(n_rows, 1)))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (max inner product) for each row, in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the rows."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_idx = np.sort(rng.choice(n, size=min(n, TRAIN_SAMPLE), replace=False))
+    sample = np.asarray(vectors[sample_idx], dtype=np.float32)
+    nlist = min(nlist, len(sample))
+
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty lists from random rows so every list stays useful
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file index over the first `indexed_count` rows of a collection."""
+
+    def __init__(self, centroids: np.ndarray, lists: List[np.ndarray], indexed_count: int,
+                 trained_count: int, epoch: int = 0):
+        self.centroids = centroids
+        self.lists = lists
+        self.indexed_count = indexed_count
+        self.trained_count = trained_count
+        self.epoch = epoch
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None, epoch: int = 0) -> "IVFIndex":
+        """Train centroids and assign every row of an in-memory matrix."""
+        index = cls.train(embeddings, nlist or default_nlist(len(embeddings)), len(embeddings), epoch)
+        index.add(embeddings, 0)
+        return index
+
+    @classmethod
+    def train(cls, sample: np.ndarray, nlist: int, trained_count: int, epoch: int = 0) -> "IVFIndex":
+        """Empty index with centroids trained on a sample of a `trained_count`-row store; fill it with add()."""
+        centroids = train_centroids(sample, nlist)
+        return cls(centroids, [np.zeros(0, dtype=np.int64) for _ in range(len(centroids))], 0, trained_count, epoch)
+
+    def add(self, vectors: np.ndarray, first_row: int):
+        """Insert a block of consecutive rows, starting at global row `first_row`."""
+        if not len(vectors):
+            return
+        labels = _assign(vectors, self.centroids)
+        rows = np.arange(first_row, first_row + len(vectors), dtype=np.int64)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        for lst in np.unique(labels):
+            self.lists[lst] = np.concatenate([self.lists[lst], rows[order[bounds[lst]:bounds[lst + 1]]]])
+        self.indexed_count = first_row + len(vectors)
+
+    def needs_retrain(self) -> bool:
+        """Centroids trained on a much smaller store no longer balance the lists."""
+        return self.indexed_count > 4 * max(self.trained_count, 1)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids in the nprobe lists closest to a unit query."""
+        nprobe = min(nprobe, self.nlist)
+        coarse = self.centroids @ query
+        probe = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+        return np.concatenate([self.lists[p] for p in probe])
+
+    def save(self, path: str):
+        sizes = np.array([len(l) for l in self.lists], dtype=np.int64)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, centroids=self.centroids, ids=np.concatenate(self.lists) if self.lists else np.zeros(0, np.int64),
+                 sizes=sizes, counts=np.array([self.indexed_count, self.trained_count, self.epoch], dtype=np.int64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IVFIndex"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            bounds = np.concatenate([[0], np.cumsum(data["sizes"])])
+            ids = data["ids"]
+            lists = [ids[bounds[i]:bounds[i + 1]] for i in range(len(data["sizes"]))]
+            counts = [int(x) for x in data["counts"]]
+            epoch = counts[2] if len(counts) > 2 else -1  # pre-segment index: always stale
+            return cls(data["centroids"], lists, counts[0], counts[1], epoch)
+
+
+if __name__ == "__main__":
+    import sys
+    sys.path.insert(0, os.path.dirname(__file__))
+    import vector_store
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "sync"):
+        print("Usage: ann_index.py build [nlist] | sync")
+        sys.exit(1)
+
+    if sys.argv[1] == "build":
+        nlist = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        idx = vector_store.build_ann_index(nlist=nlist)
+    else:
+        idx = vector_store.sync_ann_index()
+    if idx:
+        print(f"IVF index: {idx.nlist} lists over {idx.indexed_count} rows")
@@ -1,5 +1,9 @@
 """
 Backfill existing themes from Turso into the vector store.
+filing_themes is read in pages and each page's themes are embedded in one batch
+and written in one commit, so memory stays flat however large the table is.
+Theme ids are accession-based, so re-running only adds themes that are not
+indexed yet.
 """
 import os
 import sys
@@ -8,49 +12,34 @@ import asyncio
 from dotenv import load_dotenv
 
 sys.path.insert(0, os.path.dirname(__file__))
-from vector_store import add_theme, get_stats
+from vector_store import add_themes, themes_from_filing, get_stats
+from theme_store import iter_filing_themes, open_client
 
 load_dotenv()
 
-TURSO_DB_URL = os.getenv("TURSO_DATABASE_URL").replace("libsql://", "https://")
+TURSO_DB_URL = (os.getenv("TURSO_DATABASE_URL") or "").replace("libsql://", "https://")
 TURSO_AUTH_TOKEN = os.getenv("TURSO_AUTH_TOKEN")
 
 async def backfill():
-    import libsql_client
-    
-    async with libsql_client.create_client(TURSO_DB_URL, auth_token=TURSO_AUTH_TOKEN) as client:
-        print("[Backfill] Fetching themes from Turso...")
-        rs = await client.execute("SELECT accession_number, ticker, form, filing_date, filing_url, themes FROM filing_themes")
-        
-        total = 0
-        for row in rs.rows:
-            accession = row[0]
-            ticker = row[1] or "UNKNOWN"
-            form = row[2]
-            date = row[3]
-            url = row[4] or ""
-            themes_json = row[5]
+    async with open_client(TURSO_DB_URL, TURSO_AUTH_TOKEN) as client:
+        print("[Backfill] Streaming themes...")
+        filings = found = total = 0
+        async for page in iter_filing_themes(client):
+            records = []
+            for row in page:
+                try:
+                    themes = json.loads(row["themes"])
+                    records.extend(themes_from_filing(row["accession"], row["ticker"] or "UNKNOWN", row["form"],
+                                                      row["date"], row["url"] or "", themes))
+                except Exception as e:
+                    print(f"  -> Error processing {row['accession']}: {e}")
             
-            try:
-                themes = json.loads(themes_json)
-                for idx, t in enumerate(themes):
-                    theme_id = f"{accession}_{idx}"
-                    add_theme(
-                        theme_id=theme_id,
-                        ticker=ticker,
-                        form=form,
-                        date=date,
-                        theme_name=t.get('theme', ''),
-                        context=t.get('context', ''),
-                        filing_url=url
-                    )
-                    total += 1
-                    if total % 10 == 0:
-                        print(f"  -> Indexed {total} themes...")
-            except Exception as e:
-                print(f"  -> Error processing {accession}: {e}")
+            filings += len(page)
+            found += len(records)
+            total += add_themes(records)
+            print(f"[Backfill] {filings} filings, {found} themes read, {total} new")
         
-        print(f"\n[Backfill] Complete! Indexed {total} themes.")
+        print(f"\n[Backfill] Complete! Indexed {total} new themes ({found - total} already indexed).")
         print(f"Stats: {get_stats()}")
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+ANN Benchmark - recall@10 vs latency of the IVF index against exact search
+Builds a synthetic clustered store (embeddings of real text cluster by topic,
+so uniform random vectors would understate IVF recall) in a temp directory.
+
+Usage: python scripts/bench_ann.py [n_chunks] [n_queries]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import vector_store
+
+
+def build_clustered_store(n_chunks: int, n_topics: int = 2000, batch: int = 100_000):
+    rng = np.random.default_rng(0)
+    topics = vector_store.normalize_rows(rng.standard_normal((n_topics, vector_store.EMBEDDING_DIM)))
+    for start in range(0, n_chunks, batch):
+        size = min(batch, n_chunks - start)
+        labels = rng.integers(0, n_topics, size)
+        vectors = topics[labels] + 0.08 * rng.standard_normal((size, vector_store.EMBEDDING_DIM), dtype=np.float32)
+        rows = [{"id": f"bench_{start + i}", "company": f"Company {(start + i) % 500}",
+                 "period": "Q1 2026", "text": "", "source_file": "", "position": start + i}
+                for i in range(size)]
+        vector_store._append_rows(vector_store.DEFAULT_COLLECTION, rows, vectors)
+    return topics
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    top_k = 10
+    collection = vector_store.DEFAULT_COLLECTION
+
+    tmp = tempfile.mkdtemp()
+    vector_store.STORE_DIR = tmp
+    vector_store.LEGACY_STORE_PATH = os.path.join(tmp, "none.json")
+    vector_store.ANN_MIN_ROWS = 0
+    try:
+        topics = build_clustered_store(n_chunks)
+        rng = np.random.default_rng(1)
+        queries = vector_store.normalize_rows(
+            topics[rng.integers(0, len(topics), n_queries)]
+            + 0.1 * rng.standard_normal((n_queries, vector_store.EMBEDDING_DIM)))
+
+        t0 = time.perf_counter()
+        vector_store.build_ann_index(collection)
+        print(f"Index build: {time.perf_counter() - t0:.1f}s")
+
+        t0 = time.perf_counter()
+        truth = [vector_store._search_vectors(collection, q[None, :], top_k, exact=True)[0][0] for q in queries]
+        exact_ms = (time.perf_counter() - t0) / n_queries * 1000
+        print(f"\n{'nprobe':>8} {'recall@10':>10} {'ms/query':>10}")
+        print(f"{'exact':>8} {1.0:>10.3f} {exact_ms:>10.1f}")
+
+        for nprobe in (1, 2, 4, 8, 16, 32, 64):
+            t0 = time.perf_counter()
+            found = [vector_store._search_vectors(collection, q[None, :], top_k, nprobe=nprobe)[0][0] for q in queries]
+            ms = (time.perf_counter() - t0) / n_queries * 1000
+            recall = np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found, truth)])
+            print(f"{nprobe:>8} {recall:>10.3f} {ms:>10.1f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
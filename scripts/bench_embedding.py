@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Embedding Benchmark - ingest throughput in chunks/second
+Compares the original path (SentenceTransformer.encode on the whole list with
+default settings) against the embedding runtimes: torch with length-bucketed
+batches, ONNX (when an export exists at EMBEDDING_ONNX_PATH) and the process pool.
+
+Usage: python scripts/bench_embedding.py [document] [n_chunks]
+Without a document, filing-like sentences of mixed length are generated.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import embedding_runtime
+from document_processor import chunk_text, extract_text
+
+
+def sample_chunks(path: str, n_chunks: int):
+    if path:
+        chunks = [c["text"] for c in chunk_text(extract_text(path))]
+    else:
+        rng = np.random.default_rng(0)
+        words = ("revenue margin liquidity covenant impairment goodwill segment guidance "
+                 "material weakness auditor lease derivative hedging inventory backlog").split()
+        # Real chunks are mostly full 500-char windows plus short tails and headings
+        lengths = rng.choice([12, 40, 85], size=n_chunks, p=[0.15, 0.15, 0.7])
+        chunks = [" ".join(rng.choice(words, size=n)) for n in lengths]
+    return (chunks * (n_chunks // max(len(chunks), 1) + 1))[:n_chunks]
+
+
+def timed(label: str, encode, texts):
+    encode(texts[:8])  # warm-up: model load, graph optimisation
+    t0 = time.perf_counter()
+    vectors = encode(texts)
+    rate = len(texts) / (time.perf_counter() - t0)
+    print(f"{label:<34} {rate:10.1f} chunks/s")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].isdigit() else None
+    n_chunks = int(sys.argv[-1]) if sys.argv[-1].isdigit() else 4096
+    texts = sample_chunks(path, n_chunks)
+    print(f"{len(texts)} chunks, {embedding_runtime.THREADS} threads\n")
+
+    from sentence_transformers import SentenceTransformer
+    baseline_model = SentenceTransformer(embedding_runtime.EMBEDDING_MODEL_ID, device="cpu")
+    baseline = timed("current (encode, defaults)", baseline_model.encode, texts)
+
+    torch_rt = embedding_runtime.TorchRuntime()
+    timed("torch, length-bucketed", torch_rt.encode, texts)
+
+    model_file = embedding_runtime._onnx_model_file(embedding_runtime.ONNX_PATH)
+    if os.path.exists(model_file):
+        onnx = timed(f"onnx ({os.path.basename(model_file)})", embedding_runtime.OnnxRuntime().encode, texts)
+        cosine = np.sum(baseline * onnx, axis=1) / (np.linalg.norm(baseline, axis=1) * np.linalg.norm(onnx, axis=1))
+        print(f"{'  agreement with torch (min cos)':<34} {cosine.min():10.4f}")
+    else:
+        print(f"onnx: skipped, no export at {embedding_runtime.ONNX_PATH}")
+
+    workers = max(2, (os.cpu_count() or 2) // 2)
+    embedding_runtime.WORKERS = workers
+    embedding_runtime.POOL_MIN_TEXTS = 0
+    pooled = embedding_runtime.EmbeddingRuntime()
+    timed(f"{embedding_runtime.RUNTIME} + pool of {workers} processes", pooled.encode, texts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Lexical Index Benchmark - BM25 build and query cost at store scale
+Generates Zipf-distributed chunk text (so common terms have long postings, as
+in real filings) and times segment index builds and lexical/hybrid queries.
+
+Usage: python scripts/bench_lexical.py [n_chunks] [n_queries]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import vector_store
+
+VOCAB = 50_000
+WORDS_PER_CHUNK = 80
+
+
+def build_text_store(n_chunks: int, batch: int = 100_000):
+    rng = np.random.default_rng(0)
+    for start in range(0, n_chunks, batch):
+        size = min(batch, n_chunks - start)
+        words = np.minimum(rng.zipf(1.2, size=(size, WORDS_PER_CHUNK)), VOCAB)
+        vectors = rng.standard_normal((size, vector_store.EMBEDDING_DIM), dtype=np.float32)
+        rows = [{"id": f"bench_{start + i}", "company": f"Company {(start + i) % 500}", "period": "Q1 2026",
+                 "text": " ".join(f"w{w}" for w in words[i]), "source_file": "", "position": start + i}
+                for i in range(size)]
+        vector_store._append_rows(vector_store.DEFAULT_COLLECTION, rows, vectors)
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    collection = vector_store.DEFAULT_COLLECTION
+
+    tmp = tempfile.mkdtemp()
+    vector_store.STORE_DIR = tmp
+    vector_store.LEGACY_STORE_PATH = os.path.join(tmp, "none.json")
+    try:
+        t0 = time.perf_counter()
+        build_text_store(n_chunks)
+        print(f"Built {n_chunks:,} chunks (segments + BM25 index) in {time.perf_counter() - t0:.1f}s")
+
+        snap = vector_store._snapshot(collection)
+        lex_bytes = sum(os.path.getsize(os.path.join(snap.dir, "segments", s["name"], f))
+                        for s in snap.segments for f in ("lex.docs.bin", "lex.tfs.bin", "lex.terms.json"))
+        print(f"Lexical index size: {lex_bytes / 1e6:.1f} MB ({lex_bytes / n_chunks:.1f} B/chunk)")
+
+        t0 = time.perf_counter()
+        for i in range(len(snap.segments)):
+            snap.lexical(i)
+        print(f"Term dictionaries loaded in {(time.perf_counter() - t0) * 1000:.0f} ms (once per process)")
+
+        rng = np.random.default_rng(1)
+        for label, lo, hi in (("rare terms", 1000, VOCAB), ("common terms", 1, 20)):
+            queries = [" ".join(f"w{w}" for w in rng.integers(lo, hi, 3)) for _ in range(n_queries)]
+            t0 = time.perf_counter()
+            for q in queries:
+                vector_store._search_lexical(snap, q, 10, None)
+            print(f"BM25 query, {label:<13} {(time.perf_counter() - t0) / n_queries * 1000:8.1f} ms/query")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Quantization Benchmark - memory footprint, throughput and recall@10
+Compares the float32 exact scan with int8 and binary first-pass scans
+(followed by exact float rescoring) on a synthetic clustered store.
+
+Usage: python scripts/bench_quantization.py [n_chunks] [n_queries]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import vector_store
+import quantization
+from bench_ann import build_clustered_store
+
+SCANNED_FILES = {
+    "none": ("embeddings.bin",),
+    "int8": ("embeddings.i8", "scales.f32"),
+    "binary": ("embeddings.b1",),
+}
+
+
+def scanned_bytes(collection: str, mode: str) -> int:
+    """Bytes the first pass reads for a full scan (the working set that must stay in page cache)."""
+    snap = vector_store._snapshot(collection)
+    total = 0
+    for seg in snap.segments:
+        seg_dir = os.path.join(snap.dir, "segments", seg["name"])
+        total += sum(os.path.getsize(os.path.join(seg_dir, f)) for f in SCANNED_FILES[mode])
+    return total
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    top_k = 10
+    collection = vector_store.DEFAULT_COLLECTION
+
+    tmp = tempfile.mkdtemp()
+    vector_store.STORE_DIR = tmp
+    vector_store.LEGACY_STORE_PATH = os.path.join(tmp, "none.json")
+    try:
+        topics = build_clustered_store(n_chunks)
+        rng = np.random.default_rng(1)
+        queries = vector_store.normalize_rows(
+            topics[rng.integers(0, len(topics), n_queries)]
+            + 0.1 * rng.standard_normal((n_queries, vector_store.EMBEDDING_DIM)))
+
+        truth = vector_store._search_vectors(collection, queries, top_k, exact=True)
+
+        print(f"{'mode':>8} {'rescore':>8} {'MB scanned':>11} {'B/vector':>9} {'queries/s':>10} {'recall@10':>10}")
+        for mode, factors in (("none", (None,)), ("int8", (2, 8)), ("binary", (8, 32))):
+            size = scanned_bytes(collection, mode)
+            for factor in factors:
+                if factor:
+                    quantization.RESCORE_FACTOR = factor
+                t0 = time.perf_counter()
+                found = vector_store._search_vectors(collection, queries, top_k, quant=mode, exact=mode == "none")
+                qps = n_queries / (time.perf_counter() - t0)
+                recall = np.mean([len(set(f[0]) & set(t[0])) / top_k for f, t in zip(found, truth)])
+                print(f"{mode:>8} {factor or '-':>8} {size / 1e6:>11.1f} {size / n_chunks:>9.1f} "
+                      f"{qps:>10.1f} {recall:>10.3f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Vector Search Benchmark
+Builds a synthetic store (default 1M x 384 chunks) in a temp directory and
+compares the old per-row cosine loop against the vectorized top-k scan.
+
+Usage: python scripts/bench_vector_search.py [n_chunks] [n_queries]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import vector_store
+
+
+def build_synthetic_store(n_chunks: int, n_companies: int = 500, batch: int = 100_000):
+    """Fill the store with random unit vectors, bypassing the embedding model."""
+    rng = np.random.default_rng(0)
+    for start in range(0, n_chunks, batch):
+        size = min(batch, n_chunks - start)
+        vectors = rng.standard_normal((size, vector_store.EMBEDDING_DIM), dtype=np.float32)
+        rows = [{"id": f"bench_{start + i}", "company": f"Company {(start + i) % n_companies}",
+                 "period": "Q1 2026", "text": "", "source_file": "", "position": start + i}
+                for i in range(size)]
+        vector_store._append_rows(vector_store.DEFAULT_COLLECTION, rows, vectors)
+
+
+def legacy_loop(embeddings: np.ndarray, n_rows: int, query: np.ndarray, top_k: int, sample: int) -> float:
+    """Seconds per query for the old Python loop, extrapolated from `sample` rows."""
+    start = time.perf_counter()
+    sims = []
+    for i in range(sample):
+        a, b = np.array(query), np.array(embeddings[i])
+        sims.append((i, float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))))
+    sims.sort(key=lambda x: x[1], reverse=True)
+    return (time.perf_counter() - start) * n_rows / sample
+
+
+def main():
+    n_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    top_k = 10
+
+    tmp = tempfile.mkdtemp()
+    vector_store.STORE_DIR = tmp
+    vector_store.LEGACY_STORE_PATH = os.path.join(tmp, "none.json")
+    try:
+        t0 = time.perf_counter()
+        build_synthetic_store(n_chunks)
+        print(f"Built {n_chunks:,} chunk store in {time.perf_counter() - t0:.1f}s")
+
+        snap = vector_store._snapshot(vector_store.DEFAULT_COLLECTION)
+        queries = vector_store.normalize_rows(
+            np.random.default_rng(1).standard_normal((n_queries, vector_store.EMBEDDING_DIM)))
+
+        first = snap.embeddings(0)
+        legacy = legacy_loop(first, snap.count, queries[0], top_k, sample=min(20_000, len(first)))
+        print(f"Legacy per-row loop (extrapolated): {legacy * 1000:,.0f} ms/query")
+
+        t0 = time.perf_counter()
+        for q in queries:
+            vector_store._search_vectors(vector_store.DEFAULT_COLLECTION, q[None, :], top_k)
+        single = (time.perf_counter() - t0) / n_queries
+        print(f"Vectorized single query:            {single * 1000:,.0f} ms/query")
+
+        t0 = time.perf_counter()
+        vector_store._search_vectors(vector_store.DEFAULT_COLLECTION, queries, top_k)
+        batched = (time.perf_counter() - t0) / n_queries
+        print(f"Vectorized batch of {n_queries}:             {batched * 1000:,.0f} ms/query")
+
+        for label in ("cold", "warm"):  # cold includes loading the partition catalogs
+            t0 = time.perf_counter()
+            vector_store._search_vectors(vector_store.DEFAULT_COLLECTION, queries[:1], top_k,
+                                         company_filter="Company 7")
+            print(f"Company-filtered query ({label}):      {(time.perf_counter() - t0) * 1000:,.1f} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+Bulk Ingest CLI - index a whole directory of filings
+Reads the directory's manifest.csv (Category, Filename, ..., Bytes, Sha256) when
+present, otherwise hashes every PDF/DOCX/TXT under it. Files are deduplicated by
+content hash before any work is done, so the same PDF saved under two names (or
+in both oge-originals/ and open-cabinet-cache/) is embedded once. Chunk ids come
+from the content hash too (see ingest_document.generate_chunk_id).
+
+Near-duplicates, such as a re-downloaded copy of a filing with a different PDF
+wrapper, are caught by comparing MinHash signatures of the extracted text. By
+default they are skipped.
+
+Extraction and chunking run in a process pool. The main process embeds and
+appends, so the model is loaded once. Every finished file is appended to a
+progress log, and a rerun skips files that are already done.
+
+Usage: python scripts/bulk_ingest.py <dir> <company> [period]
+           [--workers N] [--keep-near-dups] [--restart]
+Without a period, each file's period is the quarter of the date in its name.
+"""
+import os
+import re
+import sys
+import csv
+import json
+import time
+import hashlib
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+PROGRESS_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "ingest_progress")
+WORKERS = int(os.getenv("BULK_INGEST_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+NEAR_DUP_THRESHOLD = float(os.getenv("BULK_NEAR_DUP_THRESHOLD", "0.9"))  # estimated Jaccard
+MINHASH_PERM = 128
+SHINGLE_WORDS = 5
+SUPPORTED = (".pdf", ".docx", ".doc", ".txt")
+DONE = ("indexed", "near_duplicate", "empty")
+
+_MASKS = np.random.default_rng(278).integers(0, 2 ** 63, size=MINHASH_PERM, dtype=np.uint64)
+
+
+# ============================================
+# FILE DISCOVERY
+# ============================================
+
+def _sha256(path: str) -> str:
+    from document_processor import file_sha256
+    return file_sha256(path)
+
+def list_files(root: str) -> List[Dict]:
+    """
+    [{path, sha256}] for every document under root. Hashes come from
+    manifest.csv when the file's size still matches the manifest.
+    """
+    manifest = {}
+    manifest_path = os.path.join(root, "manifest.csv")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                # LocalPath is machine-specific; Category/Filename is relative to root
+                rel = os.path.normpath(os.path.join(row.get("Category", ""), row["Filename"]))
+                manifest[rel] = (int(row.get("Bytes") or -1), (row.get("Sha256") or "").lower())
+
+    files = []
+    for dirpath, _, names in os.walk(root):
+        for name in sorted(names):
+            if not name.lower().endswith(SUPPORTED):
+                continue
+            path = os.path.join(dirpath, name)
+            size, sha = manifest.get(os.path.normpath(os.path.relpath(path, root)), (None, ""))
+            if not sha or size != os.path.getsize(path):
+                sha = _sha256(path)
+            files.append({"path": path, "sha256": sha})
+    return sorted(files, key=lambda f: f["path"])
+
+def period_from_name(filename: str) -> Optional[str]:
+    """'Q4 2025' from dates like 10.17.2025, 9.3.25 or 20250819 in a filename."""
+    m = re.search(r"(\d{1,2})\.(\d{1,2})\.(\d{4}|\d{2})(?!\d)", filename)
+    if m:
+        month, year = int(m.group(1)), int(m.group(3))
+        year += 2000 if year < 100 else 0
+    else:
+        m = re.search(r"(20\d{2})(\d{2})\d{2}", filename)
+        if not m:
+            return None
+        year, month = int(m.group(1)), int(m.group(2))
+    if not 1 <= month <= 12:
+        return None
+    return f"Q{(month - 1) // 3 + 1} {year}"
+
+
+# ============================================
+# NEAR-DUPLICATES
+# ============================================
+
+def minhash_signature(texts: List[str]) -> Optional[np.ndarray]:
+    """MinHash of the document's 5-word shingles (XOR-mask permutations over 64-bit hashes)."""
+    words = " ".join(texts).lower().split()
+    if not words:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.fromiter((int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little")
+                          for s in shingles), dtype=np.uint64, count=len(shingles))
+    return np.array([np.min(hashes ^ mask) for mask in _MASKS], dtype=np.uint64)
+
+def closest_match(signature: np.ndarray, seen: Dict[str, np.ndarray]) -> tuple:
+    """(sha256, estimated Jaccard) of the most similar indexed document."""
+    if signature is None or not seen:
+        return None, 0.0
+    shas = list(seen)
+    similarity = np.mean(np.stack([seen[s] for s in shas]) == signature, axis=1)
+    best = int(np.argmax(similarity))
+    return shas[best], float(similarity[best])
+
+
+# ============================================
+# PROGRESS LOG
+# ============================================
+
+def progress_path(root: str) -> str:
+    name = re.sub(r"[^\w.-]+", "_", os.path.basename(os.path.abspath(root)))
+    return os.path.join(PROGRESS_DIR, f"{name}.jsonl")
+
+def load_progress(path: str) -> Dict[str, Dict]:
+    """sha256 -> last record; a torn final line from a killed run is ignored."""
+    records = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                records[record["sha256"]] = record
+    return records
+
+def append_progress(f, record: Dict):
+    f.write(json.dumps(record) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+# ============================================
+# PIPELINE
+# ============================================
+
+def _init_worker():
+    import document_processor
+    document_processor.PDF_WORKERS = 1  # parallelism is across files here
+
+def _prepare(path: str, company: str, period: str) -> Dict:
+    """Pool task: extract and chunk one file, plus its MinHash signature."""
+    from document_processor import iter_document_chunks
+    chunks = list(iter_document_chunks(path, company, period))
+    signature = minhash_signature([c["text"] for c in chunks])
+    return {"chunks": chunks, "signature": None if signature is None else signature.tolist()}
+
+def bulk_ingest(root: str, company: str, period: Optional[str] = None, workers: int = WORKERS,
+                keep_near_dups: bool = False, restart: bool = False) -> Dict:
+    from concurrent.futures import ProcessPoolExecutor
+    import multiprocessing
+
+    files = list_files(root)
+    log_path = progress_path(root)
+    if restart and os.path.exists(log_path):
+        os.remove(log_path)
+    progress = load_progress(log_path)
+    seen = {sha: np.array(r["signature"], dtype=np.uint64)
+            for sha, r in progress.items() if r["status"] == "indexed" and r.get("signature")}
+    counts = {status: 0 for status in DONE + ("duplicate", "error", "resumed")}
+
+    # Exact duplicates never reach the pool
+    todo, claimed = [], set()
+    for f in files:
+        record = progress.get(f["sha256"])
+        if record and record["status"] in DONE:
+            counts["resumed"] += 1
+        elif f["sha256"] in claimed:
+            counts["duplicate"] += 1
+            print(f"[Bulk] {os.path.basename(f['path'])}: duplicate")
+        else:
+            claimed.add(f["sha256"])
+            todo.append(f)
+    print(f"[Bulk] {len(files)} files, {len(todo)} to process, {counts['resumed']} already done "
+          f"({workers} workers)")
+
+    os.makedirs(PROGRESS_DIR, exist_ok=True)
+    started = time.time()
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+    pending = deque()
+    try:
+        with open(log_path, "a", encoding="utf-8") as log:
+            # Keep a bounded window of files in flight so extraction runs ahead of embedding
+            for f in todo:
+                pending.append((f, pool.submit(_prepare, f["path"], company,
+                                               period or period_from_name(os.path.basename(f["path"])) or "Unknown")))
+                if len(pending) < 2 * workers:
+                    continue
+                _finish(*pending.popleft(), log, seen, counts, keep_near_dups)
+            while pending:
+                _finish(*pending.popleft(), log, seen, counts, keep_near_dups)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    counts["seconds"] = round(time.time() - started, 1)
+    print(f"[Bulk] Done: {counts}")
+    return counts
+
+def _finish(f: Dict, future, log, seen: Dict, counts: Dict, keep_near_dups: bool):
+    """Dedup, index and log one prepared file."""
+    from ingest_document import index_chunks, with_file_ids
+    name = os.path.basename(f["path"])
+    record = {"sha256": f["sha256"], "file": f["path"]}
+    try:
+        prepared = future.result()
+    except Exception as e:
+        print(f"[Bulk] {name}: error {e}")
+        counts["error"] += 1
+        append_progress(log, dict(record, status="error", error=str(e)))
+        return
+
+    signature = None if prepared["signature"] is None else np.array(prepared["signature"], dtype=np.uint64)
+    match, similarity = closest_match(signature, seen)
+    if not prepared["chunks"]:
+        record["status"] = "empty"
+    elif similarity >= NEAR_DUP_THRESHOLD and not keep_near_dups:
+        record.update(status="near_duplicate", of=match, similarity=round(similarity, 3))
+    else:
+        extracted, indexed = index_chunks(with_file_ids(prepared["chunks"], f["sha256"]))
+        record.update(status="indexed", chunks=extracted, indexed=indexed, signature=prepared["signature"])
+        seen[f["sha256"]] = signature
+    counts[record["status"]] += 1
+    print(f"[Bulk] {name}: {record['status']}"
+          + (f" ({record['indexed']}/{record['chunks']} chunks new)" if record["status"] == "indexed" else "")
+          + (f" (~{record['similarity']:.0%} of {match[:12]})" if record["status"] == "near_duplicate" else ""))
+    append_progress(log, record)
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) < 2:
+        print("Usage: bulk_ingest.py <dir> <company> [period] [--workers N] [--keep-near-dups] [--restart]")
+        sys.exit(1)
+    workers = WORKERS
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+        args.remove(str(workers))
+    result = bulk_ingest(args[0], args[1], args[2] if len(args) > 2 else None, workers=workers,
+                         keep_near_dups="--keep-near-dups" in sys.argv, restart="--restart" in sys.argv)
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Daemon Client - talk to a running vector_daemon.py over localhost HTTP
+Stdlib only, so CLIs that use it start in milliseconds.
+"""
+import os
+import json
+import urllib.request
+import urllib.error
+from typing import Optional
+
+DAEMON_HOST = os.getenv("VECTOR_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.getenv("VECTOR_DAEMON_PORT", "8765"))
+
+
+def call_daemon(route: str, payload: Optional[dict] = None, timeout: float = 300.0) -> Optional[dict]:
+    """
+    POST a JSON payload to the daemon (GET if payload is None).
+    Returns the decoded response, or None when no daemon is listening so the
+    caller can fall back to in-process mode. A daemon that accepted the
+    request but did not answer in time raises TimeoutError instead: it is
+    still doing the work, and redoing it in-process would duplicate it.
+    """
+    url = f"http://{DAEMON_HOST}:{DAEMON_PORT}{route}"
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        # The daemon answered; surface its error payload rather than falling back
+        try:
+            return json.loads(e.read())
+        except Exception:
+            return {"error": f"Daemon HTTP {e.code}"}
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, ConnectionRefusedError):  # nothing listening on the port
+            return None
+        if isinstance(e.reason, TimeoutError):
+            raise TimeoutError(f"Daemon at {DAEMON_HOST}:{DAEMON_PORT} did not respond within {timeout:g}s") from e
+        raise
+    except ConnectionRefusedError:
+        return None
+    except TimeoutError as e:
+        raise TimeoutError(f"Daemon at {DAEMON_HOST}:{DAEMON_PORT} did not respond within {timeout:g}s") from e
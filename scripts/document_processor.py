@@ -1,30 +1,136 @@
 """
 Document Processor - Extract text from various file formats and chunk for vectorization.
 Supports: PDF, DOC, DOCX, TXT
+
+PDF pages are extracted in parallel across a process pool and streamed back in
+page order by iter_pdf_pages(). Extracted page text is cached on disk keyed by
+the file's SHA-256, so a re-run only extracts pages it hasn't seen.
+
+iter_chunks() turns that page stream into sentence-aligned chunks sized in
+embedding-model tokens, each tagged with its page and character offsets.
 """
 import os
 import re
-from typing import List, Dict
+import json
+import uuid
+import hashlib
+import itertools
+import zlib
+from collections import deque
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 
-def extract_text_from_pdf(filepath: str) -> str:
-    """Extract text from PDF file."""
+PAGE_CACHE_DIR = os.getenv("PDF_PAGE_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "page_cache"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count() or 1
+PAGES_PER_TASK = 4      # pages extracted per pool task (each task re-opens the PDF)
+PARALLEL_MIN_PAGES = 8  # smaller documents are extracted in-process
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "128"))              # model window is 256
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+CHUNK_CUT_EVERY = 4     # about one sentence in 4 may end a chunk once it is half full
+
+# ============================================
+# PAGE CACHE
+# ============================================
+
+def file_sha256(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _page_path(cache_dir: str, page_no: int) -> str:
+    return os.path.join(cache_dir, f"p{page_no:05d}.txt")
+
+def _read_cached_page(cache_dir: str, page_no: int) -> Optional[str]:
+    try:
+        with open(_page_path(cache_dir, page_no), 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _write_cached_page(cache_dir: str, page_no: int, text: str):
+    tmp = os.path.join(cache_dir, f".{uuid.uuid4().hex}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, _page_path(cache_dir, page_no))
+
+# ============================================
+# EXTRACTION
+# ============================================
+
+def _extract_pages(filepath: str, page_numbers: List[int]) -> List[Tuple[int, str]]:
+    """Pool task: text of the given 1-based pages (opens the PDF once per task)."""
+    import pdfplumber
+    with pdfplumber.open(filepath) as pdf:
+        return [(n, pdf.pages[n - 1].extract_text() or "") for n in page_numbers]
+
+def _pdf_page_count(filepath: str) -> int:
     import pdfplumber
-    text = ""
     with pdfplumber.open(filepath) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+        return len(pdf.pages)
+
+def iter_pdf_pages(filepath: str, workers: int = PDF_WORKERS, use_cache: bool = True) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page number, text) in page order. Cached pages are served from disk;
+    the rest are extracted PAGES_PER_TASK at a time on a process pool.
+    """
+    cache_dir = None
+    count = None
+    if use_cache:
+        cache_dir = os.path.join(PAGE_CACHE_DIR, file_sha256(filepath))
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_path = os.path.join(cache_dir, "pages.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                count = json.load(f)["pages"]
+    if count is None:
+        count = _pdf_page_count(filepath)
+        if cache_dir:
+            with open(os.path.join(cache_dir, "pages.json"), 'w', encoding='utf-8') as f:
+                json.dump({"pages": count, "source": os.path.basename(filepath)}, f)
+
+    ready = {}
+    if cache_dir:
+        ready = {n: _read_cached_page(cache_dir, n) for n in range(1, count + 1)}
+        ready = {n: text for n, text in ready.items() if text is not None}
+    missing = [n for n in range(1, count + 1) if n not in ready]
+    tasks = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+
+    pool = None
+    if workers > 1 and len(missing) >= PARALLEL_MIN_PAGES:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn, not fork: callers such as vector_daemon are multithreaded, and a
+        # forked child can inherit locks held by other threads at fork time
+        pool = ProcessPoolExecutor(min(workers, len(tasks)), mp_context=multiprocessing.get_context("spawn"))
+        results = pool.map(_extract_pages, [filepath] * len(tasks), tasks)
+    else:
+        results = (_extract_pages(filepath, task) for task in tasks)
+
+    next_page = 1
+    try:
+        # The leading empty task streams a cached prefix before any extraction finishes
+        for task_pages in itertools.chain([()], results):
+            for n, text in task_pages:
+                ready[n] = text
+                if cache_dir:
+                    _write_cached_page(cache_dir, n, text)
+            while next_page in ready:
+                yield next_page, ready.pop(next_page)
+                next_page += 1
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+def extract_text_from_pdf(filepath: str) -> str:
+    """Extract text from PDF file."""
+    return "".join(text + "\n" for _, text in iter_pdf_pages(filepath) if text)
 
 def extract_text_from_docx(filepath: str) -> str:
     """Extract text from DOCX file."""
     from docx import Document
     doc = Document(filepath)
-    text = ""
-    for para in doc.paragraphs:
-        text += para.text + "\n"
-    return text
+    return "".join(para.text + "\n" for para in doc.paragraphs)
 
 def extract_text_from_txt(filepath: str) -> str:
     """Extract text from TXT file."""
@@ -44,86 +150,158 @@ def extract_text(filepath: str) -> str:
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[Dict]:
+# ============================================
+# CHUNKING
+# ============================================
+
+# Sentence ends and blank lines, matched within one page's raw text
+BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+_token_counter = None
+
+def _load_token_counter():
     """
-    Split text into overlapping chunks for vectorization.
-    
-    Args:
-        text: Full document text
-        chunk_size: Target size of each chunk in characters
-        overlap: Number of characters to overlap between chunks
-    
-    Returns:
-        List of dicts with 'text' and 'position' keys
+    Token counts from the embedding model's own tokenizer (the ONNX export's
+    tokenizer.json, else the Hugging Face tokenizer), so chunks fit the model's
+    window. Falls back to a word/punctuation estimate when neither is available.
     """
-    # Clean up text
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    if not text:
-        return []
-    
-    chunks = []
-    start = 0
-    chunk_num = 0
-    
-    while start < len(text):
-        # Find end of chunk
-        end = start + chunk_size
-        
-        # Try to break at sentence boundary
-        if end < len(text):
-            # Look for sentence end within a window
-            window_start = max(end - 50, start)
-            window_end = min(end + 50, len(text))
-            window = text[window_start:window_end]
-            
-            # Find last sentence-ending punctuation in window
-            for punct in ['. ', '! ', '? ', '\n']:
-                last_punct = window.rfind(punct)
-                if last_punct != -1:
-                    end = window_start + last_punct + 1
-                    break
-        
-        # Extract chunk
-        chunk_text = text[start:end].strip()
-        
-        if chunk_text:
-            chunks.append({
-                'text': chunk_text,
-                'position': chunk_num,
-                'char_start': start,
-                'char_end': end
-            })
-            chunk_num += 1
-        
-        # Move to next position with overlap
-        start = end - overlap if end < len(text) else len(text)
-    
-    return chunks
+    from embedding_runtime import EMBEDDING_MODEL_ID, ONNX_PATH
+    tokenizer_file = os.path.join(ONNX_PATH, "tokenizer.json")
+    try:
+        if os.path.exists(tokenizer_file):
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(tokenizer_file)
+            tokenizer.no_truncation()
+            return lambda texts: [len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(f"sentence-transformers/{EMBEDDING_MODEL_ID}")
+        return lambda texts: [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+    except Exception as e:
+        print(f"[Chunker] Tokenizer unavailable ({e}); estimating token counts")
+        return lambda texts: [int(len(re.findall(r'\w+|[^\w\s]', t)) * 1.3) for t in texts]
 
-def process_document(filepath: str, company: str, period: str) -> List[Dict]:
+def count_tokens(texts: List[str]) -> List[int]:
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = _load_token_counter()
+    return _token_counter(texts) if texts else []
+
+def _split_long(text: str, start: int, stop: int, tokens: int, max_tokens: int) -> Iterator[Tuple[str, int, int, int]]:
+    """(text, tokens, start, end) slices of an over-long span: by words, or by characters for one huge word."""
+    words = [(start + m.start(), start + m.end()) for m in re.finditer(r'\S+', text[start:stop])]
+    if len(words) > 1:
+        step = max(1, len(words) * max_tokens // (tokens + max_tokens // 8))
+        spans = [(words[i][0], words[min(i + step, len(words)) - 1][1]) for i in range(0, len(words), step)]
+    else:
+        step = max(1, (stop - start) * max_tokens // (tokens + max_tokens // 8))
+        spans = [(i, min(i + step, stop)) for i in range(start, stop, step)]
+    pieces = [' '.join(text[a:b].split()) for a, b in spans]
+    for piece, (a, b), piece_tokens in zip(pieces, spans, count_tokens(pieces)):
+        if piece_tokens > max_tokens and b - a > 1:
+            yield from _split_long(text, a, b, piece_tokens, max_tokens)
+        elif piece:
+            yield piece, piece_tokens, a, b
+
+def _page_units(page_no: int, text: str, max_tokens: int) -> Iterator[Tuple[str, int, int, int, int]]:
+    """(text, tokens, page, start, end) per sentence of a page; table rows and run-on lines are split."""
+    spans, pos = [], 0
+    for m in itertools.chain(BOUNDARY_RE.finditer(text), [None]):
+        stop = m.start() if m else len(text)
+        sentence = ' '.join(text[pos:stop].split())
+        if sentence:
+            spans.append((sentence, pos, stop))
+        pos = m.end() if m else pos
+    for (sentence, start, stop), tokens in zip(spans, count_tokens([s for s, _, _ in spans])):
+        if tokens <= max_tokens:
+            yield sentence, tokens, page_no, start, stop
+        else:
+            for piece, piece_tokens, a, b in _split_long(text, start, stop, tokens, max_tokens):
+                yield piece, piece_tokens, page_no, a, b
+
+def iter_chunks(pages: Iterable[Tuple[int, str]], max_tokens: int = CHUNK_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Dict]:
     """
-    Full pipeline: extract text, chunk, and prepare for vectorization.
-    
-    Returns list of chunks with metadata.
+    Split a stream of (page number, page text) into overlapping chunks of whole
+    sentences, each at most max_tokens model tokens. Holds one page and one
+    chunk in memory at a time. Boundaries depend only on nearby sentences.
+
+    Yields dicts with 'text', 'position', 'tokens' and provenance: 'page' and
+    'char_start' (offset into that page's text) where the chunk starts,
+    'page_end' and 'char_end' where it ends.
     """
-    # Extract text
-    text = extract_text(filepath)
-    
-    if not text.strip():
-        return []
-    
-    # Chunk the text
-    chunks = chunk_text(text, chunk_size=500, overlap=100)
-    
-    # Add metadata to each chunk
-    filename = os.path.basename(filepath)
-    for chunk in chunks:
+    window = deque()  # units of the chunk being built
+    total = 0
+    fresh = False     # window holds units not yet emitted
+    position = 0
+
+    def emit():
+        nonlocal total, fresh, position
+        first, last = window[0], window[-1]
+        chunk = {
+            'text': ' '.join(u[0] for u in window),
+            'position': position,
+            'tokens': total,
+            'page': first[2],
+            'char_start': first[3],
+            'page_end': last[2],
+            'char_end': last[4]
+        }
+        position += 1
+        fresh = False
+        # Carry trailing sentences into the next chunk as overlap
+        while window and total > overlap_tokens:
+            total -= window.popleft()[1]
+        return chunk
+
+    for page_no, text in pages:
+        for unit in _page_units(page_no, text or "", max_tokens):
+            if fresh and total + unit[1] > max_tokens:
+                yield emit()
+            if total + unit[1] > max_tokens:
+                window.clear()
+                total = 0
+            window.append(unit)
+            total += unit[1]
+            fresh = True
+            # Content-defined cut points: an edit shifts chunk boundaries only up to the
+            # next cut, so an amended document re-chunks identically away from its edits
+            if total >= max_tokens // 2 and zlib.crc32(unit[0].encode('utf-8')) % CHUNK_CUT_EVERY == 0:
+                yield emit()
+    if fresh:
+        yield emit()
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Dict]:
+    """Chunks of an already extracted text (see iter_chunks)."""
+    return list(iter_chunks([(1, text)], max_tokens, overlap_tokens))
+
+def iter_pages(filepath: str) -> Iterator[Tuple[int, str]]:
+    """(page number, text) of a document; formats without pages are one page."""
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == '.pdf':
+        yield from iter_pdf_pages(filepath)
+    else:
+        yield 1, extract_text(filepath)
+
+def iter_document_chunks(filepath: str, company: str, period: str, source_name: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Streaming pipeline: chunks with metadata as pages arrive, so callers can
+    embed and index early chunks while later pages are still being extracted.
+    source_name overrides the file name recorded as 'source_file' (uploads are
+    saved under a timestamped name).
+    """
+    filename = source_name or os.path.basename(filepath)
+    for chunk in iter_chunks(iter_pages(filepath)):
         chunk['company'] = company
         chunk['period'] = period
         chunk['source_file'] = filename
+        yield chunk
+
+def process_document(filepath: str, company: str, period: str) -> List[Dict]:
+    """
+    Full pipeline: extract text, chunk, and prepare for vectorization.
     
-    return chunks
+    Returns list of chunks with metadata.
+    """
+    return list(iter_document_chunks(filepath, company, period))
 
 
 if __name__ == "__main__":
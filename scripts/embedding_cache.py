@@ -0,0 +1,141 @@
+"""
+Embedding Cache - persistent embeddings keyed by (model id, normalized text hash)
+SQLite-backed so it is safe to share between the daemon, CLIs and backfills,
+plus an in-memory LRU for query embeddings. Tracks hit-rate metrics.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH",
+                       os.path.join(os.path.dirname(__file__), "..", "vector_store", "embedding_cache.sqlite"))
+CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1") != "0"
+QUERY_LRU_SIZE = int(os.getenv("EMBEDDING_QUERY_LRU", "1024"))
+_LOOKUP_BATCH = 500  # keeps IN (...) under SQLite's parameter limit
+
+
+def text_key(text: str) -> str:
+    """Hash of whitespace-normalized text."""
+    normalized = re.sub(r'\s+', ' ', text).strip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent (model, text hash) -> float32 vector store."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT,
+                text_hash TEXT,
+                vector BLOB,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model_id: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors aligned with texts (None for misses)."""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), _LOOKUP_BATCH):
+            batch = unique[start:start + _LOOKUP_BATCH]
+            rows = self._conn().execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                [model_id, *batch]
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        out = [found.get(k) for k in keys]
+        hits = sum(1 for v in out if v is not None)
+        self.hits += hits
+        self.misses += len(out) - hits
+        return out
+
+    def put_many(self, model_id: str, texts: List[str], vectors):
+        """Store vectors for texts (existing keys are left as is)."""
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model_id, text_key(t), np.asarray(v, dtype=np.float32).tobytes()) for t, v in zip(texts, vectors)]
+            )
+
+
+class QueryLRU:
+    """Small in-memory LRU for query embeddings (hot in the daemon)."""
+
+    def __init__(self, max_size: int = QUERY_LRU_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value: np.ndarray):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+def _rate(hits: int, misses: int) -> float:
+    total = hits + misses
+    return round(hits / total, 3) if total else 0.0
+
+
+_disk_cache = EmbeddingCache() if CACHE_ENABLED else None
+_query_lru = QueryLRU()
+
+
+def get_disk_cache() -> Optional[EmbeddingCache]:
+    return _disk_cache
+
+
+def get_query_lru() -> QueryLRU:
+    return _query_lru
+
+
+def cache_stats() -> dict:
+    """Hit-rate metrics for the persistent cache and the query LRU."""
+    disk_hits = _disk_cache.hits if _disk_cache else 0
+    disk_misses = _disk_cache.misses if _disk_cache else 0
+    return {
+        "disk_hits": disk_hits,
+        "disk_misses": disk_misses,
+        "disk_hit_rate": _rate(disk_hits, disk_misses),
+        "query_hits": _query_lru.hits,
+        "query_misses": _query_lru.misses,
+        "query_hit_rate": _rate(_query_lru.hits, _query_lru.misses),
+    }
@@ -0,0 +1,222 @@
+"""
+Embedding Runtime - CPU inference backends for the vector store
+Two interchangeable backends behind one encode(texts) call:
+    torch   sentence-transformers (default)
+    onnx    ONNX Runtime session over a locally exported (optionally int8
+            quantized) copy of the same model, no torch needed at inference
+
+Both use length-bucketed batching: texts are sorted by length and cut into
+batches under a token budget, so short chunks aren't padded to the longest one
+in a fixed-size batch. Large jobs are sharded over a process pool.
+
+Settings (env):
+    EMBEDDING_RUNTIME       torch | onnx
+    EMBEDDING_ONNX_PATH     dir with model.onnx (or model_quantized.onnx) + tokenizer.json
+    EMBEDDING_THREADS       intra-op threads per process (default: all cores)
+    EMBEDDING_WORKERS       processes for large jobs (default 1 = no pool)
+    EMBEDDING_BATCH_TOKENS  padded-token budget per batch
+
+Export: python scripts/embedding_runtime.py export <out_dir> [--int8]
+"""
+import os
+import atexit
+import numpy as np
+from typing import List
+
+EMBEDDING_MODEL_ID = 'all-MiniLM-L6-v2'
+RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch")
+ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", os.path.join(os.path.dirname(__file__), "..", "models", "minilm-onnx"))
+THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or os.cpu_count() or 1
+WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+MAX_SEQ_LENGTH = 256      # all-MiniLM-L6-v2 truncates here
+MAX_BATCH = 128
+POOL_MIN_TEXTS = 2048     # below this, pool start-up and pickling cost more than they save
+_pool = None
+
+
+def runtime_model_id() -> str:
+    """Embedding cache key for the configured backend (quantized vectors differ slightly)."""
+    if RUNTIME == "onnx":
+        return f"{EMBEDDING_MODEL_ID}:onnx:{os.path.basename(_onnx_model_file(ONNX_PATH))}"
+    return EMBEDDING_MODEL_ID
+
+
+def _onnx_model_file(path: str) -> str:
+    quantized = os.path.join(path, "model_quantized.onnx")
+    return quantized if os.path.exists(quantized) else os.path.join(path, "model.onnx")
+
+
+def length_buckets(lengths: List[int], budget: int = BATCH_TOKENS, max_batch: int = MAX_BATCH) -> List[List[int]]:
+    """
+    Indices grouped into batches of similar length: sorted by length, each batch
+    grows until (batch size x longest item) would exceed the token budget.
+    """
+    order = np.argsort(lengths, kind="stable")
+    batches, current = [], []
+    for i in order:
+        length = max(lengths[i], 1)  # ascending order: the item being added is the batch's longest
+        if current and ((len(current) + 1) * length > budget or len(current) >= max_batch):
+            batches.append(current)
+            current = []
+        current.append(int(i))
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TorchRuntime:
+    """sentence-transformers on CPU with bucketed batches."""
+
+    def __init__(self, threads: int = THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.set_num_threads(threads)
+        self.model = SentenceTransformer(EMBEDDING_MODEL_ID, device="cpu")
+        self.model_id = EMBEDDING_MODEL_ID
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        tokenizer = self.model.tokenizer
+        lengths = [min(len(ids), MAX_SEQ_LENGTH) for ids in tokenizer(texts, add_special_tokens=True)["input_ids"]]
+        out = np.zeros((len(texts), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        for batch in length_buckets(lengths):
+            out[batch] = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                           convert_to_numpy=True, show_progress_bar=False)
+        return out[0] if single else out
+
+
+class OnnxRuntime:
+    """ONNX Runtime session + fast tokenizer, mean pooling and L2 norm as in the original model."""
+
+    def __init__(self, path: str = ONNX_PATH, threads: int = THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        model_file = _onnx_model_file(path)
+        if not os.path.exists(model_file):
+            raise FileNotFoundError(f"No ONNX model in {path}; run `embedding_runtime.py export {path}` first")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.model_id = runtime_model_id()
+
+    def _run(self, encodings) -> np.ndarray:
+        width = max(len(e.ids) for e in encodings)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros_like(ids)
+        for r, e in enumerate(encodings):
+            ids[r, :len(e.ids)] = e.ids
+            mask[r, :len(e.ids)] = 1
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feed)[0]
+        pooled = (hidden * mask[..., None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        encodings = self.tokenizer.encode_batch(texts)
+        out = None
+        for batch in length_buckets([len(e.ids) for e in encodings]):
+            vectors = self._run([encodings[i] for i in batch])
+            if out is None:
+                out = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+        if out is None:
+            out = np.zeros((0, 0), dtype=np.float32)
+        return out[0] if single else out
+
+
+def load_backend(threads: int = THREADS):
+    print(f"[Embeddings] Loading {RUNTIME} runtime ({threads} threads)")
+    return OnnxRuntime(threads=threads) if RUNTIME == "onnx" else TorchRuntime(threads=threads)
+
+
+# ============================================
+# PROCESS POOL
+# ============================================
+
+_worker_backend = None
+
+
+def _init_worker(threads: int):
+    global _worker_backend
+    _worker_backend = load_backend(threads)
+
+
+def _encode_shard(texts: List[str]) -> np.ndarray:
+    return _worker_backend.encode(texts)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        # Split the cores between workers instead of oversubscribing them
+        _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_init_worker, initargs=(max(1, THREADS // WORKERS),))
+        atexit.register(_pool.shutdown)
+    return _pool
+
+
+class EmbeddingRuntime:
+    """What vector_store.get_embedding_model() returns: in-process backend + pool for large jobs."""
+
+    def __init__(self):
+        self.backend = load_backend(THREADS)
+        self.model_id = self.backend.model_id
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        if isinstance(texts, str) or WORKERS <= 1 or len(texts) < POOL_MIN_TEXTS:
+            return self.backend.encode(texts)
+        texts = list(texts)
+        shard = -(-len(texts) // WORKERS)
+        parts = _get_pool().map(_encode_shard, [texts[i:i + shard] for i in range(0, len(texts), shard)])
+        return np.vstack(list(parts))
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def export_onnx(out_dir: str, int8: bool = False) -> str:
+    """Export the sentence-transformers model's encoder + tokenizer to out_dir."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    os.makedirs(out_dir, exist_ok=True)
+    st = SentenceTransformer(EMBEDDING_MODEL_ID, device="cpu")
+    encoder, tokenizer = st[0].auto_model, st.tokenizer
+    tokenizer.save_pretrained(out_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "sequence"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    path = os.path.join(out_dir, "model.onnx")
+    torch.onnx.export(encoder, tuple(sample[n] for n in names), path, input_names=names,
+                      output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=14)
+
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized = os.path.join(out_dir, "model_quantized.onnx")
+        quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+        path = quantized
+    print(f"[Embeddings] Exported {EMBEDDING_MODEL_ID} to {path}")
+    return path
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 3 or sys.argv[1] != "export":
+        print("Usage: embedding_runtime.py export <out_dir> [--int8]")
+        sys.exit(1)
+    export_onnx(sys.argv[2], int8="--int8" in sys.argv)
@@ -0,0 +1,195 @@
+"""
+Filing Sections - token-budgeted LLM input from a cleaned 10-K/10-Q
+The first 15k characters of a filing are mostly cover page, table of contents
+and forward-looking-statement boilerplate. build_input() splits the cleaned
+text into its Items, scores paragraphs (section weight, figures and change
+language, boilerplate penalty) and keeps the best ones that fit the budget,
+emitted in document order under their section names.
+
+Risk factor paragraphs are compared with the same company's previous filing
+(paragraph hashes kept in a small SQLite history): new or reworded risks are
+boosted and unchanged ones are discounted.
+"""
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional, Set
+
+INPUT_TOKENS = int(os.getenv("THEME_INPUT_TOKENS", "3500"))
+CHARS_PER_TOKEN = 4       # Llama-style BPE on English filings; the budget is approximate
+MIN_PARAGRAPH_CHARS = 60  # shorter lines are headings, page numbers, table cells
+HISTORY_PATH = os.getenv("SECTION_HISTORY_PATH",
+                         os.path.join(os.path.dirname(__file__), "..", "data", "section_history.sqlite"))
+
+# (item, name, weight) per base form, highest-signal first
+SECTIONS = {
+    "10-K": [("7", "Management's Discussion and Analysis", 1.0), ("1A", "Risk Factors", 0.9),
+             ("1", "Business", 0.6), ("7A", "Market Risk", 0.5), ("3", "Legal Proceedings", 0.4)],
+    "10-Q": [("2", "Management's Discussion and Analysis", 1.0), ("1A", "Risk Factors", 0.9),
+             ("3", "Market Risk", 0.5), ("1", "Legal Proceedings", 0.4)],
+}
+RISK_ITEM = "1A"
+
+ITEM_RE = re.compile(r"^[ \t]*(?:PART[ \t]+I{1,3}V?[ \t]*[,.\-–—]?[ \t]*)?ITEM[ \t]+(\d{1,2}[A-C]?)\b[ \t]*[.:\-–—]?",
+                     re.IGNORECASE | re.MULTILINE)
+BOILERPLATE_RE = re.compile(
+    r"forward[- ]looking statements?|safe harbor|private securities litigation reform|table of contents"
+    r"|incorporated (?:herein )?by reference|see note \d|should be read in conjunction", re.IGNORECASE)
+FIGURE_RE = re.compile(r"\$\s?\d|\d+(?:\.\d+)?\s?%|\b\d{1,3}(?:,\d{3})+\b")
+CHANGE_RE = re.compile(
+    r"\b(?:increase[ds]?|decrease[ds]?|grew|decline[ds]?|compared (?:to|with)|driven by|due to|primarily"
+    r"|new|launch(?:ed)?|acqui(?:red|sition)|impairment|restructuring|guidance|backlog|demand)\b", re.IGNORECASE)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def paragraph_hash(text: str) -> str:
+    return hashlib.sha256(re.sub(r"\s+", " ", text).strip().lower().encode("utf-8")).hexdigest()[:16]
+
+def _base_form(form: str) -> str:
+    return "10-Q" if (form or "").upper().startswith("10-Q") else "10-K"
+
+
+# ============================================
+# SECTIONS
+# ============================================
+
+def split_sections(text: str) -> Dict[str, str]:
+    """
+    Item number -> body. Each Item heading appears in the table of contents as
+    well as in the body; the longest span for an item is the real section.
+    """
+    heads = [(m.start(), m.end(), m.group(1).upper()) for m in ITEM_RE.finditer(text)]
+    sections = {}
+    for i, (_, body_start, item) in enumerate(heads):
+        end = heads[i + 1][0] if i + 1 < len(heads) else len(text)
+        body = text[body_start:end].strip()
+        if len(body) > len(sections.get(item, "")):
+            sections[item] = body
+    return sections
+
+def paragraphs(text: str, max_chars: int) -> List[str]:
+    """Prose paragraphs, long ones cut at a sentence end near max_chars."""
+    out = []
+    for line in re.split(r"\n+", text):
+        line = line.strip()
+        if len(line) < MIN_PARAGRAPH_CHARS or sum(c.isalpha() for c in line) < len(line) / 2:
+            continue
+        if len(line) > max_chars:
+            cut = line.rfind(". ", 0, max_chars)
+            line = line[:cut + 1] if cut > max_chars // 2 else line[:max_chars]
+        out.append(line)
+    return out
+
+def paragraph_score(text: str) -> float:
+    score = 1.0 + 0.1 * min(len(FIGURE_RE.findall(text)), 5) + 0.1 * min(len(CHANGE_RE.findall(text)), 5)
+    return score * 0.2 if BOILERPLATE_RE.search(text) else score
+
+
+# ============================================
+# RISK FACTOR HISTORY
+# ============================================
+
+class SectionHistory:
+    """Paragraph hashes of each filing's risk factors, for deltas against the prior filing."""
+
+    def __init__(self, path: str = HISTORY_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS risk_paragraphs (
+                cik TEXT,
+                accession TEXT,
+                filing_date TEXT,
+                hashes TEXT, -- JSON array of paragraph hashes
+                PRIMARY KEY (cik, accession)
+            )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def previous(self, cik: str, accession: str, date: str) -> Optional[Set[str]]:
+        """Hashes from the company's latest filing before this one (None if there is none)."""
+        row = self._conn().execute(
+            "SELECT hashes FROM risk_paragraphs WHERE cik = ? AND accession != ? AND filing_date < ? "
+            "ORDER BY filing_date DESC LIMIT 1", [cik, accession, date]).fetchone()
+        return set(json.loads(row[0])) if row else None
+
+    def record(self, cik: str, accession: str, date: str, hashes: List[str]):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO risk_paragraphs (cik, accession, filing_date, hashes) VALUES (?, ?, ?, ?)",
+                         [cik, accession, date, json.dumps(hashes)])
+
+
+_history = None
+
+def get_history() -> SectionHistory:
+    global _history
+    if _history is None:
+        _history = SectionHistory()
+    return _history
+
+
+# ============================================
+# INPUT BUILDER
+# ============================================
+
+def build_input(text: str, form: str = "10-K", filing: Optional[Dict] = None, budget_tokens: int = INPUT_TOKENS) -> str:
+    """
+    The highest-signal paragraphs of a cleaned filing within budget_tokens.
+    With filing ({cik, accession, date}) risk factors are diffed against the
+    company's previous filing, and this filing's are recorded for the next one.
+    """
+    layout = SECTIONS[_base_form(form)]
+    found = split_sections(text)
+    sections = [(item, name, weight, found[item]) for item, name, weight in layout if item in found]
+    # Everything else competes at a low weight, so filings whose Items are
+    # missing or "omitted" (e.g. asset-backed issuers) still fill the budget
+    sections.append(("", "Other", 0.3, text))
+
+    max_chars = budget_tokens * CHARS_PER_TOKEN // 4
+    candidates = []  # (score, section index, position, paragraph)
+    seen = set()
+    for s, (item, _, weight, body) in enumerate(sections):
+        paras = []
+        for para in paragraphs(body, max_chars):  # each paragraph once, in its first section
+            if paragraph_hash(para) not in seen:
+                seen.add(paragraph_hash(para))
+                paras.append(para)
+        delta = None
+        if item == RISK_ITEM and filing and filing.get("cik"):
+            hashes = [paragraph_hash(p) for p in paras]
+            delta = get_history().previous(filing["cik"], filing["accession"], filing["date"])
+            get_history().record(filing["cik"], filing["accession"], filing["date"], hashes)
+        for pos, para in enumerate(paras):
+            score = weight * paragraph_score(para)
+            if delta is not None:
+                score *= 0.5 if paragraph_hash(para) in delta else 1.6
+            candidates.append((score, s, pos, para))
+
+    chosen, used = [], 0
+    for score, s, pos, para in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        cost = estimate_tokens(para) + 1
+        if used + cost > budget_tokens:
+            continue
+        chosen.append((s, pos, para))
+        used += cost
+
+    parts = []
+    for s, (item, name, _, _) in enumerate(sections):
+        picked = [para for cs, _, para in sorted(chosen) if cs == s]
+        if picked:
+            parts.append(f"### {'Item ' + item + '. ' if item else ''}{name}\n" + "\n".join(picked))
+    return "\n\n".join(parts)
@@ -2,61 +2,178 @@
 """
 Ingest Document CLI
 Called by Next.js API to process and vectorize uploaded documents.
+Forwards to the warm vector daemon when it is running, otherwise ingests in-process.
+With --doc <key>, a new version of a document replaces the old one incrementally.
+--name <file name> records the upload's original name instead of the saved one.
 """
 import sys
 import os
 import json
 import hashlib
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
 # Add scripts directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from document_processor import process_document
-from vector_store import add_chunks_batch, get_stats
+from daemon_client import call_daemon
 
-def generate_chunk_id(filepath: str, position: int) -> str:
-    """Generate a unique ID for a chunk."""
-    file_hash = hashlib.md5(filepath.encode()).hexdigest()[:8]
-    return f"{file_hash}_chunk_{position}"
+INGEST_BATCH = 512  # chunks embedded and appended per vector store write
+
+def generate_chunk_id(content_hash: str, position: int) -> str:
+    """Chunk id from the file's SHA-256: the same bytes at any path get the same ids."""
+    return f"{content_hash[:16]}_chunk_{position}"
+
+def document_id_prefix(doc_key: str) -> str:
+    """Id prefix shared by every chunk of a named document across its versions."""
+    return f"doc{hashlib.sha256(doc_key.encode()).hexdigest()[:12]}_"
+
+def with_file_ids(chunks: Iterable[Dict], content_hash: str) -> Iterator[Dict]:
+    for chunk in chunks:
+        chunk["id"] = generate_chunk_id(content_hash, chunk["position"])
+        yield chunk
+
+def with_content_ids(chunks: Iterable[Dict], doc_key: str) -> Iterator[Dict]:
+    """
+    Ids from each chunk's text hash under the document's prefix, so unchanged
+    text keeps its id (and its stored embedding) from one version to the next.
+    Repeated identical chunks are numbered in order of appearance.
+    """
+    prefix = document_id_prefix(doc_key)
+    seen = Counter()
+    for chunk in chunks:
+        text_hash = hashlib.sha256(chunk["text"].encode()).hexdigest()[:16]
+        seen[text_hash] += 1
+        chunk["id"] = f"{prefix}{text_hash}" + (f"_{seen[text_hash]}" if seen[text_hash] > 1 else "")
+        yield chunk
+
+def index_chunks(chunks: Iterable[Dict]) -> Tuple[int, int]:
+    """Index chunks (ids assigned) in INGEST_BATCH writes. Returns (chunks seen, chunks added)."""
+    from vector_store import add_chunks_batch
+
+    extracted = indexed = 0
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= INGEST_BATCH:
+            indexed += add_chunks_batch(batch)
+            extracted += len(batch)
+            batch = []
+    if batch:
+        indexed += add_chunks_batch(batch)
+        extracted += len(batch)
+    return extracted, indexed
+
+def ingest_file(filepath: str, company: str, period: str, doc_key: Optional[str] = None,
+                source_name: Optional[str] = None) -> dict:
+    """
+    Extract, chunk, embed and index one document in-process. Chunks are indexed
+    in batches as they stream out of the chunker, while the PDF pool keeps
+    extracting later pages.
+
+    With doc_key (a stable name for the document, e.g. "ACME/10-K 2025"), the
+    upload replaces the previous version of that document incrementally: only
+    new or changed chunks are embedded and chunks that disappeared are deleted.
+    source_name is stored as each chunk's source_file (default: the file's own
+    name), so re-uploads saved under fresh names still match the stored chunks.
+    """
+    from document_processor import file_sha256, iter_document_chunks
+    from vector_store import get_stats
+
+    print(f"[Ingest] Processing: {filepath}")
+    print(f"[Ingest] Company: {company}, Period: {period}")
+    
+    chunks = iter_document_chunks(filepath, company, period, source_name)
+    if doc_key:
+        return reingest_chunks(chunks, doc_key)
+    extracted, indexed = index_chunks(with_file_ids(chunks, file_sha256(filepath)))
+    
+    if not extracted:
+        return {"error": "No text extracted from document", "chunks_indexed": 0}
+    
+    print(f"[Ingest] Extracted {extracted} chunks")
+    print(f"[Ingest] Indexed {indexed} new chunks")
+    
+    stats = get_stats()
+    return {
+        "success": True,
+        "chunks_indexed": indexed,
+        "total_chunks": stats["total_chunks"],
+        "companies": stats["companies"]
+    }
+
+def reingest_chunks(chunks: Iterable[Dict], doc_key: str) -> dict:
+    """
+    Align a document's new chunk sequence with its stored version by content
+    hash: matching chunks keep their embedding (their page/position metadata
+    is rewritten if it moved), new ones are embedded and stale ones are
+    tombstoned after the new version is searchable.
+    """
+    from vector_store import delete_chunks, get_stats, ids_with_prefix, refresh_chunks
+
+    stored = ids_with_prefix(document_id_prefix(doc_key))
+    current = set()
+    retained = []
+    moved = 0
+
+    def tracked():
+        nonlocal moved
+        for chunk in with_content_ids(chunks, doc_key):
+            current.add(chunk["id"])
+            if chunk["id"] in stored:
+                retained.append(chunk)
+                if len(retained) >= INGEST_BATCH:
+                    moved += refresh_chunks(retained)
+                    retained.clear()
+            yield chunk
+
+    extracted, indexed = index_chunks(tracked())
+    if retained:
+        moved += refresh_chunks(retained)
+    if not extracted:
+        # An unreadable upload must not wipe the stored version
+        return {"error": "No text extracted from document", "chunks_indexed": 0}
+    removed = delete_chunks(sorted(stored - current)) if stored - current else 0
+
+    print(f"[Ingest] {doc_key}: {extracted} chunks, {len(current & stored)} unchanged "
+          f"({moved} moved), {indexed} embedded, {removed} removed")
+    stats = get_stats()
+    return {
+        "success": True,
+        "document": doc_key,
+        "chunks_indexed": indexed,
+        "chunks_unchanged": len(current & stored),
+        "chunks_moved": moved,
+        "chunks_removed": removed,
+        "total_chunks": stats["total_chunks"],
+        "companies": stats["companies"]
+    }
+
+def _option(flag: str) -> Optional[str]:
+    """Value following flag among the optional arguments, if given."""
+    return sys.argv[sys.argv.index(flag) + 1] if flag in sys.argv[4:-1] else None
 
 def main():
     if len(sys.argv) < 4:
-        print(json.dumps({"error": "Usage: ingest_document.py <filepath> <company> <period>"}))
+        print(json.dumps({"error": "Usage: ingest_document.py <filepath> <company> <period> "
+                                   "[--doc <document key>] [--name <original file name>]"}))
         sys.exit(1)
     
     filepath = sys.argv[1]
     company = sys.argv[2]
     period = sys.argv[3]
+    doc_key = _option("--doc")
+    source_name = _option("--name")
     
     try:
-        print(f"[Ingest] Processing: {filepath}")
-        print(f"[Ingest] Company: {company}, Period: {period}")
-        
-        # Process document into chunks
-        chunks = process_document(filepath, company, period)
-        
-        if not chunks:
-            print(json.dumps({"error": "No text extracted from document", "chunks_indexed": 0}))
-            sys.exit(0)
-        
-        print(f"[Ingest] Extracted {len(chunks)} chunks")
-        
-        # Add unique IDs to chunks
-        for i, chunk in enumerate(chunks):
-            chunk["id"] = generate_chunk_id(filepath, i)
-        
-        # Batch add to vector store
-        indexed = add_chunks_batch(chunks)
-        
-        print(f"[Ingest] Indexed {indexed} new chunks")
+        result = call_daemon("/ingest", {"filepath": os.path.abspath(filepath), "company": company,
+                                         "period": period, "doc": doc_key, "name": source_name})
+        if result is None:
+            result = ingest_file(filepath, company, period, doc_key, source_name)
+        elif result.get("success"):
+            print(f"[Ingest] Indexed {result['chunks_indexed']} new chunks (daemon)")
         
-        stats = get_stats()
-        print(json.dumps({
-            "success": True,
-            "chunks_indexed": indexed,
-            "total_chunks": stats["total_chunks"],
-            "companies": stats["companies"]
-        }))
+        print(json.dumps(result))
         
     except Exception as e:
         print(f"[Ingest] Error: {e}")
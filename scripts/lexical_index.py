@@ -0,0 +1,203 @@
+"""
+Lexical Index (BM25) for the vector store
+Per-segment inverted index over chunk text, built when a segment is written,
+so it updates incrementally with add_chunks_batch and is rebuilt by compaction.
+Catches what embeddings blur: CUSIPs, covenant names, "material weakness".
+
+Segment files:
+    lex.terms.json   vocabulary + per-term [docs offset, docs bytes, tfs offset, tfs bytes, df]
+    lex.docs.bin     delta-encoded row numbers per term, LEB128 varints
+    lex.tfs.bin      term frequencies, varints
+    lex.doclen.i32   tokens per row
+
+Varints are encoded/decoded with NumPy (no per-posting Python loop).
+"""
+import os
+import re
+import json
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+_segment_cache = {}  # segment dir -> LexicalSegment (segments are immutable)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall((text or "").lower())
+
+
+# ============================================
+# VARINT CODEC
+# ============================================
+
+def varint_sizes(values: np.ndarray) -> np.ndarray:
+    """Encoded length in bytes of each value."""
+    values = np.asarray(values, dtype=np.uint64)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        nbytes += values >= (np.uint64(1) << np.uint64(7 * k))
+    return nbytes
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """LEB128-encode non-negative integers."""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b""
+    nbytes = varint_sizes(values)
+    starts = np.concatenate([[0], np.cumsum(nbytes)[:-1]])
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(int(nbytes.max())):
+        sel = nbytes > k
+        byte = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = (byte | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_varints(buf) -> np.ndarray:
+    """Inverse of encode_varints."""
+    b = np.frombuffer(buf, dtype=np.uint8)
+    if not len(b):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    if len(ends) == len(b):
+        return b.astype(np.int64)  # every value fit in one byte
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shift = (7 * (np.arange(len(b)) - starts[group])).astype(np.int64)
+    return np.add.reduceat((b & 0x7F).astype(np.int64) << shift, starts)
+
+
+# ============================================
+# WRITE
+# ============================================
+
+class LexicalWriter:
+    """Accumulates (term, row, tf) triples while a segment streams its rows."""
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self.terms = array("i")
+        self.rows = array("i")
+        self.tfs = array("i")
+        self.doclens = array("i")
+
+    def add(self, text: str):
+        tokens = tokenize(text)
+        row = len(self.doclens)
+        for term, tf in Counter(tokens).items():
+            self.terms.append(self.vocab.setdefault(term, len(self.vocab)))
+            self.rows.append(row)
+            self.tfs.append(tf)
+        self.doclens.append(len(tokens))
+
+    def write(self, seg_dir: str) -> int:
+        """Write the index files; returns the segment's total token count."""
+        terms = np.frombuffer(self.terms, dtype=np.int32)
+        rows = np.frombuffer(self.rows, dtype=np.int32).astype(np.int64)
+        tfs = np.frombuffer(self.tfs, dtype=np.int32)
+        order = np.lexsort((rows, terms))
+        terms, rows, tfs = terms[order], rows[order], tfs[order]
+
+        # Postings of term t are [bounds[t], bounds[t+1]); every term has at least one
+        bounds = np.searchsorted(terms, np.arange(len(self.vocab) + 1))
+        deltas = np.diff(rows, prepend=0)
+        deltas[bounds[:-1]] = rows[bounds[:-1]]  # each list starts from an absolute row
+
+        # One encode per stream; byte offsets of each term come from cumulative sizes
+        doc_offsets = np.concatenate([[0], np.cumsum(varint_sizes(deltas))])[bounds]
+        tf_offsets = np.concatenate([[0], np.cumsum(varint_sizes(tfs))])[bounds]
+        with open(os.path.join(seg_dir, "lex.docs.bin"), "wb") as f:
+            f.write(encode_varints(deltas))
+        with open(os.path.join(seg_dir, "lex.tfs.bin"), "wb") as f:
+            f.write(encode_varints(tfs))
+        entries = {
+            term: [int(doc_offsets[t]), int(doc_offsets[t + 1] - doc_offsets[t]),
+                   int(tf_offsets[t]), int(tf_offsets[t + 1] - tf_offsets[t]), int(bounds[t + 1] - bounds[t])]
+            for term, t in self.vocab.items()
+        }
+
+        np.frombuffer(self.doclens, dtype=np.int32).tofile(os.path.join(seg_dir, "lex.doclen.i32"))
+        total = int(np.frombuffer(self.doclens, dtype=np.int32).sum())
+        # Written last, atomically: its presence marks the index as complete
+        tmp = os.path.join(seg_dir, f"lex.terms.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"tokens": total, "terms": entries}, f, separators=(",", ":"))
+        os.replace(tmp, os.path.join(seg_dir, "lex.terms.json"))
+        return total
+
+
+def build_segment_index(seg_dir: str, texts: Iterable[str]) -> int:
+    writer = LexicalWriter()
+    for text in texts:
+        writer.add(text)
+    return writer.write(seg_dir)
+
+
+# ============================================
+# READ
+# ============================================
+
+class LexicalSegment:
+    """Read side of one segment's index."""
+
+    def __init__(self, seg_dir: str):
+        self.dir = seg_dir
+        with open(os.path.join(seg_dir, "lex.terms.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.tokens = data["tokens"]
+        self.terms = data["terms"]
+        self.doclens = np.fromfile(os.path.join(seg_dir, "lex.doclen.i32"), dtype=np.int32)
+
+    def df(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[4] if entry else 0
+
+    def postings(self, term: str) -> Optional[tuple]:
+        """(local rows, term frequencies) for a term, or None."""
+        entry = self.terms.get(term)
+        if not entry:
+            return None
+        doc_off, doc_len, tf_off, tf_len, _ = entry
+        with open(os.path.join(self.dir, "lex.docs.bin"), "rb") as f:
+            f.seek(doc_off)
+            rows = np.cumsum(decode_varints(f.read(doc_len)))
+        with open(os.path.join(self.dir, "lex.tfs.bin"), "rb") as f:
+            f.seek(tf_off)
+            tfs = decode_varints(f.read(tf_len))
+        return rows, tfs
+
+
+def has_index(seg_dir: str) -> bool:
+    return os.path.exists(os.path.join(seg_dir, "lex.terms.json"))
+
+
+def open_segment(seg_dir: str) -> LexicalSegment:
+    """Cached index of a segment."""
+    index = _segment_cache.get(seg_dir)
+    if index is None:
+        index = _segment_cache[seg_dir] = LexicalSegment(seg_dir)
+    return index
+
+
+def bm25_idf(df: int, n_docs: int) -> float:
+    return float(np.log(1 + (n_docs - df + 0.5) / (df + 0.5)))
+
+
+def bm25_scores(segment: LexicalSegment, weights: Dict[str, float], avgdl: float) -> np.ndarray:
+    """Dense BM25 scores over a segment's rows for {term: idf} (zero where no term matches)."""
+    scores = np.zeros(len(segment.doclens), dtype=np.float32)
+    for term, idf in weights.items():
+        hit = segment.postings(term)
+        if hit is None:
+            continue
+        rows, tfs = hit
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * segment.doclens[rows] / max(avgdl, 1e-9))
+        scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+    return scores
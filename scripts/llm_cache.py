@@ -0,0 +1,76 @@
+"""
+LLM Cache - persistent model outputs keyed by (model, prompt version, input hash)
+Same SQLite-per-thread pattern as embedding_cache. Bump the caller's prompt
+version whenever the prompt or its parsing changes; old entries then simply
+stop matching. Re-running a filing, or re-analyzing everything after
+reset_analysis.py, costs no API calls while the inputs are unchanged.
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import Optional
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "llm_cache.sqlite"))
+CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+
+
+def input_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """(model, prompt version, input hash) -> raw model output."""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_results (
+                model TEXT,
+                prompt_version TEXT,
+                input_hash TEXT,
+                output TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (model, prompt_version, input_hash)
+            ) WITHOUT ROWID
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get(self, model: str, prompt_version: str, text: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT output FROM llm_results WHERE model = ? AND prompt_version = ? AND input_hash = ?",
+            [model, prompt_version, input_key(text)]).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, model: str, prompt_version: str, text: str, output: str):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_results (model, prompt_version, input_hash, output) VALUES (?, ?, ?, ?)",
+                [model, prompt_version, input_key(text), output])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+_cache = LLMCache() if CACHE_ENABLED else None
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    return _cache
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+"""
+OGE 278-T Transactions - structured rows from periodic transaction reports
+Parses the transaction grid of each 278-T page (line #, description, type, date,
+notification, amount range) into typed columns with page provenance, so queries
+like "sales of X over $1M in Q4 2025" are index lookups rather than semantic
+search over prose chunks.
+
+The reports in downloads/open-cabinet-* are mostly scans with an OCR text layer,
+so parsing anchors on the right-hand columns (date, yes/no, amount) and
+tolerates OCR noise: "ourchaso" is a purchase, "S50,001 • $100,000" is the
+$50,001-$100,000 bracket. Each row keeps its raw line for checking.
+
+Pages come from document_processor.iter_pdf_pages (parallel, page-cached). Parsed
+columns are cached per file hash in data/transactions/<sha256>.npz.
+
+Usage:
+    python scripts/oge_transactions.py build <dir>
+    python scripts/oge_transactions.py query <dir> [asset words] [--type sale]
+        [--min 1000000] [--max N] [--period "Q4 2025"] [--from 2025-10-01] [--to 2025-12-31]
+"""
+import os
+import re
+import sys
+import json
+import uuid
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from lexical_index import tokenize
+
+CACHE_DIR = os.getenv("OGE_TRANSACTIONS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "data", "transactions"))
+PARSER_VERSION = 2  # bump to re-parse cached files
+TYPES = ("unknown", "purchase", "sale", "exchange")
+# OGE 278 value brackets (lower bounds); the last one is "Over $50,000,000"
+BRACKETS = (1_001, 15_001, 50_001, 100_001, 250_001, 500_001, 1_000_001, 5_000_001, 25_000_001, 50_000_001)
+NO_MAX = np.iinfo(np.int64).max
+
+# <date> [<yes/no>] <amount range> closes a row; OCR sometimes puts several rows on one line
+_NUMBER = (r"[$S]?\s?(?:[\dSO]{4,9}|[\dSO]{1,3}"
+           r"(?:(?:[,.]|\s(?=[\dSO]{3}(?:[,.]|\s*[-•·~]|\s*$)))[\dSO]{3})*)")
+TAIL_RE = re.compile(
+    r"(?P<date>\d{1,2}\s?/\s?\d{1,2}\s?/\s?\d{2,4})\s+"
+    # Notification column: a yes/no word ("VOS", "Na", "YH" in OCR) or a blank cell read as dots/dashes.
+    # Other words are not accepted, so bond call text ("CALLABLE 06/15/29 AT 100.000") is not a row
+    r"(?:(?P<notice>[YyVvNnHhWw\\'\")][^\d\s]{0,5}|[^\w\s$]{1,6})\s+)?"
+    rf"(?P<amount>(?:[Oo]ver\s+)?[-\"',.]*\s?{_NUMBER}(?:\s*[-•·~\"]+\s*{_NUMBER}|\s*-)?)(?=\s|$)"
+)
+LINE_NO_RE = re.compile(r"^[\W_]*(\d{1,3})\s+(?=\S)")
+# Lines that start or interrupt a grid (headers, amendment notes, page furniture)
+BOUNDARY_WORDS = ("description", "notification", "substitute", "over30", "over 30", "form 278", "filer",
+                  "transactions", "page", "instructions")
+COLUMNS = ("page", "line", "date", "type", "notified", "amount_min", "amount_max", "description", "raw")
+
+
+# ============================================
+# PARSING
+# ============================================
+
+def parse_type(token: str) -> int:
+    """Code in TYPES for an OCR'd type word, or 0 when it doesn't look like one."""
+    word = re.sub(r"[^a-z]", "", token.lower().lstrip("1lij|."))
+    if not word:
+        return 0
+    best, score = 0, 0.0
+    for code, name in enumerate(TYPES[1:], start=1):
+        ratio = SequenceMatcher(None, word, name).ratio()
+        # Short words need a closer match: "call" is half of "sale"
+        if ratio >= (0.75 if len(name) <= 4 else 0.5) and ratio > score:
+            best, score = code, ratio
+    return best
+
+def parse_notice(token: Optional[str]) -> int:
+    """1 for yes, 0 for no, -1 when blank or unreadable."""
+    if not token:
+        return -1
+    first = token.strip(".…•'").lower()[:1]
+    return 1 if first in ("y", "v") else 0 if first in ("n", "h") else -1
+
+def parse_date(text: str) -> Optional[np.datetime64]:
+    month, day, year = (int(p) for p in re.sub(r"\s", "", text).split("/"))
+    year += 2000 if year < 100 else 0
+    try:
+        return np.datetime64(f"{year:04d}-{month:02d}-{day:02d}", "D")
+    except ValueError:
+        return None
+
+def parse_amount(text: str) -> Tuple[int, int]:
+    """(bracket min, bracket max) from an OCR'd range; (-1, -1) if unreadable."""
+    if re.match(r"\s*over\b", text, re.I):
+        return BRACKETS[-1], NO_MAX
+    numbers, dollars = [], 0
+    for part in re.split(r"\s*[-•·~]+\s*|\s{2,}", text.strip(" \"'-")):
+        part = part.strip().strip("\"'")
+        dollar = part[:1] in "$S"
+        digits = re.sub(r"[^\d]", "", part[dollar:].replace("S", "5").replace("O", "0"))
+        # Bounds end in 000/001; without a $ anything else is a coupon or yield, not an amount
+        if len(digits) >= 4 and digits[0] != "0" and (dollar or int(digits) % 1000 in (0, 1)):
+            numbers.append(int(digits))
+            dollars += dollar
+    # A bare number ("AT 100.000") is a price or rate; amounts carry a $ or are a range,
+    # possibly with the upper bound wrapped onto the next line ("1,000,001-")
+    ranged = len(numbers) > 1 or re.search(r"\d\s*[-•·~]", text)
+    if not numbers or not (dollars or ranged):
+        return -1, -1
+    # Snap to the nearest bracket on a log scale: OCR drops and swaps digits, not magnitudes
+    lows = np.log10(np.array(BRACKETS, dtype=np.float64))
+    if len(numbers) > 1 or numbers[0] % 1000 == 1:
+        i = int(np.argmin(np.abs(lows - np.log10(numbers[0]))))
+    else:
+        # A lone upper bound ($15,000): the bracket ending there
+        i = max(0, int(np.argmin(np.abs(lows - np.log10(numbers[0] + 1)))) - 1)
+    return BRACKETS[i], (BRACKETS[i + 1] - 1 if i + 1 < len(BRACKETS) else NO_MAX)
+
+def _row(page_no: int, head: str, tail, amount: Tuple[int, int], raw: str) -> Dict:
+    head = head.strip()
+    number = LINE_NO_RE.match(head)
+    if number:
+        head = head[number.end():]
+    # The type column is the word before the date, when it reads as one
+    tokens = head.rsplit(None, 1)
+    kind = parse_type(tokens[-1]) if tokens else 0
+    if kind:
+        head = tokens[0] if len(tokens) > 1 else ""
+    return {
+        "page": page_no,
+        "line": int(number.group(1)) if number else -1,
+        "date": parse_date(tail.group("date")),
+        "type": kind,
+        "notified": parse_notice(tail.group("notice")),
+        "amount_min": amount[0],
+        "amount_max": amount[1],
+        "description": " ".join(head.strip(" |•·.-").split()),
+        "raw": raw
+    }
+
+def filing_date(filepath: str) -> Optional[np.datetime64]:
+    """Report date from the file name ("... 10.17.2025 278-T.pdf", "...-20250819.pdf"), None if absent."""
+    name = os.path.basename(filepath)
+    m = re.search(r"(?<!\d)(20\d{2})(\d{2})(\d{2})(?!\d)", name)
+    if m:
+        text = f"{m.group(2)}/{m.group(3)}/{m.group(1)}"
+    else:
+        m = re.search(r"(?<![\d.])(\d{1,2})[.\-_](\d{1,2})[.\-_](\d{4}|\d{2})(?![\d.])", name)
+        if not m:
+            return None
+        text = "/".join(m.groups())
+    try:
+        return parse_date(text)
+    except ValueError:
+        return None
+
+def _before_filing(date: Optional[np.datetime64], filed: Optional[np.datetime64]) -> Tuple[bool, Optional[np.datetime64]]:
+    """
+    (keep, date) for a row of a report filed on `filed`. Transactions precede
+    their report, so a later date is either a one-digit OCR slip in the year
+    (1/20/2028 in a February 2026 report) and is read in the filing year or
+    the one before, or it is not a transaction date and the row is dropped.
+    """
+    if filed is None or date is None or date <= filed:
+        return True, date
+    year, filed_year = str(date.astype("datetime64[Y]")), int(str(filed.astype("datetime64[Y]")))
+    for candidate in (filed_year, filed_year - 1):
+        if sum(a != b for a, b in zip(year, str(candidate))) == 1:
+            fixed = np.datetime64(f"{candidate}{str(date)[4:]}", "D") if str(date)[4:] != "-02-29" else None
+            if fixed is not None and fixed <= filed:
+                return True, fixed
+    return False, None
+
+def parse_page(page_no: int, text: str, filed: Optional[np.datetime64] = None) -> List[Dict]:
+    """
+    Transaction rows on one page; wrapped description lines join the row above.
+    With filed (the report date), no row is dated after the report.
+    """
+    rows, last, wrapped = [], None, 0
+    for line in (text or "").split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        start, found = 0, []
+        for tail in TAIL_RE.finditer(line):
+            amount = parse_amount(tail.group("amount"))
+            keep, date = _before_filing(parse_date(tail.group("date")), filed)
+            if amount[0] > 0 and keep:
+                row = _row(page_no, line[start:tail.start()], tail, amount, line[start:tail.end()].strip())
+                row["date"] = date
+                found.append(row)
+                start = tail.end()
+        if found:
+            rows.extend(found)
+            last, wrapped = found[-1], 0
+        elif any(w in line.lower() for w in BOUNDARY_WORDS):
+            last = None
+        elif last is not None and wrapped < 2 and not re.fullmatch(r"[\W\d]{0,3}", line):
+            if re.fullmatch(r"[$S]?[\d,.\s]{5,}", line):
+                continue  # upper bound wrapped onto its own line; the bracket is already known
+            last["description"] = f"{last['description']} {' '.join(line.split())}".strip()
+            last["raw"] += "\n" + line
+            wrapped += 1
+    return rows
+
+
+# ============================================
+# COLUMNAR CACHE
+# ============================================
+
+def _to_columns(rows: List[Dict]) -> Dict[str, np.ndarray]:
+    return {
+        "page": np.array([r["page"] for r in rows], dtype=np.int32),
+        "line": np.array([r["line"] for r in rows], dtype=np.int32),
+        "date": np.array([r["date"] if r["date"] is not None else np.datetime64("NaT") for r in rows],
+                         dtype="datetime64[D]"),
+        "type": np.array([r["type"] for r in rows], dtype=np.uint8),
+        "notified": np.array([r["notified"] for r in rows], dtype=np.int8),
+        "amount_min": np.array([r["amount_min"] for r in rows], dtype=np.int64),
+        "amount_max": np.array([r["amount_max"] for r in rows], dtype=np.int64),
+        "description": np.array([r["description"] for r in rows], dtype=str),
+        "raw": np.array([r["raw"] for r in rows], dtype=str),
+    }
+
+def extract_file(filepath: str, sha256: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Transaction columns of one report, from the per-hash cache when present."""
+    from document_processor import file_sha256, iter_pdf_pages
+    sha256 = sha256 or file_sha256(filepath)
+    path = os.path.join(CACHE_DIR, f"{sha256}.npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            if int(data["version"]) == PARSER_VERSION:
+                return {c: data[c] for c in COLUMNS}
+
+    rows = []
+    filed = filing_date(filepath)
+    for page_no, text in iter_pdf_pages(filepath):
+        rows.extend(parse_page(page_no, text, filed))
+    columns = _to_columns(rows)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = os.path.join(CACHE_DIR, f".{uuid.uuid4().hex}.npz")
+    np.savez(tmp, version=PARSER_VERSION, **columns)
+    os.replace(tmp, path)
+    return columns
+
+
+# ============================================
+# INDEXED TABLE
+# ============================================
+
+def period_range(period: str) -> Tuple[np.datetime64, np.datetime64]:
+    """Inclusive date range of "Q4 2025" or "2025"."""
+    m = re.fullmatch(r"\s*Q([1-4])\s+(\d{4})\s*", period, re.I)
+    if m:
+        quarter, year = int(m.group(1)), int(m.group(2))
+        start = np.datetime64(f"{year}-{3 * quarter - 2:02d}", "M")
+        return start.astype("datetime64[D]"), (start + 3).astype("datetime64[D]") - 1
+    year = int(period)
+    return np.datetime64(f"{year}-01-01"), np.datetime64(f"{year}-12-31")
+
+class TransactionTable:
+    """All rows of a set of reports, with a date order and an asset-token index."""
+
+    def __init__(self, parts: Iterable[Tuple[str, Dict[str, np.ndarray]]]):
+        parts = list(parts)
+        self.columns = {c: np.concatenate([cols[c] for _, cols in parts]) if parts else np.zeros(0)
+                        for c in COLUMNS}
+        self.columns["source_file"] = np.concatenate(
+            [np.full(len(cols["page"]), os.path.basename(path)) for path, cols in parts]) if parts else np.zeros(0)
+        self.by_date = np.argsort(self.columns["date"], kind="stable")  # NaT sorts last
+        self.sorted_dates = self.columns["date"][self.by_date]
+
+        postings: Dict[str, List[int]] = {}
+        for row, text in enumerate(self.columns["description"]):
+            for token in set(tokenize(str(text))):
+                postings.setdefault(token, []).append(row)
+        self.postings = {t: np.array(rows, dtype=np.int64) for t, rows in postings.items()}
+
+    def __len__(self):
+        return len(self.columns["page"])
+
+    def query(self, asset: Optional[str] = None, kind: Optional[str] = None,
+              start: Optional[str] = None, end: Optional[str] = None,
+              min_amount: Optional[int] = None, max_amount: Optional[int] = None) -> List[Dict]:
+        """
+        Rows matching every given condition, by date. asset matches description
+        tokens (all must appear); min_amount/max_amount bound the whole bracket,
+        so min_amount=1_000_000 means "over $1M".
+        """
+        rows = None
+        if asset:
+            for token in tokenize(asset):
+                hit = self.postings.get(token, np.zeros(0, dtype=np.int64))
+                rows = hit if rows is None else np.intersect1d(rows, hit, assume_unique=True)
+        if start or end:
+            lo = np.searchsorted(self.sorted_dates, np.datetime64(start, "D"), "left") if start else 0
+            hi = (np.searchsorted(self.sorted_dates, np.datetime64(end, "D"), "right") if end
+                  else np.searchsorted(self.sorted_dates, np.datetime64("NaT"), "left"))
+            in_range = self.by_date[lo:hi]
+            rows = in_range if rows is None else np.intersect1d(rows, in_range)
+        if rows is None:
+            rows = np.arange(len(self))
+
+        mask = np.ones(len(rows), dtype=bool)
+        if kind:
+            mask &= self.columns["type"][rows] == TYPES.index(kind)
+        if min_amount is not None:
+            mask &= self.columns["amount_min"][rows] >= min_amount
+        if max_amount is not None:
+            mask &= self.columns["amount_max"][rows] <= max_amount
+        rows = rows[mask]
+        rows = rows[np.argsort(self.columns["date"][rows], kind="stable")]
+        return [self.row(int(i)) for i in rows]
+
+    def row(self, i: int) -> Dict:
+        c = self.columns
+        date = c["date"][i]
+        return {
+            "source_file": str(c["source_file"][i]),
+            "page": int(c["page"][i]),
+            "line": int(c["line"][i]) if c["line"][i] >= 0 else None,
+            "date": None if np.isnat(date) else str(date),
+            "type": TYPES[int(c["type"][i])],
+            "notified_late": None if c["notified"][i] < 0 else bool(c["notified"][i]),
+            "amount_min": int(c["amount_min"][i]),
+            "amount_max": None if c["amount_max"][i] == NO_MAX else int(c["amount_max"][i]),
+            "description": str(c["description"][i])
+        }
+
+def load_table(root: str) -> TransactionTable:
+    """Extract (or load cached) transactions of every PDF under root, identical files once."""
+    from bulk_ingest import list_files
+    seen, parts = set(), []
+    for f in list_files(root):
+        if f["sha256"] in seen or not f["path"].lower().endswith(".pdf"):
+            continue
+        seen.add(f["sha256"])
+        parts.append((f["path"], extract_file(f["path"], f["sha256"])))
+    return TransactionTable(parts)
+
+
+def _flag(name: str, args: List[str]) -> Optional[str]:
+    if name not in args:
+        return None
+    i = args.index(name)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ("build", "query"):
+        print(__doc__.split("Usage:")[1])
+        sys.exit(1)
+    command, root = args[0], args[1]
+    if command == "build":
+        table = load_table(root)
+        print(f"[Transactions] {len(table)} rows from {root}")
+        return
+
+    rest = args[2:]
+    kind, period = _flag("--type", rest), _flag("--period", rest)
+    low, high = _flag("--min", rest), _flag("--max", rest)
+    start, end = _flag("--from", rest), _flag("--to", rest)
+    if period:
+        start, end = (str(d) for d in period_range(period))
+    rows = load_table(root).query(asset=" ".join(rest) or None, kind=kind, start=start, end=end,
+                                  min_amount=int(low) if low else None, max_amount=int(high) if high else None)
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Quantized Embeddings for the vector store
+Compact copies of each segment's unit vectors for a cheap first-pass scan:
+    int8    per-row scalar quantization (1 byte/dim + a float32 scale per row)
+    binary  sign bits packed 8 per byte, scored by Hamming distance
+The float matrix stays on disk and is only touched to rescore the best
+candidates exactly (see vector_store._scan_quantized).
+
+Sidecars written next to each segment's embeddings.bin:
+    embeddings.i8 + scales.f32    int8 codes and per-row scales
+    embeddings.b1                 packed sign bits, dim / 8 bytes per row
+"""
+import os
+import numpy as np
+from typing import Optional
+
+MODES = ("none", "int8", "binary")
+DEFAULT_MODE = os.getenv("VECTOR_STORE_QUANT", "none")
+RESCORE_FACTOR = int(os.getenv("VECTOR_STORE_RESCORE", "8"))  # candidates per result rescored exactly
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def quantize_int8(block: np.ndarray) -> tuple:
+    """(codes int8, scales float32) with block ~= codes * scales[:, None]."""
+    block = np.asarray(block, dtype=np.float32)
+    scales = np.abs(block).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(block: np.ndarray) -> np.ndarray:
+    """Sign bits of each row, packed to uint8."""
+    return np.packbits(np.asarray(block) > 0, axis=1)
+
+
+def int8_scores(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Approximate inner products (n_queries x rows) against int8 rows."""
+    return (queries @ np.asarray(codes, dtype=np.float32).T) * np.asarray(scales)
+
+
+def binary_scores(query_bits: np.ndarray, packed: np.ndarray) -> np.ndarray:
+    """Bits in agreement (n_queries x rows, as float32); higher is closer."""
+    packed = np.ascontiguousarray(packed)
+    query_bits = np.ascontiguousarray(query_bits)
+    dims = packed.shape[1] * 8
+    if hasattr(np, "bitwise_count") and packed.shape[1] % 8 == 0:
+        # Whole 64-bit words: 6 XOR + popcount per row for 384 dims
+        packed, query_bits = packed.view(np.uint64), query_bits.view(np.uint64)
+        popcount = np.bitwise_count
+    else:
+        popcount = _POPCOUNT.__getitem__
+    # Column-at-a-time accumulation: a reduce over a 6-wide axis is far slower in NumPy
+    columns = np.asfortranarray(packed)
+    xor = np.empty(len(packed), dtype=columns.dtype)
+    out = np.full((len(query_bits), len(packed)), dims, dtype=np.float32)
+    for q, bits in enumerate(query_bits):
+        for w in range(columns.shape[1]):
+            np.bitwise_xor(columns[:, w], bits[w], out=xor)
+            out[q] -= popcount(xor)
+    return out
+
+
+def write_sidecars(seg_dir: str, blocks):
+    """Stream float blocks into the int8 and binary sidecars of a segment; yields blocks through."""
+    with open(os.path.join(seg_dir, "embeddings.i8"), "wb") as f8, \
+            open(os.path.join(seg_dir, "scales.f32"), "wb") as fs, \
+            open(os.path.join(seg_dir, "embeddings.b1"), "wb") as fb:
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float32)
+            codes, scales = quantize_int8(block)
+            f8.write(codes.tobytes())
+            fs.write(scales.tobytes())
+            fb.write(quantize_binary(block).tobytes())
+            yield block
+
+
+def open_sidecar(seg_dir: str, mode: str, rows: int, dim: int) -> Optional[tuple]:
+    """Memory-mapped quantized rows of a segment, or None if it predates quantization."""
+    if mode == "int8":
+        path = os.path.join(seg_dir, "embeddings.i8")
+        if not os.path.exists(path) or not rows:
+            return None
+        return (np.memmap(path, dtype=np.int8, mode="r", shape=(rows, dim)),
+                np.memmap(os.path.join(seg_dir, "scales.f32"), dtype=np.float32, mode="r", shape=(rows,)))
+    if mode == "binary":
+        path = os.path.join(seg_dir, "embeddings.b1")
+        if not os.path.exists(path) or not rows:
+            return None
+        return (np.memmap(path, dtype=np.uint8, mode="r", shape=(rows, (dim + 7) // 8)),)
+    raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {MODES}")
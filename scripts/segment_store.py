@@ -0,0 +1,500 @@
+"""
+Segment Store - append-only on-disk format behind vector_store collections
+Each write publishes a new immutable segment; the manifest lists the live
+segments and is replaced atomically, so readers always see a consistent
+snapshot while a write or compaction is in progress.
+
+Rows inside a segment are ordered by (company, period), and partitions.json
+records the row range of each partition, so a filtered search only reads the
+ranges it selects.
+
+Layout (per collection):
+    <collection>/manifest.json                 segments, company codes/counts, tombstones
+    <collection>/.lock                         writer lock (flock / msvcrt)
+    <collection>/segments/seg-NNNNNN/
+        embeddings.bin   row-major unit vectors, rows x dim
+        embeddings.i8, scales.f32, embeddings.b1   quantized copies (quantization.py)
+        lex.*            BM25 inverted index over row text (lexical_index.py)
+        metadata.jsonl   one JSON object per row
+        offsets.i64      byte offset of each metadata line
+        companies.i32    company code of each row
+        ids.json         row ids (dedup / delete lookups without parsing metadata)
+        partitions.json  [company code, period, start, stop] runs
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import contextlib
+import numpy as np
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import quantization
+import lexical_index
+
+MANIFEST_VERSION = 2
+RETIRE_GRACE_SECONDS = 600  # old segments outlive compaction so in-flight readers can finish
+COMPACT_SEGMENTS = int(os.getenv("VECTOR_STORE_COMPACT_SEGMENTS", "16"))
+COMPACT_DELETED_FRACTION = float(os.getenv("VECTOR_STORE_COMPACT_DELETED", "0.2"))  # of all stored rows
+_ids_cache = {}  # segments are immutable, so their id lists can be cached by path
+_live_cache = {}  # ids.json path -> (tombstone count, frozenset of live ids)
+_partitions_cache = {}
+
+
+def empty_manifest(dim: int, dtype: str) -> dict:
+    return {
+        "version": MANIFEST_VERSION,
+        "epoch": 0,             # bumped by compaction (row numbers change)
+        "dim": dim,
+        "dtype": dtype,
+        "segments": [],
+        "next_segment": 0,
+        "company_codes": {},
+        "companies": {},        # live rows per company
+        "deleted": {},          # segment name -> tombstoned local rows
+        "retired": [],          # [{"name", "retired_at"}] awaiting deletion
+    }
+
+
+@contextlib.contextmanager
+def file_lock(collection_dir: str):
+    """Exclusive cross-process writer lock for a collection."""
+    os.makedirs(collection_dir, exist_ok=True)
+    with open(os.path.join(collection_dir, ".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_manifest(collection_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(collection_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(collection_dir: str, manifest: dict):
+    """Atomically publish a manifest."""
+    os.makedirs(collection_dir, exist_ok=True)
+    tmp = os.path.join(collection_dir, f"manifest.{uuid.uuid4().hex}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp, os.path.join(collection_dir, "manifest.json"))
+
+
+class Partitions:
+    """Row ranges of one segment by (company code, period)."""
+
+    def __init__(self, runs: List[list]):
+        self.runs = runs
+        self.by_code = {}
+        for code, period, start, stop in runs:
+            self.by_code.setdefault(code, []).append((period, start, stop))
+
+    def ranges(self, codes: Optional[List[int]] = None, periods: Optional[set] = None) -> List[tuple]:
+        """Sorted (start, stop) ranges of the selected partitions."""
+        codes = self.by_code if codes is None else codes
+        return sorted((start, stop) for code in codes for period, start, stop in self.by_code.get(code, ())
+                      if periods is None or period in periods)
+
+    def keys(self) -> set:
+        return {(code, period) for code, period, _, _ in self.runs}
+
+
+def _partition_key(row: Dict) -> str:
+    return str(row.get("period", ""))
+
+
+def _runs(codes: List[int], periods: List[str]) -> List[list]:
+    """Maximal runs of consecutive rows sharing (code, period)."""
+    runs = []
+    for r, key in enumerate(zip(codes, periods)):
+        if runs and (runs[-1][0], runs[-1][1]) == key:
+            runs[-1][3] = r + 1
+        else:
+            runs.append([key[0], key[1], r, r + 1])
+    return runs
+
+
+class Snapshot:
+    """Read-only view of the segments listed by one manifest."""
+
+    def __init__(self, collection_dir: str, manifest: dict):
+        self.dir = collection_dir
+        self.manifest = manifest
+        self.segments = manifest["segments"]
+        sizes = [s["rows"] for s in self.segments]
+        self.bases = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.count = int(self.bases[-1])
+
+    def _seg_path(self, i: int, name: str) -> str:
+        return os.path.join(self.dir, "segments", self.segments[i]["name"], name)
+
+    def embeddings(self, i: int) -> np.ndarray:
+        seg = self.segments[i]
+        return np.memmap(self._seg_path(i, "embeddings.bin"), dtype=self.manifest["dtype"],
+                         mode="r", shape=(seg["rows"], self.manifest["dim"]))
+
+    def vectors(self, i: int, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Float32 unit vectors for local rows [start, stop) of segment i."""
+        return np.asarray(self.embeddings(i)[start:stop], dtype=np.float32)
+
+    def partitions(self, i: int) -> Partitions:
+        """Partition catalog of segment i (derived from row order for segments that predate it)."""
+        path = self._seg_path(i, "partitions.json")
+        if path not in _partitions_cache:
+            if not os.path.exists(path):
+                with open(self._seg_path(i, "metadata.jsonl"), "r", encoding="utf-8") as f:
+                    periods = [_partition_key(json.loads(line)) for _, line in zip(range(self.segments[i]["rows"]), f)]
+                _write_json_atomic(path, _runs(self.company_codes(i).tolist(), periods))
+            with open(path, "r", encoding="utf-8") as f:
+                _partitions_cache[path] = Partitions(json.load(f))
+        return _partitions_cache[path]
+
+    def read_range(self, i: int, start: int, stop: int):
+        """Metadata of local rows [start, stop) of segment i, read sequentially."""
+        if start >= stop:
+            return
+        offset = np.fromfile(self._seg_path(i, "offsets.i64"), dtype=np.int64, count=1, offset=8 * start)[0]
+        with open(self._seg_path(i, "metadata.jsonl"), "rb") as f:
+            f.seek(int(offset))
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+    def quantized(self, i: int, mode: str) -> Optional[tuple]:
+        """Quantized rows of segment i (see quantization.open_sidecar)."""
+        return quantization.open_sidecar(os.path.join(self.dir, "segments", self.segments[i]["name"]),
+                                         mode, self.segments[i]["rows"], self.manifest["dim"])
+
+    def lexical(self, i: int) -> "lexical_index.LexicalSegment":
+        """BM25 index of segment i, built under the writer lock for segments that predate it."""
+        seg_dir = os.path.join(self.dir, "segments", self.segments[i]["name"])
+        if not lexical_index.has_index(seg_dir):
+            with file_lock(self.dir):
+                if not lexical_index.has_index(seg_dir):
+                    with open(os.path.join(seg_dir, "metadata.jsonl"), "r", encoding="utf-8") as f:
+                        texts = (json.loads(line).get("text", "") for _, line in zip(range(self.segments[i]["rows"]), f))
+                        lexical_index.build_segment_index(seg_dir, texts)
+        return lexical_index.open_segment(seg_dir)
+
+    def company_codes(self, i: int) -> np.ndarray:
+        return np.memmap(self._seg_path(i, "companies.i32"), dtype=np.int32, mode="r",
+                         shape=(self.segments[i]["rows"],))
+
+    def ids(self, i: int) -> List[str]:
+        path = self._seg_path(i, "ids.json")
+        if path not in _ids_cache:
+            with open(path, "r", encoding="utf-8") as f:
+                _ids_cache[path] = json.load(f)
+        return _ids_cache[path]
+
+    def live_mask(self, i: int) -> Optional[np.ndarray]:
+        """Boolean mask of non-deleted rows in segment i (None if nothing deleted)."""
+        deleted = self.manifest["deleted"].get(self.segments[i]["name"])
+        if not deleted:
+            return None
+        mask = np.ones(self.segments[i]["rows"], dtype=bool)
+        mask[deleted] = False
+        return mask
+
+    def locate(self, rows) -> tuple:
+        """Global row numbers -> (segment indices, local rows)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        seg = np.searchsorted(self.bases, rows, side="right") - 1
+        return seg, rows - self.bases[seg]
+
+    def gather(self, rows) -> np.ndarray:
+        """Float32 vectors for arbitrary global rows, in the given order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), self.manifest["dim"]), dtype=np.float32)
+        seg, local = self.locate(rows)
+        for i in np.unique(seg):
+            sel = seg == i
+            out[sel] = self.embeddings(i)[local[sel]]
+        return out
+
+    def read_metadata(self, rows) -> List[Dict]:
+        """Metadata for global rows, in the given order (seeks, no full parse)."""
+        seg, local = self.locate(rows)
+        out = []
+        offsets = {}
+        for i, r in zip(seg, local):
+            if i not in offsets:
+                offsets[i] = np.fromfile(self._seg_path(i, "offsets.i64"), dtype=np.int64)
+            with open(self._seg_path(i, "metadata.jsonl"), "rb") as f:
+                f.seek(int(offsets[i][r]))
+                out.append(json.loads(f.readline()))
+        return out
+
+    def iter_metadata(self):
+        """All live rows' metadata, in row order."""
+        for i in range(len(self.segments)):
+            mask = self.live_mask(i)
+            with open(self._seg_path(i, "metadata.jsonl"), "r", encoding="utf-8") as f:
+                for r, line in enumerate(f):
+                    if mask is None or mask[r]:
+                        yield json.loads(line)
+
+    def iter_blocks(self, block_rows: int, start_row: int = 0):
+        """Yield (segment index, local start, local stop) blocks covering rows >= start_row."""
+        for i, seg in enumerate(self.segments):
+            base = int(self.bases[i])
+            if base + seg["rows"] <= start_row:
+                continue
+            for start in range(max(0, start_row - base), seg["rows"], block_rows):
+                yield i, start, min(start + block_rows, seg["rows"])
+
+    def segment_live_ids(self, i: int) -> frozenset:
+        """Live ids of segment i, cached until its tombstones change."""
+        path = self._seg_path(i, "ids.json")
+        tombstones = len(self.manifest["deleted"].get(self.segments[i]["name"], ()))
+        cached = _live_cache.get(path)
+        if cached is None or cached[0] != tombstones:
+            mask = self.live_mask(i)
+            seg_ids = self.ids(i)
+            cached = _live_cache[path] = (tombstones, frozenset(
+                seg_ids if mask is None else (x for x, keep in zip(seg_ids, mask) if keep)))
+        return cached[1]
+
+    def live_subset(self, ids) -> set:
+        """The ids in `ids` that are live (cost grows with len(ids), not the store)."""
+        sets = [self.segment_live_ids(i) for i in range(len(self.segments))]
+        return {x for x in ids if any(x in s for s in sets)}
+
+    def live_ids(self) -> set:
+        ids = set()
+        for i in range(len(self.segments)):
+            ids.update(self.segment_live_ids(i))
+        return ids
+
+    def find_rows(self, wanted: set) -> Dict[str, tuple]:
+        """id -> (segment name, local row) for live rows whose id is in `wanted`."""
+        found = {}
+        for i, seg in enumerate(self.segments):
+            if self.segment_live_ids(i).isdisjoint(wanted):
+                continue
+            mask = self.live_mask(i)
+            for r, row_id in enumerate(self.ids(i)):
+                if row_id in wanted and (mask is None or mask[r]):
+                    found[row_id] = (seg["name"], r)
+        return found
+
+
+def _write_json_atomic(path: str, data):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _write_segment(collection_dir: str, manifest: dict, rows, embedding_blocks) -> dict:
+    """
+    Stream rows and embedding blocks into a temp dir, then rename it into place
+    (atomic on the same filesystem). Both arguments may be generators.
+    The caller publishes the manifest afterwards; a writer killed in between
+    leaves an unlisted seg-* dir, so names already on disk are skipped.
+    """
+    seg_root = os.path.join(collection_dir, "segments")
+    os.makedirs(seg_root, exist_ok=True)
+    tmp = os.path.join(seg_root, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+
+    with open(os.path.join(tmp, "embeddings.bin"), "wb") as f:
+        for block in quantization.write_sidecars(tmp, embedding_blocks):
+            f.write(np.ascontiguousarray(block, dtype=manifest["dtype"]).tobytes())
+
+    codes = manifest["company_codes"]
+    offsets, row_codes, periods, ids = [], [], [], []
+    lexical = lexical_index.LexicalWriter()
+    with open(os.path.join(tmp, "metadata.jsonl"), "wb") as f:
+        for row in rows:
+            offsets.append(f.tell())
+            f.write(json.dumps(row, separators=(",", ":")).encode("utf-8") + b"\n")
+            row_codes.append(codes.setdefault(row["company"], len(codes)))
+            periods.append(_partition_key(row))
+            ids.append(row["id"])
+            lexical.add(row.get("text", ""))
+    tokens = lexical.write(tmp)
+    np.asarray(offsets, dtype=np.int64).tofile(os.path.join(tmp, "offsets.i64"))
+    np.asarray(row_codes, dtype=np.int32).tofile(os.path.join(tmp, "companies.i32"))
+    with open(os.path.join(tmp, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+    with open(os.path.join(tmp, "partitions.json"), "w", encoding="utf-8") as f:
+        json.dump(_runs(row_codes, periods), f, separators=(",", ":"))
+
+    while True:
+        name = f"seg-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        if not os.path.exists(os.path.join(seg_root, name)):
+            break
+    os.rename(tmp, os.path.join(seg_root, name))
+    return {"name": name, "rows": len(ids), "tokens": tokens}
+
+
+def append(collection_dir: str, rows: List[Dict], embeddings: np.ndarray, dim: int, dtype: str) -> int:
+    """
+    Publish rows as a new segment under the writer lock.
+    Rows whose id became live since the caller's snapshot are dropped.
+    """
+    with file_lock(collection_dir):
+        manifest = read_manifest(collection_dir) or empty_manifest(dim, dtype)
+        live = Snapshot(collection_dir, manifest).live_subset(r["id"] for r in rows)
+        keep = [i for i, r in enumerate(rows) if r["id"] not in live]
+        if not keep:
+            return 0
+        # Partition order: each (company, period) becomes one contiguous range
+        keep.sort(key=lambda i: (rows[i]["company"], _partition_key(rows[i])))
+        rows = [rows[i] for i in keep]
+
+        manifest["segments"].append(_write_segment(collection_dir, manifest, rows, [embeddings[keep]]))
+        for r in rows:
+            manifest["companies"][r["company"]] = manifest["companies"].get(r["company"], 0) + 1
+        write_manifest(collection_dir, manifest)
+        return len(rows)
+
+
+def _tombstone(manifest: dict, snap: Snapshot, found: Dict[str, tuple]):
+    seg_index = {s["name"]: i for i, s in enumerate(snap.segments)}
+    company_by_code = {k: c for c, k in manifest["company_codes"].items()}
+    for name, local in found.values():
+        manifest["deleted"].setdefault(name, []).append(int(local))
+        company = company_by_code[int(snap.company_codes(seg_index[name])[local])]
+        manifest["companies"][company] -= 1
+        if manifest["companies"][company] <= 0:
+            del manifest["companies"][company]
+
+
+def delete(collection_dir: str, ids: List[str]) -> int:
+    """Tombstone rows by id. Space is reclaimed by compact()."""
+    with file_lock(collection_dir):
+        manifest = read_manifest(collection_dir)
+        if not manifest:
+            return 0
+        snap = Snapshot(collection_dir, manifest)
+        found = snap.find_rows(set(ids))
+        if not found:
+            return 0
+        _tombstone(manifest, snap, found)
+        write_manifest(collection_dir, manifest)
+        return len(found)
+
+
+def replace(collection_dir: str, rows: List[Dict], embeddings: np.ndarray, dim: int, dtype: str) -> int:
+    """
+    Publish rows as a new segment and tombstone the live rows they replace
+    (same id) in one manifest write, so readers see either version, never neither.
+    """
+    with file_lock(collection_dir):
+        manifest = read_manifest(collection_dir) or empty_manifest(dim, dtype)
+        snap = Snapshot(collection_dir, manifest)
+        _tombstone(manifest, snap, snap.find_rows({r["id"] for r in rows}))
+        order = sorted(range(len(rows)), key=lambda i: (rows[i]["company"], _partition_key(rows[i])))
+        rows = [rows[i] for i in order]
+        manifest["segments"].append(_write_segment(collection_dir, manifest, rows, [embeddings[order]]))
+        for r in rows:
+            manifest["companies"][r["company"]] = manifest["companies"].get(r["company"], 0) + 1
+        write_manifest(collection_dir, manifest)
+        return len(rows)
+
+
+def needs_compaction(manifest: Optional[dict]) -> bool:
+    """Too many segments, or enough tombstones that rewriting the store pays for itself."""
+    if not manifest:
+        return False
+    if len(manifest["segments"]) > COMPACT_SEGMENTS:
+        return True
+    deleted = sum(len(rows) for rows in manifest["deleted"].values())
+    stored = sum(s["rows"] for s in manifest["segments"])
+    return deleted > 0 and deleted >= COMPACT_DELETED_FRACTION * stored
+
+
+def compact(collection_dir: str) -> dict:
+    """
+    Merge all segments into one, dropping tombstoned rows.
+    Runs under the writer lock; readers keep using their snapshot, and the old
+    segments are only removed after RETIRE_GRACE_SECONDS.
+    """
+    with file_lock(collection_dir):
+        manifest = read_manifest(collection_dir)
+        if not manifest or (len(manifest["segments"]) <= 1 and not manifest["deleted"]):
+            return {"segments": len(manifest["segments"]) if manifest else 0, "dropped": 0}
+
+        snap = Snapshot(collection_dir, manifest)
+        names = {code: name for name, code in manifest["company_codes"].items()}
+        order = sorted({key for i in range(len(snap.segments)) for key in snap.partitions(i).keys()},
+                       key=lambda key: (names[key[0]], key[1]))
+
+        def live_ranges():
+            # Partition by partition across all segments, so the merged segment is fully partitioned
+            for code, period in order:
+                for i in range(len(snap.segments)):
+                    mask = snap.live_mask(i)
+                    for start, stop in snap.partitions(i).ranges([code], {period}):
+                        yield i, start, stop, None if mask is None else mask[start:stop]
+
+        def live_blocks():
+            for i, start, stop, mask in live_ranges():
+                block = snap.vectors(i, start, stop)
+                yield block if mask is None else block[mask]
+
+        def live_rows():
+            for i, start, stop, mask in live_ranges():
+                for r, row in enumerate(snap.read_range(i, start, stop)):
+                    if mask is None or mask[r]:
+                        yield row
+
+        old = [s["name"] for s in manifest["segments"]]
+        manifest["segments"] = []
+        merged = _write_segment(collection_dir, manifest, live_rows(), live_blocks())
+        dropped = snap.count - merged["rows"]
+        if merged["rows"]:
+            manifest["segments"].append(merged)
+        else:
+            old.append(merged["name"])
+        manifest["deleted"] = {}
+        manifest["epoch"] += 1
+        now = time.time()
+        manifest["retired"].extend({"name": n, "retired_at": now} for n in old)
+        _purge_retired(collection_dir, manifest, now)
+        write_manifest(collection_dir, manifest)
+
+        print(f"[SegmentStore] Compacted {len(old)} segments into {len(manifest['segments'])}, dropped {dropped} rows")
+        return {"segments": len(old), "dropped": dropped}
+
+
+def _purge_retired(collection_dir: str, manifest: dict, now: float):
+    """Delete retired segments past the grace period, and temp/unlisted segment dirs left by killed writers."""
+    seg_root = os.path.join(collection_dir, "segments")
+    keep = []
+    for r in manifest["retired"]:
+        if now - r["retired_at"] >= RETIRE_GRACE_SECONDS:
+            shutil.rmtree(os.path.join(seg_root, r["name"]), ignore_errors=True)
+        else:
+            keep.append(r)
+    manifest["retired"] = keep
+
+    # Only runs under the writer lock, so no temp dir here belongs to a live write,
+    # and a seg-* dir no manifest lists was never visible to any reader
+    listed = {s["name"] for s in manifest["segments"]} | {r["name"] for r in keep}
+    for name in os.listdir(seg_root):
+        if name.startswith(".tmp-") or (name.startswith("seg-") and name not in listed):
+            shutil.rmtree(os.path.join(seg_root, name), ignore_errors=True)
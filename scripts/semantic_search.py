@@ -2,6 +2,7 @@
 """
 Semantic Search CLI
 Called by Next.js API to perform vector search across document chunks.
+Forwards to the warm vector daemon when it is running, otherwise searches in-process.
 """
 import sys
 import json
@@ -10,7 +11,22 @@ import os
 # Add scripts directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-from vector_store import search_similar, get_stats, get_companies
+from daemon_client import call_daemon
+
+def run_search(query: str, top_k: int = 10) -> dict:
+    """Search in-process (loads the model and store)."""
+    from vector_store import search_similar, get_stats, get_companies
+
+    results = search_similar(query, top_k=top_k)
+    stats = get_stats()
+    companies = get_companies()
+
+    return {
+        "query": query,
+        "results": results,
+        "total_chunks": stats["total_chunks"],
+        "companies": companies
+    }
 
 def main():
     if len(sys.argv) < 2:
@@ -20,16 +36,12 @@ def main():
     query = " ".join(sys.argv[1:])
     
     try:
-        results = search_similar(query, top_k=10)
-        stats = get_stats()
-        companies = get_companies()
-        
-        print(json.dumps({
-            "query": query,
-            "results": results,
-            "total_chunks": stats["total_chunks"],
-            "companies": companies
-        }))
+        result = call_daemon("/search", {"query": query, "top_k": 10})
+        if result is None:
+            result = run_search(query, top_k=10)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        print(json.dumps(result))
     except Exception as e:
         print(json.dumps({
             "error": str(e),
@@ -0,0 +1,132 @@
+"""
+Stage Pipeline - bounded async producer/consumer stages
+Items flow through a chain of stages, each with its own worker count and a
+bounded input queue, so a slow stage applies backpressure instead of letting
+work pile up in memory. A stage function returns the item for the next stage,
+or None to drop it. A stage that raises drops the item and counts the error.
+
+AdaptiveRateLimiter (from llm_client, re-exported here) spaces calls to a
+rate-limited API. It backs off on 429/Retry-After and speeds up again while
+calls succeed.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_client import AdaptiveRateLimiter, is_rate_limited, retry_after  # noqa: F401
+
+
+class Stage:
+    """One step: `workers` concurrent calls of `fn`, reading from a queue of `queue_size`."""
+
+    def __init__(self, name: str, fn: Callable[[Any], Awaitable[Any]], workers: int = 1,
+                 queue_size: Optional[int] = None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size or 2 * self.workers)
+        self.processed = self.dropped = self.errors = 0
+        self.busy_s = 0.0
+        self.max_depth = 0
+
+    def snapshot(self, elapsed: float) -> Dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "items_per_s": round(self.processed / elapsed, 3) if elapsed else 0.0,
+            "busy_s": round(self.busy_s, 1),
+        }
+
+
+class Pipeline:
+    """Chain of stages; run() feeds items through and returns what leaves the last one."""
+
+    def __init__(self, stages: List[Stage], metrics_path: Optional[str] = None,
+                 metrics_interval_s: float = 15.0, extra_metrics: Optional[Callable[[], Dict]] = None):
+        self.stages = stages
+        self.metrics_path = metrics_path
+        self.metrics_interval_s = metrics_interval_s
+        self.extra_metrics = extra_metrics
+        self.started = time.monotonic()
+        self.results: List[Any] = []
+
+    async def _worker(self, i: int):
+        stage = self.stages[i]
+        out = self.stages[i + 1].queue if i + 1 < len(self.stages) else None
+        while True:
+            item = await stage.queue.get()
+            t0 = time.monotonic()
+            try:
+                result = await stage.fn(item)
+                stage.busy_s += time.monotonic() - t0
+                if result is None:
+                    stage.dropped += 1
+                    continue
+                stage.processed += 1
+                if out is None:
+                    self.results.append(result)
+                else:
+                    await out.put(result)  # blocks while the next stage is saturated
+                    self.stages[i + 1].max_depth = max(self.stages[i + 1].max_depth, out.qsize())
+            except Exception as e:
+                stage.busy_s += time.monotonic() - t0
+                stage.errors += 1
+                print(f"[Pipeline] {stage.name} error: {e}")
+            finally:
+                stage.queue.task_done()
+
+    def metrics(self) -> Dict:
+        elapsed = time.monotonic() - self.started
+        data = {
+            "elapsed_s": round(elapsed, 1),
+            "stages": {s.name: s.snapshot(elapsed) for s in self.stages},
+        }
+        if self.extra_metrics:
+            data.update(self.extra_metrics())
+        return data
+
+    def _report(self, final: bool = False):
+        data = self.metrics()
+        line = "  ".join(f"{name}: {m['processed']} done, q={m['queue_depth']}, {m['items_per_s']}/s"
+                         for name, m in data["stages"].items())
+        print(f"[Pipeline] {'final ' if final else ''}{data['elapsed_s']}s  {line}")
+        if self.metrics_path:
+            os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+            tmp = f"{self.metrics_path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.metrics_path)
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.metrics_interval_s)
+            self._report()
+
+    async def run(self, items: Iterable[Any]) -> List[Any]:
+        self.started = time.monotonic()
+        workers = [asyncio.create_task(self._worker(i))
+                   for i, stage in enumerate(self.stages) for _ in range(stage.workers)]
+        reporter = asyncio.create_task(self._reporter())
+        try:
+            first = self.stages[0]
+            for item in items:
+                await first.queue.put(item)
+                first.max_depth = max(first.max_depth, first.queue.qsize())
+            # Each stage's outputs are queued before its items are marked done,
+            # so draining the stages in order drains the whole pipeline
+            for stage in self.stages:
+                await stage.queue.join()
+        finally:
+            for task in workers + [reporter]:
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+        self._report(final=True)
+        return self.results
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""
+Theme Clusters - incremental trend detection over the themes collection
+Themes are already embedded when analyze_trends indexes them, so clustering
+reuses those vectors instead of asking an LLM to read every period's themes.
+
+Each run takes only the themes it has not seen yet, in mini-batches, and
+assigns each one to the most similar cluster centroid when the cosine is at
+least THEME_CLUSTER_THRESHOLD. Otherwise the theme starts a new cluster.
+Centroids are running means. Per cluster and quarter the state keeps the
+theme count, the tickers and the theme names. Only the (cluster, quarter)
+pairs that gained members are rewritten in market_trends, all in one batch.
+
+State lives in data/theme_clusters.npz. Delete it, or pass --rebuild, to
+recluster from scratch (e.g. after changing the threshold). reset_analysis.py
+deletes it along with the tables, and a state whose trend rows have gone
+missing from market_trends is rebuilt automatically.
+
+Usage: python scripts/theme_clusters.py [--rebuild]
+"""
+import os
+import sys
+import json
+import asyncio
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+STATE_PATH = os.getenv("THEME_CLUSTER_STATE", os.path.join(os.path.dirname(__file__), "..", "data", "theme_clusters.npz"))
+THRESHOLD = float(os.getenv("THEME_CLUSTER_THRESHOLD", "0.7"))
+MIN_TICKERS = int(os.getenv("THEME_TREND_MIN_TICKERS", "2"))  # a trend spans companies
+BATCH = 1024
+TOP_TICKERS = 20
+
+
+def period_of(date: str) -> str:
+    """'2026-Q1' from an ISO date (market_trends.period format)."""
+    try:
+        year, month = int(date[:4]), int(date[5:7])
+        return f"{year}-Q{(month - 1) // 3 + 1}"
+    except (TypeError, ValueError):
+        return "Unknown"
+
+
+class ClusterState:
+    """Centroid sums plus per-(cluster, period) tallies; everything update_trends() needs to resume."""
+
+    def __init__(self, dim: int = 384):  # vector_store.EMBEDDING_DIM
+        self.sums = np.zeros((0, dim), dtype=np.float32)
+        self.clusters: List[Dict] = []  # {"count", "periods": {period: {"count", "tickers", "names"}}}
+        self.seen: Set[str] = set()
+
+    @classmethod
+    def load(cls, path: str = STATE_PATH) -> "ClusterState":
+        state = cls()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                state.sums = data["sums"]
+                meta = json.loads(str(data["meta"]))
+            state.clusters = meta["clusters"]
+            state.seen = set(meta["seen"])
+        return state
+
+    def save(self, path: str = STATE_PATH):
+        """One file, replaced atomically, so centroids and tallies never disagree."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        meta = json.dumps({"clusters": self.clusters, "seen": sorted(self.seen)})
+        np.savez(tmp, sums=self.sums, meta=np.array(meta))
+        os.replace(tmp, path)
+
+    def _unit_centroids(self) -> np.ndarray:
+        norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+        return self.sums / np.maximum(norms, 1e-12)
+
+    def _new_cluster(self) -> int:
+        if len(self.clusters) == len(self.sums):  # grow capacity geometrically
+            grown = np.zeros((max(16, 2 * len(self.sums)), self.sums.shape[1]), dtype=np.float32)
+            grown[:len(self.sums)] = self.sums
+            self.sums = grown
+        self.clusters.append({"count": 0, "periods": {}})
+        return len(self.clusters) - 1
+
+    def add(self, rows: List[Dict], vectors: np.ndarray, threshold: float = THRESHOLD) -> Set[Tuple[int, str]]:
+        """Assign one mini-batch; returns the (cluster, period) pairs that changed."""
+        changed = set()
+        n = len(self.clusters)
+        sims = vectors @ self._unit_centroids()[:n].T if n else np.zeros((len(vectors), 0), dtype=np.float32)
+        best = sims.argmax(axis=1) if n else np.zeros(len(vectors), dtype=np.int64)
+        best_sim = sims.max(axis=1) if n else np.full(len(vectors), -1.0)
+
+        for j, (row, vector) in enumerate(zip(rows, vectors)):
+            cluster = int(best[j]) if best_sim[j] >= threshold else None
+            if len(self.clusters) > n:  # clusters opened earlier in this batch
+                fresh = self.sums[n:len(self.clusters)]
+                fresh_sims = (fresh / np.maximum(np.linalg.norm(fresh, axis=1, keepdims=True), 1e-12)) @ vector
+                k = int(fresh_sims.argmax())
+                if fresh_sims[k] >= max(threshold, best_sim[j]):
+                    cluster = n + k
+            if cluster is None:
+                cluster = self._new_cluster()
+
+            self.sums[cluster] += vector
+            info = self.clusters[cluster]
+            info["count"] += 1
+            period = period_of(row.get("date", ""))
+            tally = info["periods"].setdefault(period, {"count": 0, "tickers": {}, "names": {}})
+            tally["count"] += 1
+            ticker = row.get("company") or "UNKNOWN"
+            tally["tickers"][ticker] = tally["tickers"].get(ticker, 0) + 1
+            name = (row.get("theme") or "").strip()
+            if name:
+                tally["names"][name] = tally["names"].get(name, 0) + 1
+            self.seen.add(row["id"])
+            changed.add((cluster, period))
+        return changed
+
+    def has_trends(self) -> bool:
+        """Whether any (cluster, period) is wide enough to have a market_trends row."""
+        return any(len(tally["tickers"]) >= MIN_TICKERS
+                   for info in self.clusters for tally in info["periods"].values())
+
+    def trend(self, cluster: int, period: str) -> Dict:
+        """market_trends fields for one cluster in one period."""
+        tally = self.clusters[cluster]["periods"][period]
+        names = Counter(tally["names"]).most_common(4)
+        tickers = [t for t, _ in Counter(tally["tickers"]).most_common(TOP_TICKERS)]
+        description = f"{tally['count']} themes across {len(tally['tickers'])} companies"
+        if len(names) > 1:
+            description += "; also described as " + ", ".join(n for n, _ in names[1:])
+        return {"trend_name": names[0][0] if names else f"Cluster {cluster}", "description": description,
+                "related_tickers": tickers, "frequency": tally["count"]}
+
+
+async def write_trends(client, state: ClusterState, changed: Set[Tuple[int, str]]) -> int:
+    """Replace the market_trends rows of the changed (cluster, period) pairs in one batch."""
+    statements = []
+    written = 0
+    for cluster, period in sorted(changed, key=lambda c: (c[1], c[0])):
+        statements.append(("DELETE FROM market_trends WHERE period = ? AND cluster_id = ?", [period, cluster]))
+        trend = state.trend(cluster, period)
+        if len(trend["related_tickers"]) < MIN_TICKERS:
+            continue
+        statements.append((
+            "INSERT INTO market_trends (period, trend_name, description, related_tickers, frequency, cluster_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [period, trend["trend_name"], trend["description"], json.dumps(trend["related_tickers"]),
+             trend["frequency"], cluster]))
+        written += 1
+    if statements:
+        await client.batch(statements)
+    return written
+
+
+def reset_state(path: str = STATE_PATH):
+    """Forget all clusters (the next update_trends reclusters every theme)."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def update_trends(client, rebuild: bool = False) -> Dict:
+    """Cluster the themes indexed since the last run and refresh their market_trends rows."""
+    from vector_store import iter_unseen
+    state = ClusterState() if rebuild else ClusterState.load()
+    if not rebuild and state.has_trends():
+        rs = await client.execute("SELECT count(*) FROM market_trends WHERE cluster_id IS NOT NULL")
+        if not rs.rows[0][0]:  # tables were reset under a saved state
+            print("[Trends] market_trends has no cluster rows; rebuilding clusters")
+            state, rebuild = ClusterState(), True
+    changed = set()
+    added = 0
+    for rows, vectors in iter_unseen(state.seen, block_rows=BATCH):
+        changed |= state.add(rows, vectors)
+        added += len(rows)
+    if rebuild:
+        await client.execute("DELETE FROM market_trends WHERE cluster_id IS NOT NULL")
+    written = await write_trends(client, state, changed)
+    state.save()
+    result = {"themes_added": added, "clusters": len(state.clusters), "changed": len(changed), "trends_written": written}
+    print(f"[Trends] {result}")
+    return result
+
+
+async def main():
+    from dotenv import load_dotenv
+    from theme_store import open_client
+    load_dotenv()
+    url = (os.getenv("TURSO_DATABASE_URL") or "").replace("libsql://", "https://")
+    async with open_client(url, os.getenv("TURSO_AUTH_TOKEN")) as client:
+        await update_trends(client, rebuild="--rebuild" in sys.argv)
+
+if __name__ == "__main__":
+    asyncio.run(main())
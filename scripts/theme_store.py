@@ -0,0 +1,394 @@
+"""
+Theme Store - batched persistence for filing_themes / market_trends
+Every call to the remote libsql (Turso) client is an HTTP round trip, so this
+module keeps them per batch rather than per row:
+    processed_accessions   one IN (...) query for a whole list of filings
+    BatchWriter            group commit: concurrent writes go out as one
+                           libsql batch (a single transaction)
+    iter_filing_themes     keyset-paged scan instead of pulling the whole table
+
+Any client with the libsql_client interface works: async execute(sql, args)
+returning .rows, and batch(statements). LocalClient wraps the standard library's
+sqlite3 in that interface.
+
+open_client() is how scripts connect. With Turso credentials it returns a
+ReplicaClient: reads are served from a local SQLite copy of both tables, kept
+current by pulling rows past the local high-water mark, and writes go to Turso
+first. Without credentials everything runs on a local database file.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Sequence
+
+PAGE_SIZE = 500
+WRITE_BATCH = 32
+WRITE_LINGER_S = 1.0   # a partial batch waits at most this long for company
+MAX_PARAMS = 500       # bound variables per IN (...), below SQLite's limit
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+REPLICA_PATH = os.getenv("THEME_REPLICA_PATH", os.path.join(DATA_DIR, "theme_replica.db"))
+LOCAL_PATH = os.getenv("THEME_LOCAL_PATH", os.path.join(DATA_DIR, "themes_local.db"))
+REPLICA_MAX_AGE_S = float(os.getenv("THEME_REPLICA_MAX_AGE_S", "300"))  # resync before reads older than this
+REPLICATED = ("filing_themes", "market_trends")
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS filing_themes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        accession_number TEXT,
+        cik TEXT,
+        ticker TEXT,
+        form TEXT,
+        filing_date TEXT,
+        filing_url TEXT, -- Direct link to SEC filing
+        themes TEXT, -- JSON array of themes
+        extracted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(accession_number)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS market_trends (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        period TEXT, -- e.g. "2026-Q1"
+        trend_name TEXT,
+        description TEXT,
+        related_tickers TEXT, -- JSON array
+        frequency INTEGER,
+        generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        cluster_id INTEGER -- theme_clusters cluster this trend row summarizes
+    )
+    """,
+]
+# Columns added after the tables first shipped: (table, column, declaration)
+COLUMNS = [("market_trends", "cluster_id", "INTEGER")]
+INDEXES = [
+    # check_status (latest first), market-trends route (by filing date), per-ticker lookups
+    "CREATE INDEX IF NOT EXISTS idx_filing_themes_extracted_at ON filing_themes(extracted_at)",
+    "CREATE INDEX IF NOT EXISTS idx_filing_themes_filing_date ON filing_themes(filing_date, extracted_at)",
+    "CREATE INDEX IF NOT EXISTS idx_filing_themes_ticker ON filing_themes(ticker)",
+    "CREATE INDEX IF NOT EXISTS idx_market_trends_period_cluster ON market_trends(period, cluster_id)",
+]
+SCHEMA = TABLES + INDEXES  # for freshly created tables
+
+INSERT_FILING = (
+    "INSERT OR IGNORE INTO filing_themes (accession_number, cik, ticker, form, filing_date, filing_url, themes) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+async def initialize_schema(client):
+    """Create tables, add any missing columns, then create indexes."""
+    print("[DB] Initializing schema...")
+    await client.batch(TABLES)
+    for table, column, declaration in COLUMNS:
+        rs = await client.execute(f"PRAGMA table_info({table})")
+        if column not in {row[1] for row in rs.rows}:
+            await client.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    await client.batch(INDEXES)
+
+def _initialize_sqlite(conn: sqlite3.Connection):
+    """initialize_schema for a plain sqlite3 connection."""
+    for stmt in TABLES:
+        conn.execute(stmt)
+    for table, column, declaration in COLUMNS:
+        if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    for stmt in INDEXES:
+        conn.execute(stmt)
+
+
+# ============================================
+# READS
+# ============================================
+
+async def processed_accessions(client, accessions: Sequence[str]) -> set:
+    """The subset of accessions already in filing_themes."""
+    unique = list(dict.fromkeys(accessions))
+    found = set()
+    for i in range(0, len(unique), MAX_PARAMS):
+        part = unique[i:i + MAX_PARAMS]
+        rs = await client.execute(
+            f"SELECT accession_number FROM filing_themes WHERE accession_number IN ({','.join('?' * len(part))})", part)
+        found.update(row[0] for row in rs.rows)
+    return found
+
+async def count_filings(client) -> int:
+    rs = await client.execute("SELECT count(*) FROM filing_themes")
+    return rs.rows[0][0]
+
+async def latest_filings(client, limit: int = 5) -> List[Dict]:
+    rs = await client.execute(
+        "SELECT ticker, form, filing_date, extracted_at FROM filing_themes ORDER BY extracted_at DESC LIMIT ?", [limit])
+    return [{"ticker": r[0], "form": r[1], "date": r[2], "extracted_at": r[3]} for r in rs.rows]
+
+async def iter_filing_themes(client, page_size: int = PAGE_SIZE) -> AsyncIterator[List[Dict]]:
+    """
+    filing_themes in pages of page_size rows. Pages follow the primary key
+    (WHERE id > last), so every page is an index range scan and the table
+    never has to fit in memory.
+    """
+    last_id = 0
+    while True:
+        rs = await client.execute(
+            "SELECT id, accession_number, cik, ticker, form, filing_date, filing_url, themes "
+            "FROM filing_themes WHERE id > ? ORDER BY id LIMIT ?", [last_id, page_size])
+        if not rs.rows:
+            return
+        yield [{"accession": r[1], "cik": r[2], "ticker": r[3], "form": r[4], "date": r[5],
+                "url": r[6], "themes": r[7]} for r in rs.rows]
+        last_id = rs.rows[-1][0]
+        if len(rs.rows) < page_size:
+            return
+
+
+# ============================================
+# WRITES
+# ============================================
+
+def filing_statement(filing: Dict):
+    return (INSERT_FILING, [filing['accession'], filing['cik'], filing['ticker'], filing['form'],
+                            filing['date'], filing['url'], json.dumps(filing['themes'])])
+
+async def save_filings(client, filings: List[Dict]):
+    """Insert filings in one transaction; accessions already stored are left alone."""
+    if filings:
+        await client.batch([filing_statement(f) for f in filings])
+
+
+class BatchWriter:
+    """
+    Group commit for concurrent producers: write() queues the filing and returns
+    once the batch holding it is committed. A batch goes out when it has
+    batch_size filings or linger_s after its first one, whichever is first.
+    """
+
+    def __init__(self, client, batch_size: int = WRITE_BATCH, linger_s: float = WRITE_LINGER_S):
+        self.client = client
+        self.batch_size = batch_size
+        self.linger_s = linger_s
+        self.batches = self.written = 0
+        self._pending = []
+        self._timer = None
+
+    async def write(self, filing: Dict):
+        done = asyncio.get_running_loop().create_future()
+        self._pending.append((filing, done))
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._linger())
+        await done
+
+    async def _linger(self):
+        await asyncio.sleep(self.linger_s)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            await save_filings(self.client, [f for f, _ in pending])
+        except Exception as e:
+            for _, done in pending:
+                done.set_exception(e)
+            return
+        self.batches += 1
+        self.written += len(pending)
+        for _, done in pending:
+            done.set_result(None)
+
+
+# ============================================
+# LOCAL CLIENT
+# ============================================
+
+class ResultSet:
+    def __init__(self, rows, rows_affected: int = 0, last_insert_rowid=None, columns=()):
+        self.rows = rows
+        self.columns = columns
+        self.rows_affected = rows_affected
+        self.last_insert_rowid = last_insert_rowid
+
+
+class LocalClient:
+    """sqlite3 file behind the async libsql_client interface (execute/batch/close)."""
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+    @staticmethod
+    def _split(stmt):
+        if isinstance(stmt, str):
+            return stmt, []
+        if isinstance(stmt, tuple):
+            return stmt[0], list(stmt[1] or [])
+        return stmt.sql, list(stmt.args or [])  # libsql_client.Statement
+
+    def _run(self, stmt) -> ResultSet:
+        sql, args = self._split(stmt)
+        cur = self.conn.execute(sql, args)
+        columns = tuple(d[0] for d in cur.description or ())
+        return ResultSet(cur.fetchall(), cur.rowcount, cur.lastrowid, columns)
+
+    async def execute(self, sql, args=None) -> ResultSet:
+        return self._run((sql, args) if isinstance(sql, str) else sql)
+
+    async def batch(self, stmts) -> List[ResultSet]:
+        """All statements in one transaction, rolled back if any fails (as libsql does)."""
+        self.conn.execute("BEGIN")
+        try:
+            results = [self._run(s) for s in stmts]
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return results
+
+    async def close(self):
+        self.conn.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+# ============================================
+# REPLICA
+# ============================================
+
+def _is_read(sql) -> bool:
+    sql = sql if isinstance(sql, str) else sql[0] if isinstance(sql, tuple) else sql.sql
+    return sql.lstrip().upper().startswith(("SELECT", "WITH"))
+
+
+class ReplicaClient:
+    """
+    Turso for writes, a local SQLite copy of filing_themes/market_trends for reads.
+
+    Rows are insert-only, so sync() pulls just the rows past the local max(id)
+    (AUTOINCREMENT ids only grow; extracted_at has 1s resolution and can tie).
+    If the row counts still disagree afterwards, rows were deleted or the
+    tables were reset remotely, and that table is copied again in full.
+
+    Syncs run one at a time: each holds a transaction open on the local
+    connection across its remote round trips, so concurrent writers queue on
+    _sync_lock instead of opening a second transaction there.
+    """
+
+    def __init__(self, remote, local: LocalClient, max_age_s: float = REPLICA_MAX_AGE_S):
+        self.remote = remote
+        self.local = local
+        self.max_age_s = max_age_s
+        self.synced_at = 0.0
+        self._sync_lock = asyncio.Lock()
+        _initialize_sqlite(local.conn)
+
+    async def _pull(self, table: str, after: int) -> int:
+        pulled = 0
+        while True:
+            rs = await self.remote.execute(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", [after, PAGE_SIZE])
+            if not rs.rows:
+                return pulled
+            columns = ",".join(rs.columns)
+            self.local.conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({','.join('?' * len(rs.columns))})",
+                [tuple(row) for row in rs.rows])
+            pulled += len(rs.rows)
+            after = rs.rows[-1][0]
+            if len(rs.rows) < PAGE_SIZE:
+                return pulled
+
+    async def sync_table(self, table: str) -> int:
+        rs = await self.remote.execute(f"SELECT count(*), coalesce(max(id), 0) FROM {table}")
+        remote_count, remote_max = rs.rows[0][0], rs.rows[0][1]
+        local_count, local_max = self.local.conn.execute(f"SELECT count(*), coalesce(max(id), 0) FROM {table}").fetchone()
+        if (local_count, local_max) == (remote_count, remote_max):
+            return 0
+        conn = self.local.conn
+        conn.execute("BEGIN")  # other readers of the file never see a partial pull
+        try:
+            pulled = await self._pull(table, local_max) if remote_max >= local_max else 0
+            if conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] != remote_count:
+                print(f"[Replica] {table} changed remotely, copying it again")
+                conn.execute(f"DELETE FROM {table}")
+                pulled = await self._pull(table, 0)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return pulled
+
+    async def sync(self) -> Dict[str, int]:
+        """Bring both tables up to date; {table: rows pulled}."""
+        async with self._sync_lock:
+            pulled = {table: await self.sync_table(table) for table in REPLICATED}
+            self.synced_at = time.monotonic()
+        if any(pulled.values()):
+            print(f"[Replica] Pulled {pulled}")
+        return pulled
+
+    async def execute(self, sql, args=None):
+        if _is_read(sql):
+            if time.monotonic() - self.synced_at > self.max_age_s:
+                await self.sync()
+            return await self.local.execute(sql, args)
+        rs = await self.remote.execute(sql, args)
+        await self.sync()
+        return rs
+
+    async def batch(self, stmts):
+        stmts = list(stmts)
+        if all(_is_read(s) for s in stmts):
+            async with self._sync_lock:  # not inside a sync's transaction
+                return await self.local.batch(stmts)
+        results = await self.remote.batch(stmts)
+        await self.sync()
+        return results
+
+    async def close(self):
+        await self.local.close()
+        await self.remote.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+@asynccontextmanager
+async def open_client(url: str = None, auth_token: str = None):
+    """
+    Replica of Turso when credentials are set, otherwise a local-only database.
+    Either way the schema exists and reads are local.
+    """
+    if not url or not auth_token:
+        print(f"[DB] No TURSO credentials, running local-only ({os.path.normpath(LOCAL_PATH)})")
+        async with LocalClient(LOCAL_PATH) as client:
+            await initialize_schema(client)
+            yield client
+        return
+
+    import libsql_client
+    async with libsql_client.create_client(url, auth_token=auth_token) as remote:
+        await initialize_schema(remote)  # a fresh database has no tables to sync yet
+        replica = ReplicaClient(remote, LocalClient(REPLICA_PATH))
+        try:
+            await replica.sync()
+            yield replica
+        finally:
+            await replica.local.close()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Vector Daemon - long-running local search/ingest service
+Keeps the embedding model, store and ANN index resident so semantic_search.py
+and ingest_document.py don't pay model start-up on every request.
+
+Concurrent /search requests are micro-batched: queries arriving within
+BATCH_WINDOW_MS are embedded in one model call and scored in one pass.
+A background thread compacts collections (merging segments, dropping deleted
+rows) every COMPACT_INTERVAL_S while searches keep reading their snapshot.
+
+Usage: python scripts/vector_daemon.py [port]
+Routes:
+    GET  /health
+    GET  /stats
+    POST /search   {"query", "top_k"?, "company"?, "mode"?}
+    POST /ingest   {"filepath", "company", "period", "doc"?, "name"?}
+"""
+import os
+import sys
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import vector_store
+import segment_store
+from daemon_client import DAEMON_HOST, DAEMON_PORT
+from embedding_cache import cache_stats
+from ingest_document import ingest_file
+
+BATCH_WINDOW_MS = int(os.getenv("VECTOR_DAEMON_BATCH_MS", "5"))
+MAX_BATCH = int(os.getenv("VECTOR_DAEMON_MAX_BATCH", "32"))
+COMPACT_INTERVAL_S = int(os.getenv("VECTOR_DAEMON_COMPACT_S", "300"))
+
+
+class QueryBatcher:
+    """Collects concurrent search requests and serves them with batched search calls."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.queries = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, query: str, top_k: int, company, mode=None) -> Future:
+        future = Future()
+        self._queue.put((query, top_k, company, mode, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_WINDOW_MS / 1000
+            while len(pending) < MAX_BATCH:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            # Requests with the same (top_k, company, mode) share one search call
+            groups = {}
+            for item in pending:
+                groups.setdefault(item[1:4], []).append(item)
+
+            for (top_k, company, mode), items in groups.items():
+                try:
+                    results = vector_store.search_similar_batch(
+                        [i[0] for i in items], top_k=top_k, company_filter=company, mode=mode)
+                    for item, res in zip(items, results):
+                        item[4].set_result(res)
+                except Exception as e:
+                    for item in items:
+                        item[4].set_exception(e)
+
+            self.batches += 1
+            self.queries += len(pending)
+
+
+def compaction_loop():
+    """Periodically compact collections that have piled up segments or tombstones."""
+    while True:
+        time.sleep(COMPACT_INTERVAL_S)
+        for collection in (vector_store.DEFAULT_COLLECTION, vector_store.THEMES_COLLECTION):
+            try:
+                if segment_store.needs_compaction(vector_store._snapshot(collection).manifest):
+                    vector_store.compact(collection)
+            except Exception as e:
+                print(f"[Daemon] Compaction of {collection} failed: {e}")
+
+
+class DaemonHandler(BaseHTTPRequestHandler):
+    batcher: QueryBatcher = None
+    ingest_lock = threading.Lock()
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stats(self) -> dict:
+        stats = vector_store.get_stats()
+        return {
+            "total_chunks": stats["total_chunks"],
+            "companies": vector_store.get_companies(),
+            "batches": self.batcher.batches,
+            "queries": self.batcher.queries,
+            "embedding_cache": cache_stats(),
+        }
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, {"ok": True})
+        elif self.path == "/stats":
+            self._reply(200, self._stats())
+        else:
+            self._reply(404, {"error": f"Unknown route {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path == "/search":
+                query = payload.get("query")
+                if not query:
+                    self._reply(400, {"error": "No query provided", "results": []})
+                    return
+                results = self.batcher.submit(query, int(payload.get("top_k", 10)), payload.get("company"),
+                                              payload.get("mode")).result()
+                stats = vector_store.get_stats()
+                self._reply(200, {
+                    "query": query,
+                    "results": results,
+                    "total_chunks": stats["total_chunks"],
+                    "companies": vector_store.get_companies()
+                })
+
+            elif self.path == "/ingest":
+                # One writer at a time; searches keep running against the last published manifest
+                with self.ingest_lock:
+                    result = ingest_file(payload["filepath"], payload["company"], payload["period"],
+                                         payload.get("doc"), payload.get("name"))
+                self._reply(200, result)
+
+            else:
+                self._reply(404, {"error": f"Unknown route {self.path}"})
+        except Exception as e:
+            print(f"[Daemon] Error on {self.path}: {e}")
+            self._reply(500, {"error": str(e), "results": []})
+
+    def log_message(self, format, *args):
+        pass  # keep stdout for our own [Daemon] lines
+
+
+def serve(port: int = DAEMON_PORT):
+    print("[Daemon] Warming up embedding model...")
+    vector_store.get_embedding_model().encode(["warm up"])
+    print(f"[Daemon] Store: {vector_store.get_stats()['total_chunks']} chunks")
+
+    DaemonHandler.batcher = QueryBatcher()
+    threading.Thread(target=compaction_loop, daemon=True).start()
+    server = ThreadingHTTPServer((DAEMON_HOST, port), DaemonHandler)
+    print(f"[Daemon] Listening on http://{DAEMON_HOST}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[Daemon] Stopping")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else DAEMON_PORT)
@@ -1,186 +1,713 @@
 """
 Vector Store for Document Chunks
-Uses a local JSON file for storage with Hugging Face Inference API for embeddings.
+Stores embeddings as binary float32/float16 matrices opened with np.memmap,
+with JSON-lines metadata sidecars, in append-only segments (see segment_store.py).
 Supports semantic search across uploaded documents.
+
+Collections: "chunks" (uploaded documents) and "themes" (LLM-extracted filing themes).
+
+Layout (per collection):
+    vector_store/<collection>/manifest.json    live segments, per-company counts, tombstones
+    vector_store/<collection>/segments/        immutable segments (matrix + metadata + ids)
+    vector_store/<collection>/ivf.npz          optional ANN index (see ann_index.py)
+
+Embeddings are unit-normalized on write, so scoring is a single matrix product.
+Writes take a file lock and publish a new segment atomically; readers work on
+the manifest they loaded, so they never see a half-written insert.
 """
 import os
 import json
+import shutil
+import threading
 import numpy as np
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
 
+import segment_store
+from segment_store import Snapshot
+
 load_dotenv()
 
+from embedding_runtime import EMBEDDING_MODEL_ID, runtime_model_id  # reads EMBEDDING_* from .env
+
 # File-based storage
-STORE_PATH = os.path.join(os.path.dirname(__file__), "..", "vector_store.json")
+STORE_DIR = os.path.join(os.path.dirname(__file__), "..", "vector_store")
+LEGACY_STORE_PATH = os.path.join(os.path.dirname(__file__), "..", "vector_store.json")
+DEFAULT_COLLECTION = "chunks"
+THEMES_COLLECTION = "themes"
+EMBEDDING_DIM = 384
+STORE_DTYPE = os.getenv("VECTOR_STORE_DTYPE", "float32")
+SCAN_BLOCK_ROWS = 65536  # rows scored per block, bounds temporary memory during a scan
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "50000"))  # below this, exact search is fast enough
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+SEARCH_MODE = os.getenv("VECTOR_SEARCH_MODE", "vector")  # "hybrid" adds BM25 with rank fusion
+HYBRID_DEPTH = 50  # candidates per retriever before fusion
+RRF_K = 60         # reciprocal rank fusion constant
 _embedding_model = None
+_ann_cache = {}
 
 def get_embedding_model():
-    """Lazy-load the sentence-transformers model."""
+    """Lazy-load the embedding runtime (torch or ONNX, see embedding_runtime.py)."""
     global _embedding_model
     if _embedding_model is None:
-        from sentence_transformers import SentenceTransformer
+        from embedding_runtime import EmbeddingRuntime
         print("[VectorStore] Loading embedding model...")
-        _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        _embedding_model = EmbeddingRuntime()
     return _embedding_model
 
-def load_store() -> dict:
-    """Load the vector store from disk."""
-    if os.path.exists(STORE_PATH):
-        with open(STORE_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"chunks": [], "embeddings": []}
-
-def save_store(data: dict):
-    """Save the vector store to disk."""
-    with open(STORE_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
-
 def embed_text(text: str) -> list[float]:
     """Embed a single text string."""
-    model = get_embedding_model()
-    return model.encode(text).tolist()
+    return embed_batch([text])[0]
 
 def embed_batch(texts: List[str]) -> List[list]:
-    """Embed multiple texts efficiently."""
-    model = get_embedding_model()
-    return [emb.tolist() for emb in model.encode(texts)]
+    """Embed multiple texts efficiently; only cache misses are sent to the model."""
+    from embedding_cache import get_disk_cache
+    cache = get_disk_cache()
+    if cache is None or not texts:
+        model = get_embedding_model()
+        return [emb.tolist() for emb in model.encode(texts)]
+
+    model_id = runtime_model_id()
+    vectors = cache.get_many(model_id, texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        # Identical texts within the batch are embedded once
+        unique = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = dict(zip(unique, get_embedding_model().encode(unique)))
+        cache.put_many(model_id, unique, [encoded[t] for t in unique])
+        for i in missing:
+            vectors[i] = encoded[texts[i]]
+    return [np.asarray(v, dtype=np.float32).tolist() for v in vectors]
+
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """Unit query vectors, served from the in-memory LRU when repeated."""
+    from embedding_cache import get_query_lru, text_key
+    lru = get_query_lru()
+    keys = [text_key(q) for q in queries]
+    vectors = [lru.get(k) for k in keys]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = normalize_rows(embed_batch([queries[i] for i in missing]))
+        for i, v in zip(missing, fresh):
+            lru.put(keys[i], v)
+            vectors[i] = v
+    return np.vstack(vectors)
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Scale rows to unit length so a dot product is cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# ======================================
+# STORAGE
+# ======================================
+
+def _collection_dir(collection: str) -> str:
+    return os.path.join(STORE_DIR, collection)
 
-def cosine_similarity(a: list[float], b: list[float]) -> float:
-    """Calculate cosine similarity between two vectors."""
-    a_np = np.array(a)
-    b_np = np.array(b)
-    return float(np.dot(a_np, b_np) / (np.linalg.norm(a_np) * np.linalg.norm(b_np)))
+def _path(collection: str, name: str) -> str:
+    return os.path.join(_collection_dir(collection), name)
 
-def add_chunk(chunk_id: str, company: str, period: str, text: str, 
+def _snapshot(collection: str) -> Snapshot:
+    """Consistent read view of a collection (one manifest read)."""
+    if collection == DEFAULT_COLLECTION:
+        _maybe_migrate_legacy()
+    manifest = segment_store.read_manifest(_collection_dir(collection))
+    if manifest is None:
+        manifest = segment_store.empty_manifest(EMBEDDING_DIM, STORE_DTYPE)
+    return Snapshot(_collection_dir(collection), manifest)
+
+def _live_count(snap: Snapshot) -> int:
+    return sum(snap.manifest["companies"].values())
+
+def _append_rows(collection: str, rows: List[Dict], embeddings: np.ndarray) -> int:
+    """Publish rows as a new segment (rows whose id is already live are skipped)."""
+    _snapshot(collection)  # runs any pending migration first
+    return segment_store.append(_collection_dir(collection), rows, normalize_rows(embeddings),
+                                EMBEDDING_DIM, STORE_DTYPE)
+
+def _maybe_migrate_legacy():
+    """One-shot migration from the old vector_store.json on first access."""
+    if os.path.exists(LEGACY_STORE_PATH) and not os.path.exists(_path(DEFAULT_COLLECTION, "manifest.json")):
+        migrate_json_store(LEGACY_STORE_PATH)
+
+def migrate_json_store(json_path: str = LEGACY_STORE_PATH, collection: str = DEFAULT_COLLECTION) -> int:
+    """Convert a legacy JSON store into the binary format. Returns rows migrated."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+
+    chunks = legacy.get("chunks", [])
+    cdir = _collection_dir(collection)
+    if chunks:
+        embeddings = np.asarray(legacy["embeddings"], dtype=np.float32)
+        segment_store.append(cdir, [_chunk_row(c) for c in chunks], normalize_rows(embeddings),
+                             EMBEDDING_DIM, STORE_DTYPE)
+    elif segment_store.read_manifest(cdir) is None:
+        segment_store.write_manifest(cdir, segment_store.empty_manifest(EMBEDDING_DIM, STORE_DTYPE))
+
+    print(f"[VectorStore] Migrated {len(chunks)} chunks from {os.path.basename(json_path)}")
+    return len(chunks)
+
+def _chunk_row(chunk: Dict) -> Dict:
+    row = {
+        "id": chunk["id"],
+        "company": chunk.get("company", "Unknown"),
+        "period": chunk.get("period", "Unknown"),
+        "text": chunk["text"],
+        "source_file": chunk.get("source_file", ""),
+        "position": chunk.get("position", 0)
+    }
+    if chunk.get("page"):
+        # Provenance for citations: the span runs from char_start on page to
+        # char_end on page_end (offsets into each page's extracted text)
+        for key in ("page", "char_start", "page_end", "char_end"):
+            if chunk.get(key) is not None:
+                row[key] = chunk[key]
+    return row
+
+
+# ======================================
+# PUBLIC API
+# ======================================
+
+def add_chunk(chunk_id: str, company: str, period: str, text: str,
               source_file: str = "", position: int = 0) -> bool:
     """Add a document chunk to the vector store."""
-    store = load_store()
-    
-    # Check if already exists
-    for c in store["chunks"]:
-        if c["id"] == chunk_id:
-            return False  # Skip duplicate
-    
-    # Embed the text
-    embedding = embed_text(text)
-    
-    # Store with metadata
-    store["chunks"].append({
+    return add_chunks_batch([{
         "id": chunk_id,
         "company": company,
         "period": period,
         "text": text,
         "source_file": source_file,
         "position": position
-    })
-    store["embeddings"].append(embedding)
-    
-    save_store(store)
-    return True
+    }]) == 1
 
-def add_chunks_batch(chunks: List[Dict]) -> int:
-    """Add multiple chunks efficiently with batch embedding."""
-    store = load_store()
-    
-    # Filter out duplicates
-    existing_ids = {c["id"] for c in store["chunks"]}
-    new_chunks = [c for c in chunks if c.get("id") not in existing_ids]
-    
-    if not new_chunks:
+def _add_rows(collection: str, rows: List[Dict]) -> int:
+    """Dedup by id, embed all new rows in one model call and append them in one write."""
+    snap = _snapshot(collection)
+
+    # Filter out duplicates (against the store and within the batch)
+    existing_ids = snap.live_subset(r["id"] for r in rows)
+    new_rows = []
+    for r in rows:
+        if r["id"] not in existing_ids:
+            existing_ids.add(r["id"])
+            new_rows.append(r)
+
+    if not new_rows:
         return 0
-    
+
     # Batch embed all texts
-    texts = [c["text"] for c in new_chunks]
-    embeddings = embed_batch(texts)
-    
-    # Store all
-    for chunk, embedding in zip(new_chunks, embeddings):
-        store["chunks"].append({
-            "id": chunk["id"],
-            "company": chunk.get("company", "Unknown"),
-            "period": chunk.get("period", "Unknown"),
-            "text": chunk["text"],
-            "source_file": chunk.get("source_file", ""),
-            "position": chunk.get("position", 0)
-        })
-        store["embeddings"].append(embedding)
-    
-    save_store(store)
-    return len(new_chunks)
-
-def search_similar(query: str, top_k: int = 10, company_filter: Optional[str] = None) -> List[Dict]:
+    texts = [r["text"] for r in new_rows]
+    embeddings = np.asarray(embed_batch(texts), dtype=np.float32)
+
+    added = _append_rows(collection, new_rows, embeddings)
+    if os.path.exists(_path(collection, "ivf.npz")):
+        sync_ann_index(collection)
+    _maybe_compact(collection)
+    return added
+
+def refresh_chunks(chunks: List[Dict], collection: str = DEFAULT_COLLECTION) -> int:
+    """
+    Rewrite the metadata (page, position, period, ...) of stored chunks whose
+    text is unchanged but whose metadata differs, reusing the stored vectors.
+    Returns the number of rows rewritten.
+    """
+    rows = {r["id"]: r for r in (_chunk_row(c) for c in chunks if c.get("id"))}
+    snap = _snapshot(collection)
+    found = snap.find_rows(set(rows))
+    if not found:
+        return 0
+    seg_index = {s["name"]: i for i, s in enumerate(snap.segments)}
+    ids = list(found)
+    global_rows = [int(snap.bases[seg_index[found[i][0]]]) + found[i][1] for i in ids]
+    stale = [j for j, old in enumerate(snap.read_metadata(global_rows)) if old != rows[ids[j]]]
+    if not stale:
+        return 0
+    changed = segment_store.replace(_collection_dir(collection), [rows[ids[j]] for j in stale],
+                                    snap.gather([global_rows[j] for j in stale]), EMBEDDING_DIM, STORE_DTYPE)
+    if os.path.exists(_path(collection, "ivf.npz")):
+        sync_ann_index(collection)
+    _maybe_compact(collection)
+    return changed
+
+def delete_chunks(ids: List[str], collection: str = DEFAULT_COLLECTION) -> int:
+    """Tombstone rows by id; they disappear from search immediately and from disk on compaction."""
+    _snapshot(collection)
+    return segment_store.delete(_collection_dir(collection), ids)
+
+def ids_with_prefix(prefix: str, collection: str = DEFAULT_COLLECTION) -> set:
+    """Live ids starting with prefix (e.g. every chunk of one named document)."""
+    return {i for i in _snapshot(collection).live_ids() if i.startswith(prefix)}
+
+def compact(collection: str = DEFAULT_COLLECTION) -> dict:
+    """Merge segments and drop deleted rows. Invalidates (and rebuilds) the ANN index."""
+    _snapshot(collection)
+    result = segment_store.compact(_collection_dir(collection))
+    index = _load_ann_index(collection) if result["segments"] else None
+    if index is not None:
+        build_ann_index(collection, index.nlist)
+    return result
+
+_compacting = set()
+
+def _maybe_compact(collection: str):
+    """
+    Compact in a background thread once segments pile up. A process that exits
+    mid-compaction leaves an unpublished segment behind (a temp dir, or a
+    seg-* dir the manifest never listed); writers skip its name and the next
+    compaction deletes it. Far past the threshold we compact inline so
+    short-lived CLIs can't grow segments forever.
+    """
+    manifest = _snapshot(collection).manifest
+    if not segment_store.needs_compaction(manifest) or collection in _compacting:
+        return
+    if len(manifest["segments"]) > 4 * segment_store.COMPACT_SEGMENTS:
+        compact(collection)
+        return
+
+    def run():
+        try:
+            compact(collection)
+        finally:
+            _compacting.discard(collection)
+
+    _compacting.add(collection)
+    threading.Thread(target=run, daemon=True).start()
+
+def add_chunks_batch(chunks: List[Dict]) -> int:
+    """Add multiple chunks efficiently with batch embedding."""
+    return _add_rows(DEFAULT_COLLECTION, [_chunk_row(c) for c in chunks if c.get("id")])
+
+def themes_from_filing(accession: str, ticker: str, form: str, date: str,
+                       filing_url: str, themes: List[Dict]) -> List[Dict]:
+    """Theme records for one filing, with accession-based ids (re-running is idempotent)."""
+    return [{
+        "theme_id": f"{accession}_{idx}",
+        "ticker": ticker,
+        "form": form,
+        "date": date,
+        "theme_name": t.get("theme", ""),
+        "context": t.get("context", ""),
+        "filing_url": filing_url
+    } for idx, t in enumerate(themes)]
+
+def add_themes(themes: List[Dict]) -> int:
+    """
+    Add many themes in one embedding call and one write.
+    Each theme: {theme_id, ticker, form, date, theme_name, context, filing_url}.
+    """
+    rows = [{
+        "id": t["theme_id"],
+        "company": t.get("ticker") or "UNKNOWN",
+        "form": t.get("form", ""),
+        "date": t.get("date", ""),
+        "theme": t.get("theme_name", ""),
+        "context": t.get("context", ""),
+        "filing_url": t.get("filing_url", ""),
+        "text": f"{t.get('theme_name', '')}: {t.get('context', '')}"
+    } for t in themes]
+    return _add_rows(THEMES_COLLECTION, rows)
+
+def add_theme(theme_id: str, ticker: str, form: str, date: str, theme_name: str,
+              context: str, filing_url: str = "") -> bool:
+    """Add a single theme (prefer add_themes for more than one)."""
+    return add_themes([{
+        "theme_id": theme_id, "ticker": ticker, "form": form, "date": date,
+        "theme_name": theme_name, "context": context, "filing_url": filing_url
+    }]) == 1
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first (argpartition + sort of k)."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+def _company_codes(snap: Snapshot, company_filter: Optional[str]) -> Optional[List[int]]:
+    """Company codes matching a (case-insensitive) filter, or None for no filter."""
+    if not company_filter:
+        return None
+    wanted = company_filter.lower()
+    return [code for name, code in snap.manifest["company_codes"].items() if name.lower() == wanted]
+
+def _select(snap: Snapshot, company_filter: Optional[str] = None,
+            period_filter: Optional[str] = None) -> Optional[Dict[int, List[tuple]]]:
+    """
+    Filter pushdown: {segment index: [(start, stop), ...]} of the partitions a
+    filter selects, or None when there is no filter (every row is selected).
+    """
+    if not company_filter and not period_filter:
+        return None
+    codes = _company_codes(snap, company_filter)
+    periods = {period_filter} if period_filter else None
+    return {i: snap.partitions(i).ranges(codes, periods) for i in range(len(snap.segments))}
+
+def _selected_count(snap: Snapshot, selection: Optional[Dict[int, List[tuple]]]) -> int:
+    if selection is None:
+        return snap.count
+    return sum(stop - start for ranges in selection.values() for start, stop in ranges)
+
+def _iter_selected(snap: Snapshot, selection: Optional[Dict[int, List[tuple]]], start_row: int = 0):
+    """Yield (segment, local start, local stop, live mask or None) blocks of selected rows >= start_row."""
+    for i, seg in enumerate(snap.segments):
+        lo = max(0, start_row - int(snap.bases[i]))
+        if lo >= seg["rows"]:
+            continue
+        live = snap.live_mask(i)
+        ranges = [(0, seg["rows"])] if selection is None else selection[i]
+        for start, stop in ranges:
+            for block_start in range(max(start, lo), stop, SCAN_BLOCK_ROWS):
+                block_stop = min(block_start + SCAN_BLOCK_ROWS, stop)
+                yield i, block_start, block_stop, None if live is None else live[block_start:block_stop]
+
+def _selected_mask(snap: Snapshot, selection: Optional[Dict[int, List[tuple]]], i: int) -> Optional[np.ndarray]:
+    """Mask over all rows of segment i: live and selected (None if every row qualifies)."""
+    live = snap.live_mask(i)
+    if selection is None:
+        return live
+    mask = np.zeros(snap.segments[i]["rows"], dtype=bool)
+    for start, stop in selection[i]:
+        mask[start:stop] = True
+    return mask if live is None else mask & live
+
+def _empty_hits() -> tuple:
+    return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+def _merge_top_k(best: tuple, rows: np.ndarray, scores: np.ndarray, k: int) -> tuple:
+    """Merge new (rows, scores) into a running top-k."""
+    cand_rows = np.concatenate([best[0], rows])
+    cand_scores = np.concatenate([best[1], scores])
+    keep = _top_k(cand_scores, k)
+    return cand_rows[keep], cand_scores[keep]
+
+def _scan_exact(snap: Snapshot, queries: np.ndarray, top_k: int,
+                selection: Optional[Dict[int, List[tuple]]], start_row: int = 0) -> List[tuple]:
+    """Brute-force scan of selected rows >= start_row, one block at a time."""
+    best = [_empty_hits()] * len(queries)
+
+    for i, start, stop, keep in _iter_selected(snap, selection, start_row):
+        rows = snap.bases[i] + np.arange(start, stop)
+        block = snap.vectors(i, start, stop)
+        if keep is not None:
+            if not keep.any():
+                continue
+            rows, block = rows[keep], block[keep]
+
+        scores = queries @ block.T  # (n_queries, rows)
+
+        for q in range(len(queries)):
+            best[q] = _merge_top_k(best[q], rows, scores[q], top_k)
+
+    return best
+
+def _scan_ann(index, snap: Snapshot, queries: np.ndarray, top_k: int,
+              selection: Optional[Dict[int, List[tuple]]], nprobe: int) -> List[tuple]:
+    """Score the probed IVF lists exactly, plus any rows appended since the index was synced."""
+    tail = _scan_exact(snap, queries, top_k, selection, start_row=index.indexed_count)
+    masks = {}
+    results = []
+    for q, query in enumerate(queries):
+        rows = np.sort(index.candidates(query, nprobe))
+        seg, local = snap.locate(rows)
+        keep = np.ones(len(rows), dtype=bool)
+        for i in np.unique(seg):
+            sel = np.nonzero(seg == i)[0]
+            if i not in masks:
+                masks[i] = _selected_mask(snap, selection, int(i))
+            if masks[i] is not None:
+                keep[sel] = masks[i][local[sel]]
+        rows = rows[keep]
+        results.append(_merge_top_k(tail[q], rows, snap.gather(rows) @ query, top_k))
+    return results
+
+def _scan_quantized(snap: Snapshot, queries: np.ndarray, top_k: int,
+                    selection: Optional[Dict[int, List[tuple]]], mode: str) -> List[tuple]:
+    """
+    First pass over int8/binary codes keeping top_k * RESCORE_FACTOR candidates,
+    then exact float rescoring of those rows. Segments without sidecars are
+    scored in float directly.
+    """
+    from quantization import RESCORE_FACTOR, quantize_binary, int8_scores, binary_scores
+    n_candidates = top_k * RESCORE_FACTOR
+    query_bits = quantize_binary(queries) if mode == "binary" else None
+    best = [_empty_hits()] * len(queries)
+
+    for i, start, stop, keep in _iter_selected(snap, selection):
+        rows = snap.bases[i] + np.arange(start, stop)
+        if keep is not None and not keep.any():
+            continue
+        sidecar = snap.quantized(i, mode)
+        if sidecar is None:
+            scores = queries @ snap.vectors(i, start, stop).T
+        elif mode == "int8":
+            scores = int8_scores(queries, sidecar[0][start:stop], sidecar[1][start:stop])
+        else:
+            scores = binary_scores(query_bits, sidecar[0][start:stop])
+        if keep is not None:
+            rows, scores = rows[keep], scores[:, keep]
+
+        for q in range(len(queries)):
+            best[q] = _merge_top_k(best[q], rows, scores[q], n_candidates)
+
+    results = []
+    for q, query in enumerate(queries):
+        rows = np.sort(best[q][0])
+        results.append(_merge_top_k(_empty_hits(), rows, snap.gather(rows) @ query, top_k))
+    return results
+
+def _search_vectors(collection: str, queries: np.ndarray, top_k: int,
+                    company_filter: Optional[str] = None, nprobe: Optional[int] = None,
+                    exact: bool = False, snap: Optional[Snapshot] = None,
+                    quant: Optional[str] = None, period_filter: Optional[str] = None) -> List[tuple]:
+    """
+    Top-k over a collection for a (n_queries x dim) matrix of unit queries.
+    Filters are pushed down to partition ranges, so a filtered search costs time
+    proportional to the rows it selects. Uses the IVF index when one exists, is
+    current, and the selection is large enough; otherwise a scan, over quantized
+    codes with exact rescoring when quant is "int8" or "binary" (default
+    VECTOR_STORE_QUANT). exact=True always does a full float scan.
+    Returns [(global_rows, scores), ...] per query.
+    """
+    snap = snap or _snapshot(collection)
+    if not snap.count:
+        return [_empty_hits()] * len(queries)
+
+    selection = _select(snap, company_filter, period_filter)
+    use_ann = not exact and _selected_count(snap, selection) >= ANN_MIN_ROWS
+    index = _load_ann_index(collection) if use_ann else None
+    if index is not None and index.epoch == snap.manifest["epoch"] and index.indexed_count <= snap.count:
+        from ann_index import DEFAULT_NPROBE
+        return _scan_ann(index, snap, queries, top_k, selection, nprobe or DEFAULT_NPROBE)
+
+    if not exact:
+        from quantization import DEFAULT_MODE
+        mode = quant or DEFAULT_MODE
+        if mode != "none":
+            return _scan_quantized(snap, queries, top_k, selection, mode)
+    return _scan_exact(snap, queries, top_k, selection)
+
+def _search_lexical(snap: Snapshot, query: str, top_k: int,
+                    selection: Optional[Dict[int, List[tuple]]] = None) -> tuple:
+    """BM25 top-k for one query over every segment. Returns (global_rows, scores)."""
+    from lexical_index import tokenize, bm25_idf, bm25_scores
+    terms = set(tokenize(query))
+    if not terms or not snap.count:
+        return _empty_hits()
+
+    segments = [snap.lexical(i) for i in range(len(snap.segments))]
+    avgdl = sum(seg.tokens for seg in segments) / snap.count
+    weights = {t: bm25_idf(sum(seg.df(t) for seg in segments), snap.count) for t in terms}
+
+    best = _empty_hits()
+    for i, seg in enumerate(segments):
+        scores = bm25_scores(seg, weights, avgdl)
+        keep = _selected_mask(snap, selection, i)
+        if keep is not None:
+            scores[~keep] = 0
+        hits = np.flatnonzero(scores > 0)
+        best = _merge_top_k(best, snap.bases[i] + hits, scores[hits], top_k)
+    return best
+
+def _fuse_rrf(rankings: List[np.ndarray], top_k: int) -> tuple:
+    """Reciprocal rank fusion of several ranked row lists."""
+    fused = {}
+    for rows in rankings:
+        for rank, row in enumerate(rows.tolist()):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+    ordered = sorted(fused, key=fused.get, reverse=True)[:top_k]
+    return np.asarray(ordered, dtype=np.int64), np.asarray([fused[r] for r in ordered], dtype=np.float32)
+
+def _load_ann_index(collection: str):
+    """Load (and cache by mtime) the collection's IVF index, if any."""
+    path = _path(collection, "ivf.npz")
+    if not os.path.exists(path):
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _ann_cache.get(collection)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    from ann_index import IVFIndex
+    index = IVFIndex.load(path)
+    _ann_cache[collection] = (mtime, index)
+    return index
+
+def build_ann_index(collection: str = DEFAULT_COLLECTION, nlist: Optional[int] = None):
+    """Train an IVF index over the whole collection and persist it."""
+    from ann_index import IVFIndex, TRAIN_SAMPLE, default_nlist
+    snap = _snapshot(collection)
+    if not snap.count:
+        return None
+    rng = np.random.default_rng(0)
+    sample = np.sort(rng.choice(snap.count, size=min(snap.count, TRAIN_SAMPLE), replace=False))
+    index = IVFIndex.train(snap.gather(sample), nlist or default_nlist(snap.count),
+                           snap.count, snap.manifest["epoch"])
+    for i, start, stop in snap.iter_blocks(SCAN_BLOCK_ROWS):
+        index.add(snap.vectors(i, start, stop), int(snap.bases[i]) + start)
+    index.save(_path(collection, "ivf.npz"))
+    print(f"[VectorStore] Built IVF index: {index.nlist} lists over {index.indexed_count} rows")
+    return index
+
+def sync_ann_index(collection: str = DEFAULT_COLLECTION):
+    """Insert rows appended since the last sync; retrain if the store outgrew the centroids."""
+    index = _load_ann_index(collection)
+    if index is None:
+        return None
+    snap = _snapshot(collection)
+    if index.epoch != snap.manifest["epoch"] or index.indexed_count > snap.count:
+        return build_ann_index(collection)  # store was compacted / cleared
+    for i, start, stop in snap.iter_blocks(SCAN_BLOCK_ROWS, index.indexed_count):
+        index.add(snap.vectors(i, start, stop), int(snap.bases[i]) + start)
+    if index.needs_retrain():
+        return build_ann_index(collection)
+    index.save(_path(collection, "ivf.npz"))
+    return index
+
+def _format_results(snap: Snapshot, rows: np.ndarray, scores: np.ndarray) -> List[Dict]:
+    """Attach metadata to scored rows (reads only those rows)."""
+    return [dict(row, similarity=round(float(sim), 3))
+            for row, sim in zip(snap.read_metadata(rows), scores)]
+
+def search_similar(query: str, top_k: int = 10, company_filter: Optional[str] = None,
+                   nprobe: Optional[int] = None, exact: bool = False,
+                   quant: Optional[str] = None, mode: Optional[str] = None,
+                   period_filter: Optional[str] = None) -> List[Dict]:
     """Search for similar chunks."""
-    store = load_store()
-    
-    if not store["chunks"]:
+    return search_similar_batch([query], top_k=top_k, company_filter=company_filter, nprobe=nprobe,
+                                exact=exact, quant=quant, mode=mode, period_filter=period_filter)[0]
+
+def search_similar_batch(queries: List[str], top_k: int = 10, company_filter: Optional[str] = None,
+                         nprobe: Optional[int] = None, exact: bool = False,
+                         quant: Optional[str] = None, mode: Optional[str] = None,
+                         period_filter: Optional[str] = None) -> List[List[Dict]]:
+    """
+    Search several queries with one embedding call and one pass over the store.
+    nprobe trades recall for latency when an ANN index is present; exact=True bypasses it.
+    quant ("none", "int8", "binary") picks the first-pass scan when there is no ANN index.
+    mode: "vector" (embeddings only), "lexical" (BM25 only) or "hybrid" (both, fused
+    with reciprocal rank fusion; default VECTOR_SEARCH_MODE). Every result carries
+    the cosine "similarity"; lexical results add "bm25", hybrid results add "score".
+    company_filter / period_filter only touch the matching partitions.
+    """
+    mode = mode or SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode {mode!r}; expected one of {SEARCH_MODES}")
+    if not queries:
         return []
-    
-    # Embed the query
-    query_embedding = embed_text(query)
-    
-    # Calculate similarities
-    similarities = []
-    for i, emb in enumerate(store["embeddings"]):
-        chunk = store["chunks"][i]
-        
-        # Apply company filter if specified
-        if company_filter and chunk.get("company", "").lower() != company_filter.lower():
-            continue
-            
-        sim = cosine_similarity(query_embedding, emb)
-        similarities.append((i, sim))
-    
-    # Sort by similarity (descending)
-    similarities.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return top-k results
+    snap = _snapshot(DEFAULT_COLLECTION)
+    if not snap.count:
+        return [[] for _ in queries]
+
+    query_vectors = embed_queries(queries)
+    if mode == "vector":
+        hits = _search_vectors(DEFAULT_COLLECTION, query_vectors, top_k, company_filter, nprobe, exact,
+                               snap, quant, period_filter)
+        return [_format_results(snap, rows, scores) for rows, scores in hits]
+
+    depth = max(top_k, HYBRID_DEPTH) if mode == "hybrid" else top_k
+    selection = _select(snap, company_filter, period_filter)
+    dense = (_search_vectors(DEFAULT_COLLECTION, query_vectors, depth, company_filter, nprobe, exact,
+                             snap, quant, period_filter)
+             if mode == "hybrid" else None)
+
     results = []
-    for i, sim in similarities[:top_k]:
-        chunk = store["chunks"][i]
-        results.append({
-            "id": chunk["id"],
-            "company": chunk.get("company"),
-            "period": chunk.get("period"),
-            "text": chunk.get("text"),
-            "source_file": chunk.get("source_file"),
-            "position": chunk.get("position"),
-            "similarity": round(sim, 3)
-        })
-    
+    for q, query in enumerate(queries):
+        rows, scores = _search_lexical(snap, query, depth, selection)
+        key = "bm25"
+        if mode == "hybrid":
+            rows, scores = _fuse_rrf([dense[q][0], rows], top_k)
+            key = "score"
+        similarity = snap.gather(rows) @ query_vectors[q] if len(rows) else []
+        results.append([dict(row, **{key: round(float(score), 4)})
+                        for row, score in zip(_format_results(snap, rows, similarity), scores)])
     return results
 
+def search_themes(query: str, top_k: int = 10, ticker_filter: Optional[str] = None) -> List[Dict]:
+    """Search extracted filing themes."""
+    snap = _snapshot(THEMES_COLLECTION)
+    if not snap.count:
+        return []
+    query_vectors = embed_queries([query])
+    rows, scores = _search_vectors(THEMES_COLLECTION, query_vectors, top_k, ticker_filter, snap=snap)[0]
+    return _format_results(snap, rows, scores)
+
+def iter_unseen(seen: set, collection: str = THEMES_COLLECTION, block_rows: int = 4096):
+    """(metadata rows, unit vectors) blocks of the live rows whose id is not in `seen`, in row order."""
+    snap = _snapshot(collection)
+    for i in range(len(snap.segments)):
+        mask = snap.live_mask(i)
+        local = [r for r, row_id in enumerate(snap.ids(i)) if row_id not in seen and (mask is None or mask[r])]
+        for start in range(0, len(local), block_rows):
+            rows = int(snap.bases[i]) + np.asarray(local[start:start + block_rows], dtype=np.int64)
+            yield snap.read_metadata(rows), snap.gather(rows)
+
 def get_stats() -> dict:
-    """Get store statistics."""
-    store = load_store()
-    
-    # Count unique companies
-    companies = set(c.get("company", "Unknown") for c in store["chunks"])
-    
+    """Get store statistics (read from the manifest, no scan)."""
+    snap = _snapshot(DEFAULT_COLLECTION)
+    companies = snap.manifest["companies"]
+
     return {
-        "total_chunks": len(store["chunks"]),
+        "total_chunks": _live_count(snap),
         "companies": list(companies),
-        "company_count": len(companies)
+        "company_count": len(companies),
+        "segments": len(snap.segments),
+        "total_themes": _live_count(_snapshot(THEMES_COLLECTION))
     }
 
 def clear_store():
     """Clear all data from the vector store."""
-    save_store({"chunks": [], "embeddings": []})
+    cdir = _collection_dir(DEFAULT_COLLECTION)
+    with segment_store.file_lock(cdir):
+        old = segment_store.read_manifest(cdir)
+        for name in os.listdir(cdir):
+            if name != ".lock":
+                target = os.path.join(cdir, name)
+                shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+        manifest = segment_store.empty_manifest(EMBEDDING_DIM, STORE_DTYPE)
+        manifest["next_segment"] = old["next_segment"] if old else 0  # never reuse segment names
+        segment_store.write_manifest(cdir, manifest)
 
 def get_companies() -> List[str]:
     """Get list of all companies in the store."""
-    store = load_store()
-    companies = set(c.get("company", "Unknown") for c in store["chunks"])
-    return sorted(list(companies))
+    return sorted(_snapshot(DEFAULT_COLLECTION).manifest["companies"])
+
+def get_catalog(collection: str = DEFAULT_COLLECTION) -> Dict[str, Dict[str, int]]:
+    """Live row counts per company and period, from the partition catalogs (no row scan)."""
+    snap = _snapshot(collection)
+    names = {code: name for name, code in snap.manifest["company_codes"].items()}
+    catalog = {}
+    for i in range(len(snap.segments)):
+        deleted = np.sort(snap.manifest["deleted"].get(snap.segments[i]["name"], []))
+        for code, period, start, stop in snap.partitions(i).runs:
+            dead = np.searchsorted(deleted, stop) - np.searchsorted(deleted, start)
+            periods = catalog.setdefault(names[code], {})
+            periods[period] = periods.get(period, 0) + stop - start - int(dead)
+    return {company: {p: n for p, n in periods.items() if n}
+            for company, periods in catalog.items() if any(periods.values())}
 
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        migrate_json_store(sys.argv[2] if len(sys.argv) > 2 else LEGACY_STORE_PATH)
+        print(f"Stats: {get_stats()}")
+        sys.exit(0)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "compact":
+        for name in (DEFAULT_COLLECTION, THEMES_COLLECTION):
+            print(f"{name}: {compact(name)}")
+        sys.exit(0)
+
     # Test the vector store
     print("Testing vector store...")
-    
+
     # Clear and add test data
     clear_store()
-    
+
     add_chunk(
         chunk_id="test_1",
         company="Apple Inc",
@@ -189,7 +716,7 @@ if __name__ == "__main__":
         source_file="AAPL_10Q.pdf",
         position=0
     )
-    
+
     add_chunk(
         chunk_id="test_2",
         company="Microsoft Corp",
@@ -198,13 +725,13 @@ if __name__ == "__main__":
         source_file="MSFT_10Q.pdf",
         position=0
     )
-    
+
     print("Added test chunks.")
-    
+
     # Search
     results = search_similar("cloud growth", top_k=5)
     print(f"\nSearch results for 'cloud growth':")
     for r in results:
         print(f"  - {r['company']} ({r['period']}): {r['text'][:80]}... [similarity: {r['similarity']}]")
-    
+
     print(f"\nStats: {get_stats()}")
@@ -278,17 +278,24 @@ class SECClient:
 
     def get_latest_filings(self, form_type: str, count: int = 40) -> list[dict]:
         """Get latest filings from ALL companies via SEC RSS feed."""
+        print(f"[SEC] Fetching latest {form_type} filings from market...")
+        filings = self.get_current_filings(form_type, start=0, count=count)[:count]
+        return [self.resolve_filing(f) for f in filings]
+
+    def get_current_filings(self, form_type: str, start: int = 0, count: int = 100) -> list[dict]:
+        """
+        One page of the EDGAR current-events feed, newest first. Entries carry
+        the acceptance timestamp ("accepted") and the index page, but not the
+        primary document; resolve_filing() fetches that when it is needed.
+        """
         import datetime
         # Clean form type for URL (e.g. 10-K, 10-Q)
         type_param = form_type.replace(" ", "+")
-        url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcurrent&type={type_param}&company=&dateb=&owner=include&start=0&count={count}&output=atom"
-        
-        print(f"[SEC] Fetching latest {form_type} filings from market...")
+        url = f"https://www.sec.gov/cgi-bin/browse-edgar?action=getcurrent&type={type_param}&company=&dateb=&owner=include&start={start}&count={count}&output=atom"
         resp = self._fetch(url)
-        
         if not resp:
             return []
-        
+
         filings = []
         try:
             import xml.etree.ElementTree as ET
@@ -296,65 +303,84 @@ class SECClient:
             xml_text = re.sub(r'\sxmlns[^"]*"[^"]*"', '', resp.text)
             root = ET.fromstring(xml_text)
             entries = root.findall('.//entry')
-            print(f"[SEC] RSS feed contains {len(entries)} entries")
-            
-            for entry in entries:
+            print(f"[SEC] Current feed {form_type} start={start}: {len(entries)} entries")
 
-                title = entry.find('title').text
+            for entry in entries:
                 # Title format usually: "10-K - Microsoft Corp (0000789019) (Filer)"
-                
-                # Extract CIK and Company Name
+                title = entry.find('title').text
                 cik_match = re.search(r'\((\d{10})\)', title)
-                cik = cik_match.group(1) if cik_match else "Unknown"
-                
-                updated = entry.find('updated')
-                date_str = updated.text[:10] if updated is not None else datetime.datetime.now().strftime("%Y-%m-%d")
-                print(f"[SEC] Entry: {title[:50]}... Date: {date_str}")
-                
-                # Link format: https://www.sec.gov/Archives/edgar/data/789019/000095017025123456/0000950170-25-123456-index.htm
                 link = entry.find('link')
-                if link is not None:
-                    href = link.get('href', '')
-                    
-                    acc_match = re.search(r'/(\d{10}-\d{2}-\d{6})', href)
-                    if acc_match:
-                        acc = acc_match.group(1)
-                        acc_clean = acc.replace("-", "")
-                        cik_clean = str(int(cik)) # Remove leading zeros for URL
-                        
-                        updated = entry.find('updated')
-                        date_str = updated.text[:10] if updated is not None else datetime.datetime.now().strftime("%Y-%m-%d")
-                        print(f"[SEC] Entry: {title[:50]}... Date: {date_str}")
-
-                        # Resolve primary document URL
-                        primary_doc = "unknown.htm"
-                        real_url = href
-                        
-                        # Only resolve if we are going to use it (count check is later, but we need it for the dict)
-                        # To save time, we could lazily resolve, but let's just do it.
-                        if len(filings) < count:
-                            primary_doc = self._get_primary_doc_from_index(href, cik_clean, acc) or f"{acc_clean}.htm"
-                            real_url = f"https://www.sec.gov/Archives/edgar/data/{cik_clean}/{acc_clean}/{primary_doc}"
+                # Link format: https://www.sec.gov/Archives/edgar/data/789019/000095017025123456/0000950170-25-123456-index.htm
+                acc_match = re.search(r'/(\d{10}-\d{2}-\d{6})', link.get('href', '')) if link is not None else None
+                if not cik_match or not acc_match:
+                    continue
 
-                        filings.append({
-                            "form": form_type,
-                            "accession": acc,
-                            "accession_clean": acc_clean,
-                            "cik": cik,
-                            "ticker": self.get_ticker(cik), 
-                            "primary_doc": primary_doc, 
-                            "date": date_str,
-                            "url": real_url,
-                            "folder_url": f"https://www.sec.gov/Archives/edgar/data/{cik_clean}/{acc_clean}/"
-                        })
-                        
-                        if len(filings) >= count:
-                            break
+                updated = entry.find('updated')
+                # Eastern time with an offset; the local part sorts correctly on its own
+                accepted = updated.text[:19] if updated is not None else datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+                category = entry.find('category')
+                form = category.get('term') if category is not None and category.get('term') else form_type
+                filings.append(self._filing_entry(form, cik_match.group(1), acc_match.group(1), accepted,
+                                                  link.get('href')))
         except Exception as e:
             print(f"[SEC] Latest RSS parse error: {e}")
-            
+
+        return filings
+
+    def get_daily_index(self, form_type: str, date: str) -> list[dict]:
+        """
+        Filings of one form (and its amendments) from the EDGAR daily form
+        index for date (YYYY-MM-DD). Indexes are published after the day
+        closes; weekends, holidays and today return [].
+        """
+        year, month, day = date.split("-")
+        quarter = (int(month) - 1) // 3 + 1
+        resp = self._fetch(f"https://www.sec.gov/Archives/edgar/daily-index/{year}/QTR{quarter}/form.{year}{month}{day}.idx")
+        if not resp:
+            return []
+
+        filings = []
+        # Fixed-width rows after a dashed rule:
+        # "10-K   APPLE INC   320193   20261030   edgar/data/320193/0000320193-26-000106.txt"
+        for line in resp.text.split("-" * 20)[-1].splitlines():
+            parts = line.split()
+            if len(parts) < 5 or not (parts[0] == form_type or parts[0].startswith(form_type + "/")):
+                continue
+            acc_match = re.search(r'(\d{10}-\d{2}-\d{6})\.txt$', parts[-1])
+            if not acc_match or not parts[-3].isdigit():
+                continue
+            filings.append(self._filing_entry(parts[0], parts[-3].zfill(10), acc_match.group(1), f"{date}T00:00:00"))
+        print(f"[SEC] Daily index {date}: {len(filings)} {form_type} filings")
         return filings
 
+    def _filing_entry(self, form: str, cik: str, acc: str, accepted: str, index_url: str | None = None) -> dict:
+        acc_clean = acc.replace("-", "")
+        cik_clean = str(int(cik))  # Remove leading zeros for URL
+        folder_url = f"https://www.sec.gov/Archives/edgar/data/{cik_clean}/{acc_clean}/"
+        return {
+            "form": form,
+            "accession": acc,
+            "accession_clean": acc_clean,
+            "cik": cik,
+            "ticker": self.get_ticker(cik),
+            "primary_doc": None,
+            "date": accepted[:10],
+            "accepted": accepted,
+            "url": None,
+            "index_url": index_url or f"{folder_url}{acc}-index.htm",
+            "folder_url": folder_url
+        }
+
+    def resolve_filing(self, filing: dict) -> dict:
+        """Fill in primary_doc and url from the filing's index page (one request, skipped if already set)."""
+        if filing.get("url"):
+            return filing
+        cik_clean = str(int(filing["cik"]))
+        primary_doc = self._get_primary_doc_from_index(filing["index_url"], cik_clean, filing["accession"]) \
+            or f"{filing['accession_clean']}.htm"
+        return dict(filing, primary_doc=primary_doc,
+                    url=f"https://www.sec.gov/Archives/edgar/data/{cik_clean}/{filing['accession_clean']}/{primary_doc}")
+
     def _get_primary_doc_from_index(self, index_url: str, cik: str, acc: str) -> str | None:
         """Get the primary document filename from a filing index page."""
         resp = self._fetch(index_url)
@@ -505,43 +531,13 @@ class SECClient:
     
     def download_filing(self, url: str) -> str | None:
         """Download filing HTML content and extract clean text."""
+        html = self.fetch_filing_html(url)
+        return clean_filing_html(html) if html is not None else None
+    
+    def fetch_filing_html(self, url: str) -> str | None:
+        """Raw filing HTML (network only; see clean_filing_html)."""
         resp = self._fetch(url)
-        if not resp:
-            return None
-        
-        try:
-            import re
-            from bs4 import BeautifulSoup
-            
-            html = resp.text
-            
-            # Step 1: Strip ALL XML/XBRL namespace tags using universal regex
-            # This removes ANY tag with a colon (namespace prefix) like ix:, xbrli:, etc.
-            html = re.sub(r'<[a-zA-Z0-9_-]+:[^>]*>.*?</[a-zA-Z0-9_-]+:[^>]*>', '', html, flags=re.DOTALL)
-            html = re.sub(r'<[a-zA-Z0-9_-]+:[^/>]*/>', '', html)  # Self-closing
-            
-            # Step 2: Remove XML declaration and comments
-            html = re.sub(r'<\?xml[^>]*\?>', '', html)
-            html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
-            
-            # Step 3: Parse with BeautifulSoup
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Remove script, style, and metadata elements
-            for element in soup(['script', 'style', 'head', 'meta', 'link', 'title']):
-                element.decompose()
-            
-            # Get text with reasonable separator
-            text = soup.get_text(separator='\n', strip=True)
-            
-            # Step 4: Clean up excessive whitespace
-            text = re.sub(r'\n{3,}', '\n\n', text)  # Max 2 newlines
-            text = re.sub(r'[ \t]+', ' ', text)      # Collapse spaces
-            
-            return text
-        except Exception as e:
-            print(f"[SEC] Error parsing HTML: {e}")
-            return resp.text  # Fallback to raw
+        return resp.text if resp else None
     
     def get_risk_factors(self, cik: str, ticker: str = None) -> dict:
         """Get risk factors (Item 1A) - tries LOCAL first, then download/extract."""
@@ -587,6 +583,67 @@ class SECClient:
             pass
         return None
 
+    def get_13f_securities_list(self, year: int, quarter: int) -> str | None:
+        """Get the text Official List of Section 13(f) Securities for a quarter."""
+        url = f"https://www.sec.gov/files/investment/13flist{year}q{quarter}.txt"
+        resp = self._fetch(url)
+        return resp.text if resp else None
+
+    def get_company_tickers(self) -> list[dict]:
+        """Get all SEC ticker records as [{cik, ticker, name, exchange}]."""
+        resp = self._fetch("https://www.sec.gov/files/company_tickers_exchange.json")
+        if resp:
+            try:
+                data = resp.json()
+                fields = data["fields"]
+                return [dict(zip(fields, row)) for row in data["data"]]
+            except Exception as e:
+                print(f"[SEC] Ticker exchange parse error: {e}")
+
+        resp = self._fetch("https://www.sec.gov/files/company_tickers.json")
+        if resp:
+            try:
+                return [
+                    {"cik": e["cik_str"], "ticker": e["ticker"], "name": e["title"], "exchange": ""}
+                    for e in resp.json().values()
+                ]
+            except Exception as e:
+                print(f"[SEC] Ticker parse error: {e}")
+        return []
+
+
+def clean_filing_html(html: str) -> str:
+    """Filing HTML to clean text (CPU only, safe to run in a worker process)."""
+    raw = html
+    try:
+        # Step 1: Strip ALL XML/XBRL namespace tags using universal regex
+        # This removes ANY tag with a colon (namespace prefix) like ix:, xbrli:, etc.
+        html = re.sub(r'<[a-zA-Z0-9_-]+:[^>]*>.*?</[a-zA-Z0-9_-]+:[^>]*>', '', html, flags=re.DOTALL)
+        html = re.sub(r'<[a-zA-Z0-9_-]+:[^/>]*/>', '', html)  # Self-closing
+        
+        # Step 2: Remove XML declaration and comments
+        html = re.sub(r'<\?xml[^>]*\?>', '', html)
+        html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+        
+        # Step 3: Parse with BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Remove script, style, and metadata elements
+        for element in soup(['script', 'style', 'head', 'meta', 'link', 'title']):
+            element.decompose()
+        
+        # Get text with reasonable separator
+        text = soup.get_text(separator='\n', strip=True)
+        
+        # Step 4: Clean up excessive whitespace
+        text = re.sub(r'\n{3,}', '\n\n', text)  # Max 2 newlines
+        text = re.sub(r'[ \t]+', ' ', text)      # Collapse spaces
+        
+        return text
+    except Exception as e:
+        print(f"[SEC] Error parsing HTML: {e}")
+        return raw  # Fallback to raw
+
 
 def extract_item_1a(html: str) -> str:
     """Extract Item 1A Risk Factors from 10-K/Q HTML."""
@@ -0,0 +1,127 @@
+"""theme_store against LocalClient, the in-memory SQLite stand-in for Turso."""
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import theme_store
+from theme_store import (BatchWriter, LocalClient, ReplicaClient, initialize_schema, iter_filing_themes,
+                         processed_accessions, save_filings)
+
+
+def filing(n):
+    return {"accession": f"0000000000-26-{n:06d}", "cik": "0000000001", "ticker": "ACME", "form": "10-K",
+            "date": "2026-01-02", "url": f"https://www.sec.gov/{n}.htm", "themes": [{"theme": f"t{n}"}]}
+
+
+def run(coro_fn):
+    """Run coro_fn(client) on a fresh schema-initialized in-memory database."""
+    async def main():
+        async with LocalClient() as client:
+            await initialize_schema(client)
+            return await coro_fn(client)
+    return asyncio.run(main())
+
+
+class CountingClient(LocalClient):
+    def __init__(self):
+        super().__init__()
+        self.executes = self.batches = 0
+
+    async def execute(self, sql, args=None):
+        self.executes += 1
+        return await super().execute(sql, args)
+
+    async def batch(self, stmts):
+        self.batches += 1
+        return await super().batch(stmts)
+
+
+class SlowRemote(LocalClient):
+    """A remote whose round trips yield to the event loop, so concurrent callers interleave."""
+
+    async def execute(self, sql, args=None):
+        await asyncio.sleep(0.01)
+        return await super().execute(sql, args)
+
+    async def batch(self, stmts):
+        await asyncio.sleep(0.01)
+        return await super().batch(stmts)
+
+
+def test_processed_accessions_chunks_past_max_params():
+    async def check(client):
+        stored = [filing(n) for n in range(0, 1200, 2)]  # even numbers only
+        await save_filings(client, stored)
+        wanted = [filing(n)["accession"] for n in range(1200)] * 2  # duplicates are looked up once
+        counting = CountingClient()
+        counting.conn = client.conn
+        found = await processed_accessions(counting, wanted)
+        return found, counting.executes
+
+    found, executes = run(check)
+    assert found == {filing(n)["accession"] for n in range(0, 1200, 2)}
+    assert executes == 3  # 1200 unique ids in IN lists of at most MAX_PARAMS
+    assert theme_store.MAX_PARAMS == 500
+
+
+def test_batch_writer_group_commit():
+    async def check(client):
+        counting = CountingClient()
+        counting.conn = client.conn
+        writer = BatchWriter(counting, batch_size=4, linger_s=0.05)
+        await asyncio.gather(*(writer.write(filing(n)) for n in range(10)))
+        rows = (await client.execute("SELECT count(*) FROM filing_themes")).rows[0][0]
+        return writer, counting.batches, rows
+
+    writer, batches, rows = run(check)
+    assert rows == 10
+    assert writer.written == 10
+    assert batches == writer.batches == 3  # 4 + 4 full batches, then the lingering 2
+
+
+def test_batch_writer_rolls_back_failed_batch():
+    async def check(client):
+        writer = BatchWriter(client, batch_size=3, linger_s=0.05)
+        bad = dict(filing(2), accession=["not", "bindable"])  # fails on the third INSERT, after two succeeded
+        results = await asyncio.gather(writer.write(filing(0)), writer.write(filing(1)), writer.write(bad),
+                                       return_exceptions=True)
+        rows = (await client.execute("SELECT count(*) FROM filing_themes")).rows[0][0]
+        await writer.write(filing(5))  # the writer stays usable
+        return results, rows, writer
+
+    results, rows, writer = run(check)
+    assert all(isinstance(r, sqlite3.Error) for r in results)  # every waiter in the batch sees the error
+    assert rows == 0
+    assert writer.written == 1 and writer.batches == 1
+
+
+def test_iter_filing_themes_pages_by_key():
+    async def check(client):
+        await save_filings(client, [filing(n) for n in range(25)])
+        await client.execute("DELETE FROM filing_themes WHERE accession_number = ?", [filing(3)["accession"]])
+        return [page async for page in iter_filing_themes(client, page_size=10)]
+
+    pages = run(check)
+    assert [len(p) for p in pages] == [10, 10, 4]
+    accessions = [row["accession"] for page in pages for row in page]
+    assert accessions == [filing(n)["accession"] for n in range(25) if n != 3]
+    assert pages[0][0]["themes"] == '[{"theme": "t0"}]'
+
+
+def test_replica_concurrent_writers():
+    async def check(client):
+        replica = ReplicaClient(SlowRemote(), LocalClient())
+        replica.remote.conn = client.conn
+        await replica.sync()
+        # Overlapping writes each sync afterwards; the pulls must not nest transactions
+        await asyncio.gather(*(save_filings(replica, [filing(n), filing(n + 100)]) for n in range(5)))
+        local = await replica.local.execute("SELECT count(*) FROM filing_themes")
+        found = await processed_accessions(replica, [filing(n)["accession"] for n in (0, 4, 104)])
+        return local.rows[0][0], found
+
+    rows, found = run(check)
+    assert rows == 10
+    assert found == {filing(n)["accession"] for n in (0, 4, 104)}
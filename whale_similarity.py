@@ -0,0 +1,192 @@
+"""
+Whale Similarity - Co-holding analysis across 13-F filers
+Builds a sparse filer x CUSIP portfolio-weight matrix per quarter and
+compares portfolios (cosine / Jaccard), plus crowded-trade detection.
+"""
+from array import array
+from typing import Optional
+
+import numpy as np
+import scipy.sparse as sp
+
+from cusip_resolver import normalize_cusip
+
+
+class HoldingsMatrix:
+    """
+    Sparse filer x CUSIP matrix of portfolio weights (value / total value).
+    CSR with int32 indices and float32 data: ~8 bytes per holding, so the full
+    13-F universe (a few million rows per quarter) stays well under 1GB.
+    """
+
+    def __init__(self, matrix: sp.csr_matrix, filers: list[str], cusips: list[str], quarter: str = ""):
+        self.matrix = matrix
+        self.filers = filers
+        self.cusips = cusips
+        self.quarter = quarter
+        self.filer_pos = {f: i for i, f in enumerate(filers)}
+        self.cusip_pos = {c: i for i, c in enumerate(cusips)}
+
+    @property
+    def shape(self) -> tuple:
+        return self.matrix.shape
+
+    def binary(self) -> sp.csr_matrix:
+        """0/1 holding indicator matrix."""
+        b = self.matrix.copy()
+        b.data = np.ones_like(b.data)
+        return b
+
+    def row_normalized(self) -> sp.csr_matrix:
+        """Rows scaled to unit L2 norm, so X @ X.T is cosine similarity."""
+        norms = np.sqrt(np.asarray(self.matrix.multiply(self.matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sp.diags((1.0 / norms).astype(np.float32)) @ self.matrix
+
+
+def build_holdings_matrix(portfolios: dict, quarter: str = "",
+                          cusips: Optional[list[str]] = None, cusip_index=None) -> HoldingsMatrix:
+    """
+    Build a HoldingsMatrix from parsed holdings.
+
+    Args:
+        portfolios: {filer_cik: [holding, ...]} as returned by parse_13f_holdings
+        quarter: label, e.g. "2026-Q1"
+        cusips: optional fixed column vocabulary (to align two quarters)
+        cusip_index: optional cusip_resolver.CusipIndex; columns use the current
+            CUSIP, so a security that changed CUSIP stays one column
+    """
+    filers = sorted(portfolios)
+    fixed_vocab = cusips is not None
+    cusips = list(cusips) if fixed_vocab else []
+    cusip_pos = {c: i for i, c in enumerate(cusips)}
+
+    rows, cols, vals = array("i"), array("i"), array("f")
+    for r, filer in enumerate(filers):
+        for h in portfolios[filer]:
+            cusip = normalize_cusip(h.get("cusip", ""))
+            if cusip and cusip_index is not None:
+                cusip = cusip_index.current_cusip(cusip)
+            value = h.get("value") or 0
+            if not cusip or value <= 0:
+                continue
+            c = cusip_pos.get(cusip)
+            if c is None:
+                if fixed_vocab:
+                    continue
+                c = cusip_pos[cusip] = len(cusips)
+                cusips.append(cusip)
+            rows.append(r)
+            cols.append(c)
+            vals.append(float(value))
+
+    matrix = sp.csr_matrix(
+        (np.frombuffer(vals, dtype=np.float32), (np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32))),
+        shape=(len(filers), len(cusips)),
+        dtype=np.float32,
+    )
+    matrix.sum_duplicates()
+
+    # Values -> portfolio weights
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    totals[totals == 0] = 1.0
+    matrix = (sp.diags((1.0 / totals).astype(np.float32)) @ matrix).tocsr()
+
+    print(f"[Whale] {quarter or 'Matrix'}: {matrix.shape[0]} filers x {matrix.shape[1]} CUSIPs, {matrix.nnz} holdings")
+    return HoldingsMatrix(matrix, filers, cusips, quarter)
+
+
+def _top_k_rows(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k (indices, values) of a dense block, sorted descending."""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-vals, axis=1)
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+def top_k_neighbors(hm: HoldingsMatrix, k: int = 10, metric: str = "cosine",
+                    block_size: int = 1024, min_score: float = 0.0) -> dict:
+    """
+    Top-k most similar filers for every filer.
+    Similarities are computed one block of rows at a time, so peak memory is
+    block_size x n_filers floats instead of the full n_filers^2 matrix.
+
+    Returns:
+        {filer: [{"filer", "score"}, ...]}
+    """
+    if metric == "cosine":
+        x = hm.row_normalized().tocsr()
+    elif metric == "jaccard":
+        x = hm.binary().tocsr()
+        sizes = np.asarray(x.sum(axis=1)).ravel()
+    else:
+        raise ValueError(f"Unsupported metric: {metric}")
+
+    xt = x.T.tocsc()
+    n = x.shape[0]
+    neighbors = {}
+
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = (x[start:stop] @ xt).toarray()
+
+        if metric == "jaccard":
+            union = sizes[start:stop, None] + sizes[None, :] - block
+            union[union == 0] = 1.0
+            block = block / union
+
+        block[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # drop self
+        idx, vals = _top_k_rows(block, k)
+
+        for r in range(stop - start):
+            neighbors[hm.filers[start + r]] = [
+                {"filer": hm.filers[j], "score": round(float(v), 4)}
+                for j, v in zip(idx[r], vals[r])
+                if v > min_score
+            ]
+    return neighbors
+
+
+def detect_crowded_trades(current: dict, previous: dict, min_filers: int = 10,
+                          quarter: str = "", top_n: int = 50, cusip_index=None) -> list[dict]:
+    """
+    Find CUSIPs that many funds entered in the same quarter.
+    Only filers present in both quarters count, so first-time filers do not
+    look like they bought their whole book.
+
+    Args:
+        current / previous: {filer_cik: [holding, ...]} for consecutive quarters
+        cusip_index: optional cusip_resolver.CusipIndex, so a CUSIP change
+            between the quarters is not counted as an entry
+    """
+    cur = build_holdings_matrix(current, quarter, cusip_index=cusip_index)
+    prev = build_holdings_matrix(previous, cusips=cur.cusips, cusip_index=cusip_index)
+
+    common = [f for f in cur.filers if f in prev.filer_pos]
+    if not common:
+        return []
+    cur_rows = cur.matrix[[cur.filer_pos[f] for f in common]]
+    prev_rows = prev.matrix[[prev.filer_pos[f] for f in common]]
+
+    held_now = cur_rows > 0
+    held_before = prev_rows > 0
+    entries = (held_now > held_before).tocsc()  # held now, not held before
+
+    counts = np.diff(entries.indptr)
+    weight_added = np.asarray(cur_rows.multiply(entries).sum(axis=0)).ravel()
+
+    crowded = np.nonzero(counts >= min_filers)[0]
+    crowded = crowded[np.argsort(-counts[crowded], kind="stable")][:top_n]
+
+    results = []
+    for c in crowded:
+        entrant_rows = entries.indices[entries.indptr[c]:entries.indptr[c + 1]]
+        results.append({
+            "cusip": cur.cusips[c],
+            "new_holders": int(counts[c]),
+            "holders_now": int(held_now[:, c].sum()),
+            "avg_entry_weight": round(float(weight_added[c] / counts[c]), 5),
+            "filers": [common[r] for r in entrant_rows],
+        })
+    return results